@@ -1,34 +1,190 @@
 # NLP.py (ฉบับ Hybrid: ฟังไทย + อังกฤษ)
-import speech_recognition as sr
+#
+# Backend:
+#   whisper (ค่าเริ่มต้น) -> faster_whisper บนเครื่อง ไม่ต้องใช้เน็ต โหลดโมเดลครั้งเดียว
+#                           ถอดความระหว่างที่เสียงยังเข้ามา (StreamingTranscriber)
+#   google              -> SpeechRecognition ส่งไป Google (th-TH แล้วตามด้วย en-US) แบบเดิม
+#
+# เลือกได้ด้วย DOBOT_STT_BACKEND=whisper|google
+import os
+import threading
+import time
 
-def transcribe_wav(filename="record.wav"):
+import numpy as np
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
+
+STT_BACKEND = os.environ.get('DOBOT_STT_BACKEND', 'whisper')
+WHISPER_MODEL = os.environ.get('DOBOT_WHISPER_MODEL', 'tiny')   # tiny / base / small
+WHISPER_DEVICE = "cpu"
+WHISPER_COMPUTE_TYPE = "int8"
+SAMPLE_RATE = 16000             # faster_whisper รับเสียง mono 16 kHz float32
+PARTIAL_INTERVAL = 0.4          # วินาที: ถอดความบางส่วนทุกๆ ช่วงนี้ระหว่างที่ยังพูดอยู่
+PARTIAL_MIN_AUDIO = 0.5         # วินาที: เสียงสั้นกว่านี้ยังไม่ถอดความ
+FINAL_REUSE_GAP = 0.3           # วินาที: ถ้าผลบางส่วนล่าสุดครอบคลุมเสียงเกือบหมดแล้ว ใช้ผลนั้นเลย
+
+
+# ==============================
+# 1) Google (แบบเดิม)
+# ==============================
+def transcribe_wav(filename="record.wav", accept=None):
+    import speech_recognition as sr
     recognizer = sr.Recognizer()
-    
+
     # อ่านไฟล์เสียง
     with sr.AudioFile(filename) as source:
-        print(f"กำลังส่งเสียงไปถอดความที่ Google (Thai & English)...")
         audio_data = recognizer.record(source)
-        
-    result_text = ""
-    
-    # 1. ลองถอดความภาษาไทย (th-TH)
-    try:
-        text_th = recognizer.recognize_google(audio_data, language="th-TH")
-        result_text += text_th + " " 
-    except sr.UnknownValueError:
-        pass
-    except sr.RequestError:
-        print("เชื่อมต่อ Google (Thai) ไม่ได้")
-
-    # 2. ลองถอดความภาษาอังกฤษ (en-US)
-    try:
-        text_en = recognizer.recognize_google(audio_data, language="en-US")
-        result_text += text_en
-    except sr.UnknownValueError:
-        pass
-    except sr.RequestError:
-        print("เชื่อมต่อ Google (English) ไม่ได้")
-
-    # ส่งผลลัพธ์กลับไปทั้งคู่เลย (เช่น "ซ้าย Left")
-    print(f"ผลลัพธ์รวม: {result_text}")
-    return result_text
\ No newline at end of file
+    return _recognize_google(recognizer, audio_data, accept)
+
+def transcribe_audio_google(audio, samplerate=SAMPLE_RATE, accept=None):
+    """เสียง float32 ในหน่วยความจำ -> Google (ไม่ต้องเขียน WAV)"""
+    import speech_recognition as sr
+    pcm = (np.clip(np.asarray(audio, np.float32).reshape(-1), -1.0, 1.0) * 32767).astype(np.int16)
+    return _recognize_google(sr.Recognizer(), sr.AudioData(pcm.tobytes(), samplerate, 2), accept)
+
+def _recognize_google(recognizer, audio_data, accept=None):
+    """
+    ลอง th-TH ก่อน แล้วค่อย en-US -> คืนผลของภาษาแรกที่ accept(ข้อความ) ยอมรับ (ค่าเริ่มต้น = ไม่ว่าง)
+    คืนภาษาเดียวเสมอ: ต่อทั้งสองภาษา ("ซ้าย Left") ทำให้คำสั่งเดียวถูกแปลเป็น 2 คำสั่ง
+    """
+    import speech_recognition as sr
+    print("กำลังส่งเสียงไปถอดความที่ Google (Thai & English)...")
+    fallback = ""
+    for language, name in (("th-TH", "Thai"), ("en-US", "English")):
+        try:
+            text = recognizer.recognize_google(audio_data, language=language)
+        except sr.UnknownValueError:
+            continue
+        except sr.RequestError:
+            print(f"เชื่อมต่อ Google ({name}) ไม่ได้")
+            continue
+        if accept is None or accept(text):
+            print(f"ผลลัพธ์ ({name}): {text}")
+            return text
+        fallback = fallback or text
+
+    print(f"ผลลัพธ์: {fallback}")
+    return fallback
+
+
+# ==============================
+# 2) Whisper บนเครื่อง (Local)
+# ==============================
+class LocalRecognizer:
+    """
+    faster_whisper ที่โหลดครั้งเดียวแล้วใช้ซ้ำทุกคำสั่ง
+    vocabulary   = ทุกคำที่รู้จัก (เช่น CMD_MAP.keys()) -> ใช้ตรวจว่าผลถอดความมีคำสั่งแล้วหรือยัง (keyword spotting)
+    prompt_words = คำที่อยากให้โมเดลเอียงไปหา (ใส่ลง prompt/hotwords) ถ้าไม่ใส่ใช้ vocabulary
+    """
+
+    def __init__(self, vocabulary=(), prompt_words=None, model_size=WHISPER_MODEL):
+        if WhisperModel is None:
+            raise RuntimeError("faster_whisper is not installed (pip install faster-whisper)")
+        self.vocabulary = set(w.lower() for w in vocabulary)
+        self.prompt = " ".join(sorted(set(prompt_words or self.vocabulary)))
+        self._lock = threading.Lock()   # CTranslate2 ถอดความทีละงาน
+        t0 = time.time()
+        print(f"⏳ กำลังโหลด Whisper '{model_size}' ({WHISPER_DEVICE}/{WHISPER_COMPUTE_TYPE})...")
+        self.model = WhisperModel(model_size, device=WHISPER_DEVICE, compute_type=WHISPER_COMPUTE_TYPE)
+        print(f"✅ โหลดโมเดลเสร็จใน {time.time() - t0:.1f} s")
+
+    def transcribe(self, audio, beam_size=1):
+        """audio = float32 mono 16 kHz (numpy) -> ข้อความ"""
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        if audio.size == 0: return ""
+        kwargs = dict(beam_size=beam_size, initial_prompt=self.prompt, condition_on_previous_text=False,
+                      without_timestamps=True, vad_filter=False)
+        with self._lock:
+            try:
+                segments, _info = self.model.transcribe(audio, hotwords=self.prompt, **kwargs)
+            except TypeError:
+                # faster_whisper รุ่นเก่าไม่มี hotwords
+                segments, _info = self.model.transcribe(audio, **kwargs)
+            return " ".join(seg.text.strip() for seg in segments).strip()
+
+    def spot(self, text):
+        """คืนคำสั่งแรกที่เจอในข้อความ (ตรงตัว) หรือ None"""
+        for word in text.lower().split():
+            word = word.strip(".,!?")
+            if word in self.vocabulary: return word
+        return None
+
+
+class StreamingTranscriber:
+    """
+    รับเสียงเป็นก้อนๆ จาก sounddevice callback (feed) แล้วถอดความบางส่วนใน Background
+    ระหว่างที่ผู้ใช้ยังพูด -> ตอนหยุดอัด (finish) มักมีผลพร้อมแล้วหรือเหลือถอดความอีกครั้งเดียว
+    """
+
+    def __init__(self, recognizer, samplerate=SAMPLE_RATE):
+        self.recognizer = recognizer
+        self.samplerate = samplerate
+        self._chunks = []
+        self._samples = 0
+        self._lock = threading.Lock()
+        self._partial_text = ""
+        self._partial_samples = 0
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._partial_loop, name='stt-partial', daemon=True)
+        self._thread.start()
+
+    def feed(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        with self._lock:
+            self._chunks.append(chunk)
+            self._samples += chunk.size
+
+    def _audio(self):
+        with self._lock:
+            if len(self._chunks) > 1:
+                self._chunks = [np.concatenate(self._chunks)]
+            return (self._chunks[0] if self._chunks else np.zeros(0, np.float32)), self._samples
+
+    def _partial_loop(self):
+        while not self._done.wait(PARTIAL_INTERVAL):
+            audio, samples = self._audio()
+            if samples < PARTIAL_MIN_AUDIO * self.samplerate or samples == self._partial_samples: continue
+            text = self.recognizer.transcribe(audio)
+            self._partial_text, self._partial_samples = text, samples
+
+    @property
+    def partial(self):
+        return self._partial_text
+
+    def cancel(self):
+        """ทิ้งช่วงเสียงนี้ (ไม่รอผลถอดความ)"""
+        self._done.set()
+
+    def finish(self):
+        """หยุดรับเสียง -> คืนข้อความสุดท้าย"""
+        self._done.set()
+        self._thread.join()
+        audio, samples = self._audio()
+        gap_s = (samples - self._partial_samples) / self.samplerate
+        if self._partial_text and gap_s <= FINAL_REUSE_GAP and self.recognizer.spot(self._partial_text):
+            return self._partial_text
+        return self.recognizer.transcribe(audio, beam_size=5)
+
+
+class LatencyStats:
+    """เวลาตั้งแต่หยุดพูด -> ได้ข้อความ -> ส่งคำสั่งให้แขน"""
+
+    def __init__(self):
+        self.stt_ms = []
+        self.total_ms = []
+
+    def add(self, speech_end, text_ready, dispatched):
+        stt = (text_ready - speech_end) * 1000.0
+        total = (dispatched - speech_end) * 1000.0
+        self.stt_ms.append(stt)
+        self.total_ms.append(total)
+        print(f"⏱️ Latency: STT {stt:.0f} ms | ถึงสั่งแขน {total:.0f} ms")
+
+    def summary(self):
+        if not self.total_ms: return
+        total = np.array(self.total_ms)
+        print(f"📊 {len(total)} คำสั่ง | STT เฉลี่ย {np.mean(self.stt_ms):.0f} ms | "
+              f"รวมเฉลี่ย {total.mean():.0f} ms | p95 {np.percentile(total, 95):.0f} ms")
@@ -0,0 +1,172 @@
+# audio_capture.py
+# ฟังไมค์ตลอดเวลา แล้วตัดช่วงที่มีคนพูด (VAD) ออกมาเป็นคำสั่งอัตโนมัติ ไม่ต้องกด Enter
+#
+#   ไมค์ -> RingBuffer (numpy วนซ้ำ ไม่มี list/concatenate) -> VAD ทีละเฟรม 30 ms
+#        -> เจอเสียงพูด: ส่งเสียง (รวมช่วงก่อนเริ่มพูด PRE_ROLL) เข้า StreamingTranscriber ทันที
+#        -> เงียบครบ HANGOVER: ปิดช่วงพูด แล้วส่งต่อให้ main loop ผ่าน Queue (ไม่เขียนไฟล์ WAV)
+#
+# VAD: ใช้ webrtcvad ถ้าติดตั้งไว้ (แม่นกว่าในห้องเสียงดัง) ไม่งั้นใช้พลังงานเสียงเทียบกับระดับเสียงรบกวนที่ปรับตัวเอง
+import queue
+import threading
+import time
+
+import numpy as np
+import sounddevice as sd
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+RING_SECONDS = 10.0
+PRE_ROLL_MS = 300               # เสียงก่อนเริ่มพูดที่เอาไปด้วย (กันพยางค์แรกหาย)
+START_FRAMES = 3                # เฟรมเสียงพูดติดกันกี่เฟรมถึงนับว่าเริ่มพูด
+HANGOVER_MS = 400               # เงียบนานเท่านี้ถือว่าพูดจบ
+MIN_UTTERANCE_MS = 250          # สั้นกว่านี้ทิ้ง (เสียงเคาะ/ไอ)
+MAX_UTTERANCE_MS = 5000         # ยาวกว่านี้ตัดจบเลย
+ENERGY_RATIO = 3.0              # RMS ต้องดังกว่าระดับเสียงรบกวนกี่เท่า
+ENERGY_MIN_RMS = 0.005          # ต่ำกว่านี้ถือว่าเงียบเสมอ
+NOISE_ADAPT = 0.05              # ความเร็วในการปรับระดับเสียงรบกวน (ตอนเงียบ)
+WEBRTC_AGGRESSIVENESS = 2       # 0-3
+
+
+class RingBuffer:
+    """บัฟเฟอร์เสียงขนาดคงที่ อ้างตำแหน่งด้วยจำนวน sample สะสม (absolute) ตั้งแต่เริ่มฟัง"""
+
+    def __init__(self, seconds=RING_SECONDS, samplerate=SAMPLE_RATE):
+        self.data = np.zeros(int(seconds * samplerate), np.float32)
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def write(self, chunk):
+        written, size = len(chunk), len(self.data)
+        chunk = chunk[-size:]
+        n = len(chunk)
+        with self._lock:
+            start = (self.total + written - n) % size
+            first = min(n, size - start)
+            self.data[start:start + first] = chunk[:first]
+            self.data[:n - first] = chunk[first:]
+            self.total += written
+
+    def read(self, start, end):
+        """sample ช่วง [start, end) แบบ absolute (ส่วนที่ถูกเขียนทับไปแล้วจะถูกตัดออก)"""
+        size = len(self.data)
+        with self._lock:
+            start = max(start, self.total - size, 0)
+            end = min(end, self.total)
+            if end <= start: return np.zeros(0, np.float32)
+            idx = np.arange(start, end) % size
+            return self.data[idx]
+
+
+class EnergyVAD:
+    def __init__(self):
+        self.noise = ENERGY_MIN_RMS
+
+    def is_speech(self, frame, speaking):
+        rms = float(np.sqrt(np.mean(frame * frame)))
+        speech = rms > max(self.noise * ENERGY_RATIO, ENERGY_MIN_RMS)
+        if not speech and not speaking:
+            self.noise += (rms - self.noise) * NOISE_ADAPT
+        return speech
+
+
+class WebRtcVAD:
+    def __init__(self):
+        self.vad = webrtcvad.Vad(WEBRTC_AGGRESSIVENESS)
+
+    def is_speech(self, frame, speaking):
+        pcm = (np.clip(frame, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+        return self.vad.is_speech(pcm, SAMPLE_RATE)
+
+
+class Utterance:
+    """1 ช่วงที่พูด: audio (float32), เวลาที่พูดจบ, และ stream ถ้าถอดความระหว่างพูดไปแล้ว"""
+
+    def __init__(self, audio, speech_end, stream=None):
+        self.audio = audio
+        self.speech_end = speech_end
+        self.stream = stream
+
+
+class VoiceListener:
+    """
+    เปิดไมค์ค้างไว้แล้วตัดคำสั่งอัตโนมัติ
+    make_stream() -> StreamingTranscriber ใหม่ต่อ 1 ช่วงพูด (None = ไม่ถอดความระหว่างพูด)
+    """
+
+    def __init__(self, make_stream=None, samplerate=SAMPLE_RATE):
+        self.make_stream = make_stream
+        self.samplerate = samplerate
+        self.ring = RingBuffer(samplerate=samplerate)
+        self.vad = WebRtcVAD() if webrtcvad is not None else EnergyVAD()
+        self.utterances = queue.Queue()
+        self._frames = queue.Queue()
+        self._stop = threading.Event()
+        self._stream = None
+        self._thread = None
+
+    def _callback(self, indata, frames_count, time_info, status):
+        if status: print(status)
+        frame = indata[:, 0].copy()
+        self.ring.write(frame)
+        self._frames.put((self.ring.total, frame))
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._segment_loop, name='vad', daemon=True)
+        self._thread.start()
+        self._stream = sd.InputStream(samplerate=self.samplerate, channels=1, dtype='float32',
+                                      blocksize=FRAME_SAMPLES, callback=self._callback)
+        self._stream.start()
+        print(f"🎙️ ฟังอยู่ตลอด (VAD: {type(self.vad).__name__}) พูดคำสั่งได้เลย")
+
+    def stop(self):
+        self._stop.set()
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    def _segment_loop(self):
+        frame_s = FRAME_SAMPLES / self.samplerate
+        hangover = int(HANGOVER_MS / FRAME_MS)
+        max_frames = int(MAX_UTTERANCE_MS / FRAME_MS)
+        pre_roll = int(PRE_ROLL_MS * self.samplerate / 1000)
+        speaking, run, silent, start_at, stream, fed_to = False, 0, 0, 0, None, 0
+        while not self._stop.is_set():
+            try:
+                end_at, frame = self._frames.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            voiced = self.vad.is_speech(frame, speaking)
+            if not speaking:
+                run = run + 1 if voiced else 0
+                if run < START_FRAMES: continue
+                speaking, silent = True, 0
+                start_at = end_at - run * len(frame) - pre_roll
+                stream = self.make_stream() if self.make_stream else None
+                fed_to = start_at
+            else:
+                silent = 0 if voiced else silent + 1
+            if stream is not None:
+                stream.feed(self.ring.read(fed_to, end_at))
+                fed_to = end_at
+            length = (end_at - start_at) // len(frame)
+            if silent < hangover and length < max_frames: continue
+
+            # พูดจบ (หรือยาวเกิน) -> ตัดเสียงเงียบท้ายออกแล้วส่งต่อ
+            speaking, run = False, 0
+            speech_end = time.time() - silent * frame_s
+            audio = self.ring.read(start_at, end_at - silent * len(frame))
+            if len(audio) - pre_roll < MIN_UTTERANCE_MS * self.samplerate / 1000:
+                if stream is not None: stream.cancel()
+                continue
+            self.utterances.put(Utterance(audio, speech_end, stream))
+
+    def next_utterance(self, timeout=None):
+        return self.utterances.get(timeout=timeout)
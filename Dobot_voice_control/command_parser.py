@@ -0,0 +1,226 @@
+# command_parser.py
+# แปลงข้อความที่ถอดเสียงได้ -> รายการคำสั่ง (Intent) พร้อมระยะและจำนวนครั้ง
+#
+#   parser = CommandParser(CMD_MAP)          # คอมไพล์ครั้งเดียวตอนเริ่มโปรแกรม
+#   parser.parse("left 50 then up 2 times")  # [Intent(left, 50 mm), Intent(up, x2)]
+#   parser.parse("ซ้ายห้าสิบมิลแล้วขึ้นสองครั้ง")  # ภาษาไทยไม่ต้องเว้นวรรค
+#
+# วิธีจับคำ:
+#   - อังกฤษ: ตรงตัว (dict) -> ไม่เจอค่อยหาในดัชนีคำที่ลบ 1 ตัวอักษร (symmetric delete) แทน difflib ทั้งรายการ
+#   - ไทย: Trie ตัวอักษรแบบ longest match บนข้อความที่ถอดวรรณยุกต์/เสียงพ้องออกแล้ว (เช่น ทราย ≈ ซ้าย)
+import re
+
+MOVE_ACTIONS = ("left", "right", "up", "down", "front", "back")
+
+NUMBER_WORDS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+    "ten": 10, "eleven": 11, "twelve": 12, "fifteen": 15, "twenty": 20, "thirty": 30, "forty": 40,
+    "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+    "ศูนย์": 0, "หนึ่ง": 1, "เอ็ด": 1, "สอง": 2, "ยี่": 2, "สาม": 3, "สี่": 4, "ห้า": 5, "หก": 6, "เจ็ด": 7,
+    "แปด": 8, "เก้า": 9,
+}
+NUMBER_MULTIPLIERS = {"hundred": 100, "สิบ": 10, "ร้อย": 100}
+UNIT_WORDS = {
+    "mm": 1, "millimeter": 1, "millimeters": 1, "มิล": 1, "มม": 1, "มิลลิเมตร": 1,
+    "cm": 10, "centimeter": 10, "centimeters": 10, "เซน": 10, "ซม": 10, "เซนติเมตร": 10,
+}
+REPEAT_WORDS = {"time", "times", "ครั้ง", "รอบ", "ที"}          # ตามหลังตัวเลข: "3 times", "สามรอบ"
+REPEAT_LITERALS = {"once": 1, "twice": 2, "thrice": 3}
+# คำที่เป็นทั้งคำเพี้ยนของคำสั่ง (four/for ≈ front) และตัวเลข/คำเชื่อม: ตามหลังคำสั่งขยับ -> ใช้ความหมายนี้แทน
+# ("left four" = ซ้าย 4 mm, "move left for 50" = ซ้าย 50 mm) None = ข้ามคำนี้
+AFTER_MOVE_WORDS = {"four": ("num", 4), "for": None}
+# คำเชื่อมที่ข้ามได้โดยไม่ตัดประโยค (คำอังกฤษอื่นที่ไม่รู้จัก = ตัดการต่อตัวเลข/จำนวนครั้งเข้ากับคำสั่งก่อนหน้า)
+FILLER_WORDS = {"then", "and", "move", "go", "please", "by", "the", "a"}
+
+MAX_EDIT = 1                    # จำนวนตัวอักษรที่ผิดได้ (อังกฤษ)
+FUZZY_MIN_LENGTH = 4            # คำสั้นกว่านี้ต้องตรงตัว ("up" ห้ามกลายเป็น "us")
+SHORT_FUZZY_LENGTH = 3          # ยกเว้นคำ 3 ตัวที่เกินมา 1 ตัวอักษร ("upp" -> "up") ลบได้อย่างเดียว ไม่แทน/ไม่เติม
+
+# ถอดเสียงไทยให้ใกล้กัน: ตัดวรรณยุกต์/การันต์ และรวมพยัญชนะเสียงเดียวกัน
+THAI_TONE_MARKS = re.compile('[็-์]')
+THAI_SOUND_ALIKE = (("ทร", "ซ"), ("ศ", "ส"), ("ษ", "ส"), ("ฆ", "ค"), ("ฌ", "ช"), ("ฑ", "ท"), ("ฒ", "ท"), ("ธ", "ท"))
+THAI_DIGITS = str.maketrans("๐๑๒๓๔๕๖๗๘๙", "0123456789")
+TOKEN_RE = re.compile(r'[0-9]+(?:\.[0-9]+)?|[a-z]+|[฀-๿]+')
+
+
+def thai_key(text):
+    text = THAI_TONE_MARKS.sub('', text)
+    for src, dst in THAI_SOUND_ALIKE:
+        text = text.replace(src, dst)
+    return text
+
+
+def _deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _edit_distance(a, b):
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+class Intent:
+    """action = ค่าใน CMD_MAP, magnitude = ระยะ mm (None = ค่าเริ่มต้น), repeat = จำนวนครั้ง"""
+
+    __slots__ = ("action", "magnitude", "repeat")
+
+    def __init__(self, action, magnitude=None, repeat=1):
+        self.action = action
+        self.magnitude = magnitude
+        self.repeat = repeat
+
+    @property
+    def is_move(self):
+        return self.action in MOVE_ACTIONS
+
+    def __eq__(self, other):
+        return isinstance(other, Intent) and (self.action, self.magnitude, self.repeat) == \
+            (other.action, other.magnitude, other.repeat)
+
+    def __repr__(self):
+        extra = f", {self.magnitude:g} mm" if self.magnitude is not None else ""
+        extra += f", x{self.repeat}" if self.repeat != 1 else ""
+        return f"Intent({self.action}{extra})"
+
+
+class CommandParser:
+    def __init__(self, cmd_map, max_edit=MAX_EDIT):
+        self.max_edit = max_edit
+        # token = (ชนิด, ค่า): cmd / num / mul / unit / repeat / times
+        lexicon = {}
+        for word, value in NUMBER_WORDS.items():
+            if word not in cmd_map:    # "four"/"for" เป็นคำเพี้ยนของ front ใน CMD_MAP -> ให้คำสั่งชนะ
+                lexicon[word] = ("num", value)
+        lexicon.update({w: ("mul", v) for w, v in NUMBER_MULTIPLIERS.items()})
+        lexicon.update({w: ("unit", v) for w, v in UNIT_WORDS.items()})
+        lexicon.update({w: ("repeat", None) for w in REPEAT_WORDS})
+        lexicon.update({w: ("times", v) for w, v in REPEAT_LITERALS.items()})
+        lexicon.update({w.lower(): ("cmd", v) for w, v in cmd_map.items()})
+
+        self.exact = {w: tok for w, tok in lexicon.items() if w.isascii()}
+        self.fuzzy_index = {}
+        for word in self.exact:
+            if len(word) < FUZZY_MIN_LENGTH: continue
+            for key in {word} | _deletes(word):
+                self.fuzzy_index.setdefault(key, set()).add(word)
+
+        self.trie = {}
+        for word, tok in lexicon.items():
+            if word.isascii(): continue
+            node = self.trie
+            for ch in thai_key(word):
+                node = node.setdefault(ch, {})
+            node.setdefault("$", tok)   # คำที่ถอดเสียงแล้วซ้ำกัน: ตัวแรกชนะ
+
+    # ----------------- จับคำ -----------------
+
+    def _lookup_ascii(self, word):
+        tok = self.exact.get(word)
+        if tok is not None: return tok
+        if len(word) < FUZZY_MIN_LENGTH:
+            if len(word) != SHORT_FUZZY_LENGTH: return None
+            matches = sorted(key for key in _deletes(word) if key in self.exact)
+            if not matches: return None
+            print(f"✨ เจอคำใกล้เคียง: '{word}' ≈ '{matches[0]}'")
+            return self.exact[matches[0]]
+        candidates = set(self.fuzzy_index.get(word, ()))
+        for key in _deletes(word):
+            candidates |= self.fuzzy_index.get(key, set())
+        best = None
+        for cand in candidates:
+            dist = _edit_distance(word, cand)
+            if dist <= self.max_edit and (best is None or dist < best[0] or (dist == best[0] and cand < best[1])):
+                best = (dist, cand)
+        if best is None: return None
+        print(f"✨ เจอคำใกล้เคียง: '{word}' ≈ '{best[1]}'")
+        return self.exact[best[1]]
+
+    def _scan_thai(self, run):
+        """Longest match ทีละตำแหน่ง ตัวอักษรที่ไม่รู้จักข้ามไป"""
+        text = thai_key(run)
+        tokens, i = [], 0
+        while i < len(text):
+            node, j, found = self.trie, i, None
+            while j < len(text) and text[j] in node:
+                node = node[text[j]]
+                j += 1
+                if "$" in node: found = (j, node["$"])
+            if found:
+                i = found[0]
+                tokens.append(found[1])
+            else:
+                i += 1
+        return tokens
+
+    def tokenize(self, text):
+        """ข้อความ -> [(ชนิด, ค่า)] คำอังกฤษที่ไม่รู้จักเป็น ("unknown", คำ) ให้ parse ใช้ตัดประโยค"""
+        tokens = []
+        for raw in TOKEN_RE.findall(text.lower().translate(THAI_DIGITS)):
+            if raw[0].isdigit():
+                tokens.append(("digits", float(raw)))
+            elif raw in AFTER_MOVE_WORDS and tokens and tokens[-1][0] == "cmd" and tokens[-1][1] in MOVE_ACTIONS:
+                if AFTER_MOVE_WORDS[raw] is not None: tokens.append(AFTER_MOVE_WORDS[raw])
+            elif raw in FILLER_WORDS:
+                continue
+            elif raw.isascii():
+                tok = self._lookup_ascii(raw)
+                tokens.append(tok if tok is not None else ("unknown", raw))
+            else:
+                tokens.extend(self._scan_thai(raw))
+        return self._join_numbers(tokens)
+
+    @staticmethod
+    def _join_numbers(tokens):
+        """คำตัวเลขติดกัน -> ตัวเลขเดียว (ห้า สิบ ห้า -> 55, fifty five -> 55)"""
+        out, total, cur, active = [], 0, 0, False
+        for kind, value in tokens:
+            if kind == "num":
+                cur, active = cur + value, True
+                continue
+            if kind == "mul":
+                total, cur, active = total + (cur or 1) * value, 0, True
+                continue
+            if active:
+                out.append(("num", total + cur))
+                total, cur, active = 0, 0, False
+            out.append((kind, value))
+        if active: out.append(("num", total + cur))
+        return out
+
+    # ----------------- ไวยากรณ์ -----------------
+
+    def parse(self, text):
+        """ข้อความ -> [Intent] ตามลำดับที่พูด"""
+        if not text: return []
+        tokens = self.tokenize(text)
+        intents, pending_mag, pending_rep, broken = [], None, None, False
+        for i, (kind, value) in enumerate(tokens):
+            nxt = tokens[i + 1] if i + 1 < len(tokens) else (None, None)
+            # มีคำที่ไม่รู้จักคั่นหลังคำสั่งล่าสุด -> ตัวเลข/จำนวนครั้งที่ตามมาไม่ใช่ของคำสั่งนั้น
+            last = intents[-1] if intents and not broken else None
+            if kind == "cmd":
+                intent = Intent(value)
+                if intent.is_move and pending_mag is not None: intent.magnitude = pending_mag
+                if pending_rep is not None: intent.repeat = pending_rep
+                pending_mag = pending_rep = None
+                broken = False
+                intents.append(intent)
+            elif kind == "unknown":
+                broken = True
+            elif kind in ("num", "digits"):
+                if nxt[0] == "repeat":
+                    if last is not None and last.repeat == 1: last.repeat = max(1, int(value))
+                    else: pending_rep = max(1, int(value))
+                else:
+                    magnitude = value * (nxt[1] if nxt[0] == "unit" else 1)
+                    if last is not None and last.is_move and last.magnitude is None: last.magnitude = magnitude
+                    else: pending_mag = magnitude
+            elif kind == "times":
+                if last is not None: last.repeat = value
+                else: pending_rep = value
+        return intents
@@ -1,18 +1,31 @@
 # voice_control.py (V3: Fuzzy Logic + Smart Matching)
+import os
+import sys
 import time
-import wave
 import numpy as np
 import sounddevice as sd
-from pydobot import Dobot
-from difflib import get_close_matches # <--- พระเอกของเรา (ช่วยหาคำใกล้เคียง)
+from command_parser import CommandParser
 
 # เรียกใช้ฟังก์ชันถอดเสียง
-from NLP import transcribe_wav 
+import NLP
+from NLP import transcribe_audio_google, LocalRecognizer, StreamingTranscriber, LatencyStats
+from audio_capture import VoiceListener
+
+# ไลบรารีกลางของ repo (ต่อ Dobot / ใช้แขนร่วมกับแอปอื่นผ่าน arm server / บันทึก/เล่นซ้ำเส้นทาง)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dobot_common.arm_server import PRIORITY_NORMAL, open_arm
+from dobot_common.trajectory import Trajectory, TrajectoryRecorder, TrajectoryPlayer
 
 # --- การตั้งค่า ---
-PORT = "COM3"
+PORT = os.environ.get("DOBOT_PORT")     # None = หา Port ของ Dobot เอง
 STEP = 20
-MEMORY_POINTS = []
+MAX_STEP_MM = 100       # ระยะที่พูดสั่งได้ต่อครั้ง (มากกว่านี้ถือว่าฟังผิด ไม่ขยับ)
+MAX_REPEAT = 10         # จำนวนครั้งสูงสุดต่อคำสั่ง
+# จุดที่จำไว้ + การดูด/ปล่อย เก็บลงไฟล์ (ปิดโปรแกรมแล้วไม่หาย)
+MEMORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trajectories", "voice_memory.dtraj")
+PLAY_TIME_SCALE = None   # None = เล่นเร็วสุดของแขน, 1.0 = ตามจังหวะที่สั่งไว้
+# vad = ฟังตลอดแล้วตัดคำสั่งเอง (ไม่ต้องกดปุ่ม), enter = กด Enter เริ่ม/จบแบบเดิม
+LISTEN_MODE = os.environ.get('DOBOT_LISTEN_MODE', 'vad')
 
 # ==========================================
 # 🗺️ แผนที่คำสั่ง (รวมคำผิดที่พบบ่อย)
@@ -39,7 +52,11 @@ CMD_MAP = {
 # ==============================
 # 1) ฟังก์ชันอัดเสียง
 # ==============================
-def record_until_enter(filename: str = "record.wav", samplerate: int = 16000, channels: int = 1) -> str:
+def record_until_enter(samplerate: int = 16000, channels: int = 1, stream_to=None):
+    """
+    คืนเสียง float32 (mono) ในหน่วยความจำ
+    stream_to = StreamingTranscriber -> ส่งเสียงให้ถอดความระหว่างอัด (คืน None)
+    """
     print("\n" + "-"*30)
     input("🎤 กด Enter เพื่ออัดเสียง... (แล้วพูดคำสั่ง)")
     print("⏺️  กำลังรับฟัง... (พูดจบแล้วกด Enter)")
@@ -47,146 +64,215 @@ def record_until_enter(filename: str = "record.wav", samplerate: int = 16000, ch
 
     def callback(indata, frames_count, time_info, status):
         if status: print(status)
-        frames.append(indata.copy())
+        if stream_to is not None:
+            stream_to.feed(indata[:, 0])
+        else:
+            frames.append(indata.copy())
 
-    stream = sd.InputStream(samplerate=samplerate, channels=channels, callback=callback)
+    stream = sd.InputStream(samplerate=samplerate, channels=channels, dtype='float32', callback=callback)
     stream.start()
     input()
     stream.stop()
     stream.close()
+    if stream_to is not None: return None
 
-    audio_data = np.concatenate(frames, axis=0) if frames else np.zeros((1, channels), dtype=np.float32)
-    with wave.open(filename, "wb") as wf:
-        wf.setnchannels(channels)
-        wf.setsampwidth(2)
-        wf.setframerate(samplerate)
-        wf.writeframes((audio_data * 32767).astype(np.int16).tobytes())
-    
-    return filename
+    return np.concatenate(frames, axis=0)[:, 0] if frames else np.zeros(1, dtype=np.float32)
 
 # ==============================
 # 2) ฟังก์ชันสมองกล (Smart Command)
 # ==============================
+# คอมไพล์ครั้งเดียว (ดัชนีคำอังกฤษ + Trie ภาษาไทย) แทนการไล่ difflib ทุกคำทุกครั้ง
+COMMAND_PARSER = CommandParser(CMD_MAP)
+
 def normalize_command(text: str):
     """
-    ค้นหาคำสั่งแบบ Fuzzy (ใกล้เคียงก็รับ)
+    ข้อความ -> รายการ Intent (คำสั่ง + ระยะ + จำนวนครั้ง)
+    เช่น "left 50 then up twice" -> [left 50 mm, up x2]
     """
-    if not text: return None
-    
-    # 1. แปลงเป็นตัวพิมพ์เล็ก และแยกเป็นคำๆ
-    words = text.lower().split()
-    all_keys = list(CMD_MAP.keys())
-
-    print(f"🔍 วิเคราะห์คำ: {words}")
-
-    for word in words:
-        # A. เช็คแบบตรงตัว (Exact Match)
-        if word in CMD_MAP:
-            return CMD_MAP[word]
-        
-        # B. เช็คแบบใกล้เคียง (Fuzzy Match) 
-        # cutoff=0.7 แปลว่า เหมือนกัน 70% ขึ้นไปถึงจะเอา (เช่น 'writting' -> 'right' อาจจะไม่ถึง แต่ 'write' -> 'right' ถึง)
-        matches = get_close_matches(word, all_keys, n=1, cutoff=0.7)
-        if matches:
-            best_match = matches[0]
-            print(f"✨ เจอคำใกล้เคียง: '{word}' ≈ '{best_match}'")
-            return CMD_MAP[best_match]
-
-    return None
+    if not text: return []
+    intents = COMMAND_PARSER.parse(text)
+    print(f"🔍 วิเคราะห์คำ: {intents}")
+    return intents
+
+def is_command(text):
+    """ข้อความนี้มีคำสั่งที่รู้จักไหม (ให้ Google เลือกภาษาที่ถอดได้เป็นคำสั่ง)"""
+    return bool(COMMAND_PARSER.parse(text))
 
 def get_xyzr(device):
     pose = device.pose()
     return pose[:4]
 
+MOVE_VECTORS = {
+    "left":  (0, -1,  0, 0), "right": (0,  1,  0, 0),
+    "front": (1,  0,  0, 0), "back":  (-1, 0,  0, 0),
+    "up":    (0,  0,  1, 0), "down":  (0,  0, -1, 0),
+}
+
 def move_relative(device, direction, step=STEP):
-    vec = {
-        "left":  (0, -1,  0, 0), "right": (0,  1,  0, 0),
-        "front": (1,  0,  0, 0), "back":  (-1, 0,  0, 0),
-        "up":    (0,  0,  1, 0), "down":  (0,  0, -1, 0),
-    }.get(direction)
-
-    if vec:
-        dx, dy, dz, dr = vec
-        x, y, z, r = get_xyzr(device)
-        device.move_to(x + dx*step, y + dy*step, z + dz*step, r + dr*step)
-        print(f"✅ ขยับ {direction}")
+    move_path(device, [(direction, step)])
+
+def move_path(device, steps):
+    """
+    ขยับหลายช่วงต่อกัน [(ทิศ, ระยะ mm), ...]
+    อ่านตำแหน่งครั้งเดียว แล้วส่งทุกจุดเข้าคิวของแขน รอแค่จุดสุดท้าย
+    """
+    x, y, z, r = get_xyzr(device)
+    for i, (direction, step) in enumerate(steps):
+        dx, dy, dz, dr = MOVE_VECTORS[direction]
+        x, y, z, r = x + dx*step, y + dy*step, z + dz*step, r + dr*step
+        device.move_to(x, y, z, r, wait=(i == len(steps) - 1))
+        print(f"✅ ขยับ {direction} {step:g} mm")
+
+def load_memory():
+    if os.path.exists(MEMORY_FILE):
+        try:
+            traj = Trajectory.load(MEMORY_FILE)
+            print(f"📂 โหลดความจำเดิม {len(traj)} รายการ")
+            return TrajectoryRecorder(trajectory=traj)
+        except Exception as e:
+            print(f"⚠️ โหลด {MEMORY_FILE} ไม่ได้: {e}")
+    return TrajectoryRecorder()
+
+def save_memory(memory):
+    memory.snapshot(source="voice_control").save(MEMORY_FILE)
+
+def load_recognizer():
+    """Whisper บนเครื่อง (โหลดครั้งเดียว) หรือ None = ใช้ Google แบบเดิม"""
+    if NLP.STT_BACKEND != "whisper": return None
+    try:
+        # Prompt ใช้เฉพาะคำสั่งจริง (ไทย + อังกฤษ) ไม่ใส่คำเพี้ยนอย่าง write/app
+        prompt_words = set(CMD_MAP.values()) | {k for k in CMD_MAP if not k.isascii()}
+        return LocalRecognizer(vocabulary=CMD_MAP.keys(), prompt_words=prompt_words)
+    except Exception as e:
+        print(f"⚠️ ใช้ Whisper ไม่ได้ ({e}) -> ใช้ Google แทน")
+        return None
+
+def start_listener(recognizer):
+    """โหมด vad: เปิดไมค์ค้างไว้ (None = โหมด enter)"""
+    if LISTEN_MODE != "vad": return None
+    make_stream = (lambda: StreamingTranscriber(recognizer)) if recognizer is not None else None
+    listener = VoiceListener(make_stream)
+    listener.start()
+    return listener
+
+def listen(recognizer, listener=None):
+    """ฟัง 1 คำสั่ง -> (ข้อความ, เวลาที่หยุดพูด, เวลาที่ได้ข้อความ)"""
+    if listener is not None:
+        utt = listener.next_utterance()
+        speech_end = utt.speech_end
+        text = utt.stream.finish() if utt.stream is not None else transcribe_audio_google(utt.audio, accept=is_command)
+    elif recognizer is not None:
+        stream = StreamingTranscriber(recognizer)
+        record_until_enter(stream_to=stream)
+        speech_end = time.time()
+        text = stream.finish()
+    else:
+        audio = record_until_enter()
+        speech_end = time.time()
+        text = transcribe_audio_google(audio, accept=is_command)
+    return text, speech_end, time.time()
 
 def connect_dobot(port=PORT):
-    print(f"🚀 เชื่อมต่อ {port}...")
+    print(f"🚀 เชื่อมต่อ {port or 'Dobot (ค้นหา Port อัตโนมัติ)'}...")
     try:
-        device = Dobot(port=port, verbose=False)
+        device = open_arm("voice", PRIORITY_NORMAL, port)
         time.sleep(1)
-        try:
-            device.ser.reset_input_buffer()
-            device.ser.reset_output_buffer()
-        except: pass
         print("✅ Ready!")
         return device
     except Exception as e:
         print(f"❌ Error: {e}")
         return None
 
+def run_intents(device, intents, memory, player):
+    """ทำทีละ Intent ตามลำดับ (การขยับที่ติดกันรวมเป็นเส้นทางเดียวที่ส่งเข้าคิวต่อเนื่อง)"""
+    rejected = [i for i in intents if i.repeat > MAX_REPEAT or (i.magnitude is not None and not 0 < i.magnitude <= MAX_STEP_MM)]
+    if rejected:
+        # ระยะ 0/เกินขีดจำกัด หรือจำนวนครั้งเกิน = น่าจะฟังผิด ไม่ทำทั้งประโยค (ทำแค่บางส่วนแขนจะไปอยู่ผิดที่)
+        print(f"⚠️ ไม่ทำคำสั่ง: {rejected} อยู่นอกขีดจำกัด (1-{MAX_STEP_MM} mm / {MAX_REPEAT} ครั้ง)")
+        return
+    steps = []
+    for intent in intents + [None]:
+        if intent is not None and intent.is_move:
+            steps.extend([(intent.action, STEP if intent.magnitude is None else intent.magnitude)] * intent.repeat)
+            continue
+        if steps:
+            move_path(device, steps)
+            steps = []
+        if intent is None: break
+        for _ in range(intent.repeat):
+            run_command(device, intent.action, memory, player)
+
+def run_command(device, cmd, memory, player):
+    """คำสั่งที่ไม่ใช่การขยับ"""
+    if cmd == "suck":
+        device.suck(True)
+        memory.add_event("suction", True)
+        save_memory(memory)
+        print("💨 ดูดจ๊วบ!")
+    elif cmd == "release":
+        device.suck(False)
+        memory.add_event("suction", False)
+        save_memory(memory)
+        print("🍃 ปล่อยของ")
+
+    elif cmd == "save":
+        memory.add_pose(get_xyzr(device))
+        save_memory(memory)
+        print(f"💾 จำจุดที่ {len(memory.snapshot().poses())}")
+    
+    elif cmd == "clear":
+        memory.clear()
+        save_memory(memory)
+        print("🗑️ ล้างสมองแล้ว")
+
+    elif cmd == "play":
+        traj = memory.snapshot()
+        if not len(traj):
+            print("⚠️ ไม่มีข้อมูลให้เล่น")
+        else:
+            print(f"▶️ Replay {len(traj)} รายการ (ส่งเข้าคิวต่อเนื่อง)...")
+            player.play(traj, time_scale=PLAY_TIME_SCALE)
+            print("✅ จบ")
+
 # ==============================
 # 3) Main Loop
 # ==============================
 def main():
     device = connect_dobot(PORT)
     if not device: return
+    memory = load_memory()
+    player = TrajectoryPlayer(device)
+    recognizer = load_recognizer()
+    listener = start_listener(recognizer)
+    latency = LatencyStats()
 
     print("\n🎧 Voice V3 (Smart Fuzzy Mode)")
     print("รองรับคำเพี้ยน เช่น Write->Right, App->Up")
 
     try:
         while True:
-            wav = record_until_enter()
-            text = transcribe_wav(wav)
+            text, speech_end, text_ready = listen(recognizer, listener)
             
             if not text: 
                 print("🤷‍♂️ เงียบกริบ...")
                 continue
 
             print(f"🗣️  ได้ยิน: '{text}'")
-            cmd = normalize_command(text)
+            intents = normalize_command(text)
 
-            if not cmd:
+            if not intents:
                 print("🤔 ไม่เข้าใจ (ลองพูดใหม่)")
                 continue
 
-            print(f"🤖 สั่งงาน: {cmd.upper()}")
-
-            # --- ส่วนจัดการคำสั่ง (เหมือนเดิม) ---
-            if cmd in ["left", "right", "up", "down", "front", "back"]:
-                move_relative(device, cmd, STEP)
-
-            elif cmd == "suck":
-                device.suck(True)
-                print("💨 ดูดจ๊วบ!")
-            elif cmd == "release":
-                device.suck(False)
-                print("🍃 ปล่อยของ")
-
-            elif cmd == "save":
-                pos = get_xyzr(device)
-                MEMORY_POINTS.append(pos)
-                print(f"💾 จำจุดที่ {len(MEMORY_POINTS)}")
-            
-            elif cmd == "clear":
-                MEMORY_POINTS.clear()
-                print("🗑️ ล้างสมองแล้ว")
-
-            elif cmd == "play":
-                if not MEMORY_POINTS:
-                    print("⚠️ ไม่มีข้อมูลให้เล่น")
-                else:
-                    print(f"▶️ Replay {len(MEMORY_POINTS)} จุด...")
-                    for i, pos in enumerate(MEMORY_POINTS):
-                        print(f"   -> จุด {i+1}")
-                        device.move_to(pos[0], pos[1], pos[2], pos[3], wait=True)
-                    print("✅ จบ")
+            print(f"🤖 สั่งงาน: {' -> '.join(i.action.upper() for i in intents)}")
+            latency.add(speech_end, text_ready, time.time())
+            run_intents(device, intents, memory, player)
 
     except KeyboardInterrupt:
         print("\n👋 บาย")
     finally:
+        if listener: listener.stop()
+        latency.summary()
         if device: device.close()
 
 if __name__ == "__main__":
@@ -1,26 +1,18 @@
+import os
+import sys
 import time
 import cv2
-import numpy as np
-import serial.tools.list_ports
-from pydobot import Dobot
-# ไม่ต้องใช้ threading แล้ว เพราะเราจัดการกล้องแบบเปิด-ปิดชั่วคราว
-
-# ----------------- Find Dobot Port -----------------
-def find_dobot_port():
-    ports = list(serial.tools.list_ports.comports())
-    for p in ports:
-        print("Found port:", p.device, "-", p.description)
-        # ตรวจสอบพอร์ต Dobot
-        if "ttyACM" in p.device or "ttyUSB" in p.device:
-            return p.device
-    return None
-
-port = find_dobot_port()
-if not port:
-    raise Exception("Dobot not found. เช็คการเชื่อมต่อ USB หรือ COMXX บน Windows")
-
-dobot = Dobot(port=port)
-print("Connected to Dobot on:", port)
+from sort_scheduler import SortingScheduler
+from camera_stream import CameraStream
+import vision_pickup
+from color_classifier import ColorClassifier
+
+# ไลบรารีกลางของ repo (หา Port / ต่อ Dobot / คิวคำสั่ง / ใช้แขนร่วมกับแอปอื่นผ่าน arm server)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dobot_common.arm_server import PRIORITY_BACKGROUND, open_arm
+
+# ----------------- Connect to Dobot -----------------
+dobot = open_arm("color_sorting", PRIORITY_BACKGROUND, verbose=True)
 
 # ------------------------------------------------------
 # 2) ตั้งค่าพิกัดของจุดต่างๆ
@@ -45,113 +37,49 @@ drop_points = {
     "Blue":  {"x": 84.56,   "y": 185.00,  "z": 1}
 }
 
-# ------------------------------------------------------
-# 3) ฟังก์ชันการตรวจจับสี (เปิด-อ่าน-ปิดกล้อง)
-# ------------------------------------------------------
-def detect_color_from_frame():
-    # ใช้ Global cap เพื่อจัดการทรัพยากร
-    cap = None 
-    
-    # พารามิเตอร์ตรวจจับ
-    ROI_SIZE = 10 # รัศมี 10 พิกเซล (พื้นที่ 20x20)
-
-    # 1. เปิดกล้องชั่วคราว
-    cap = cv2.VideoCapture(1)
-    if not cap.isOpened():
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            print("[ERROR] Cannot open camera for color detection.")
-            return "Unknown"
-    
-    # 2. อ่านภาพและปิดกล้อง
-    ret, frame = cap.read()
-    cap.release() 
-    
-    # 3. วิเคราะห์สี
-    if not ret:
-        print("[WARN] Failed to read frame for color detection.")
-        return "Unknown"
-
-    h, w, _ = frame.shape
-    cx, cy = w // 2, h // 2
-    
-    # กำหนด ROI
-    y1 = max(0, cy - ROI_SIZE)
-    y2 = min(h, cy + ROI_SIZE)
-    x1 = max(0, cx - ROI_SIZE)
-    x2 = min(w, cx + ROI_SIZE)
-    
-    roi_frame = frame[y1:y2, x1:x2]
-    
-    if roi_frame.size == 0:
-        return "Unknown"
-
-    hsv_roi = cv2.cvtColor(roi_frame, cv2.COLOR_BGR2HSV)
-    mean_hsv = np.mean(hsv_roi, axis=(0, 1))
-    h_val = mean_hsv[0] 
-
-    # 4. เกณฑ์การตรวจจับสี (Hue-based)
-    if (h_val < 10) or (h_val > 160):
-        return "Red"
-    elif 35 <= h_val <= 85:
-        return "Green"
-    elif 90 <= h_val <= 130:
-        return "Blue"
-    else:
-        return "Unknown"
+# สี/กล่องเพิ่มเติมกำหนดใน color_classes.json ได้เลย (classes.<สี>.drop_point)
+classifier = ColorClassifier.load()
+drop_points.update(classifier.drop_points())
 
 # ------------------------------------------------------
-# 4) ฟังก์ชันหลัก: pick → check → drop
+# 3) ฟังก์ชันการตรวจจับสี
 # ------------------------------------------------------
-def pick_and_sort(dobot, p_point):
-    print("\n👉 3. ไปตำแหน่ง pickup:", p_point)
-
-    # A. ไปเหนือจุดดูด (ปลอดภัย)
-    dobot.move_to(p_point["x"], p_point["y"], p_point["z"] + 40, r=0, wait=True)
-    # B. ลงไปที่จุดดูด
-    dobot.move_to(p_point["x"], p_point["y"], p_point["z"],      r=0, wait=True)
-    time.sleep(0.5)
-
-    dobot.suck(True) # ดูดวัตถุ
-    time.sleep(1) 
-
-    # C. ยกขึ้น
-    dobot.move_to(p_point["x"], p_point["y"], p_point["z"] + 55, r=0, wait=True)
-
-    # 4. ไปตำแหน่งกล้องเพื่อเช็คสี
-    print("👉 4. นำวัตถุไปหน้ากล้องเพื่อเช็คสี...")
-    dobot.move_to(camera_point["x"], camera_point["y"], camera_point["z"], r=0, wait=True)
-
-    time.sleep(1.0) # รอให้วัตถุหยุดนิ่ง
-    
-    color = detect_color_from_frame()
-    print("   สีที่ตรวจพบ:", color)
 
-    # 5. กลับไป start position ชั่วคราว (ตามที่คุณระบุ)
-    print("👉 5. กลับไปจุดเริ่มต้นชั่วคราว...")
-    dobot.move_to(start_point["x"], start_point["y"], start_point["z"], r=0, wait=True)
+# กล้องเปิดค้างไว้ตลอดโปรแกรม มี Thread อ่านภาพล่าสุดไว้ให้เสมอ
+camera = CameraStream()
+camera.start()
 
+def classify_color(frame):
+    """ภาพ BGR -> สีของวัตถุตรงกลางภาพ (ทุกพิกเซลใน ROI โหวต ดู color_classifier.py)"""
+    color, confidence = classifier.classify_roi(frame)
+    print(f"   ความมั่นใจ: {confidence * 100:.0f}%")
+    return color
 
-    # 6. ไปวางสีไว้เเต่ละกล่อง ของสีนั้นๆ 
-    if color not in drop_points:
-        print("   สีไม่รู้จัก → ปล่อยไว้ที่จุดเริ่มต้น")
-        dobot.suck(False)
-        return
-
-    drop = drop_points[color]
-    print(f"👉 6. นำไปวางสี {color} ที่กล่อง")
-
-    # A. ไปเหนือจุด Drop
-    dobot.move_to(drop["x"], drop["y"], drop["z"] + 40, r=0, wait=True)
-    # B. ลงไปที่จุด Drop
-    dobot.move_to(drop["x"], drop["y"], drop["z"],      r=0, wait=True)
-
-    # 7. ปล่อย
-    dobot.suck(False) 
-    time.sleep(0.5)
-
-    # C. ยกขึ้นจากจุด Drop
-    dobot.move_to(drop["x"], drop["y"], drop["z"] + 40, r=0, wait=True)
+# ------------------------------------------------------
+# 4) รอบคัดแยก: วางแผนเป็นคิวคำสั่งต่อเนื่อง (ดู sort_scheduler.py)
+# ------------------------------------------------------
+def run_sorting_cycle(dobot):
+    # รอภาพนิ่งจากภาพใหม่ของ Grabber แล้วจำแนกสีจากภาพนิ่งภาพนั้น (ไม่ใช่ภาพล่าสุดตอนแขนยกออกแล้ว)
+    scheduler = SortingScheduler(dobot, classify_color, camera.next_frame_fn(),
+                                 pickup_points, camera_point, drop_points, start_point)
+    return scheduler.run()
+
+def run_vision_cycle(dobot):
+    """โหมดกล้องด้านบน: หาวัตถุทุกชิ้นจากภาพเดียว แล้วหยิบตามลำดับที่เดินทางสั้นที่สุด"""
+    try:
+        H, pick_z = vision_pickup.load_calibration()
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[ERROR] ยังไม่ได้ calibrate กล้องด้านบน ({e}) -> python vision_pickup.py --calibrate")
+        return None
+    frame = camera.average()
+    if frame is None:
+        print("[WARN] Failed to read frame for object detection.")
+        return None
+    targets = vision_pickup.locate_targets(frame, H, pick_z, start_point, drop_points, classifier)
+    print(f"   พบวัตถุ {len(targets)} ชิ้น: {[c for _, c in targets]}")
+    if not targets: return None
+    scheduler = SortingScheduler(dobot, None, None, [], camera_point, drop_points, start_point)
+    return scheduler.run_targets(targets)
 
 # ------------------------------------------------------
 # 5) Main Loop: ทำงานตามขั้นตอน 1, 2, 8, 9
@@ -164,7 +92,7 @@ dobot.move_to(start_point["x"], start_point["y"], start_point["z"], r=0, wait=Tr
 try:
     while True:
         print("\n--- Control Panel ---")
-        print("Enter 1 to start sorting cycle / Enter q to quit program")
+        print("Enter 1 to start sorting cycle / 2 for overhead-camera cycle / q to quit program")
         user_input = input(" : ")
         
         # 2. รอคำสั่ง 1 คือเริ่ม
@@ -175,16 +103,14 @@ try:
         if user_input == '1':
             print("--- Starting Sorting Cycle (8. ทำสีที่เหลือให้ครบทั้ง 3 จุด) ---")
             
-            # วนลูปทำงานครบทั้ง 3 ตำแหน่งดูด
-            for i, p in enumerate(pickup_points):
-                print(f"\n--- Process Item {i+1} of {len(pickup_points)} ---")
-                pick_and_sort(dobot, p)
+            # วนลูปทำงานครบทั้ง 3 ตำแหน่งดูด แล้วกลับ start position (9.) ในคิวเดียวกัน
+            run_sorting_cycle(dobot)
 
             print("--- Sorting Cycle Finished ---")
-            
-            # 9. และกลับมา start position
-            print("👉 9. กลับไป Start Position")
-            dobot.move_to(start_point["x"], start_point["y"], start_point["z"], r=0, wait=True)
+        elif user_input == '2':
+            print("--- Starting Overhead Vision Cycle ---")
+            run_vision_cycle(dobot)
+            print("--- Sorting Cycle Finished ---")
         else:
             # ถ้ากดอย่างอื่นไม่ต้องทำอะไร
             time.sleep(0.1) 
@@ -198,4 +124,5 @@ finally:
     # ------------------------------------------------------
     print("\n[SYSTEM] Closing Dobot and Camera.")
     dobot.close()
+    camera.stop()
     cv2.destroyAllWindows()
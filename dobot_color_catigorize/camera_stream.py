@@ -0,0 +1,113 @@
+# camera_stream.py
+# เปิดกล้องครั้งเดียวตลอดโปรแกรม แล้วให้ Thread อ่านภาพใหม่ตลอดเวลา
+# ผู้ใช้ได้ภาพล่าสุดทันที (ไม่ต้องรอเปิดกล้อง/ปรับแสงใหม่ทุกชิ้น)
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+CAMERA_INDICES = (1, 0)         # ลองตามลำดับ (กล้อง USB ก่อน แล้วค่อยกล้องในเครื่อง)
+WARMUP_FRAMES = 10              # ทิ้งภาพแรกๆ ระหว่างกล้องปรับแสงอัตโนมัติ
+AVERAGE_FRAMES = 3              # จำนวนภาพล่าสุดที่เก็บไว้เฉลี่ยลด Noise
+READ_FAIL_REOPEN = 30           # อ่านพลาดติดกันเท่านี้ -> เปิดกล้องใหม่
+
+
+class CameraStream:
+    def __init__(self, indices=CAMERA_INDICES, history=AVERAGE_FRAMES):
+        self.indices = indices
+        self._cap = None
+        self._frames = deque(maxlen=history)
+        self._seq = 0
+        self._stamp = 0.0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _open(self):
+        for index in self.indices:
+            cap = cv2.VideoCapture(index)
+            if cap.isOpened():
+                cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)   # ไม่ให้ Driver เก็บภาพเก่าค้างคิว
+                for _ in range(WARMUP_FRAMES):
+                    cap.read()
+                print(f"📷 เปิดกล้อง index {index}")
+                return cap
+            cap.release()
+        return None
+
+    def start(self):
+        self._cap = self._open()
+        if self._cap is None:
+            print("[ERROR] Cannot open camera for color detection.")
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._grab_loop, name='camera-grabber', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def _grab_loop(self):
+        failures = 0
+        while not self._stop.is_set():
+            ret, frame = self._cap.read() if self._cap is not None else (False, None)
+            if not ret:
+                failures += 1
+                if failures >= READ_FAIL_REOPEN:
+                    print("[WARN] กล้องไม่ส่งภาพ กำลังเปิดใหม่...")
+                    if self._cap is not None: self._cap.release()
+                    self._cap = self._open()
+                    failures = 0
+                    if self._cap is None: self._stop.wait(1.0)
+                else:
+                    time.sleep(0.01)
+                continue
+            failures = 0
+            with self._cond:
+                self._frames.append(frame)
+                self._seq += 1
+                self._stamp = time.time()
+                self._cond.notify_all()
+
+    # ----------------- ผู้ใช้ -----------------
+
+    def latest(self):
+        """(ภาพล่าสุด, เลขลำดับภาพ) ทันที (None ถ้ายังไม่มีภาพ)"""
+        with self._cond:
+            return (self._frames[-1] if self._frames else None), self._seq
+
+    def age(self):
+        """อายุของภาพล่าสุด (วินาที)"""
+        with self._cond:
+            return time.time() - self._stamp if self._seq else float('inf')
+
+    def wait_new(self, after_seq, timeout=1.0):
+        """รอภาพที่ใหม่กว่า after_seq (ใช้ตอนต้องการภาพที่ถ่ายหลังแขนหยุดแล้ว)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq or self._stop.is_set(), timeout)
+            return (self._frames[-1] if self._frames else None), self._seq
+
+    def average(self):
+        """ค่าเฉลี่ยของภาพล่าสุด AVERAGE_FRAMES ภาพ (ลด Noise ของกล้อง)"""
+        with self._cond:
+            frames = list(self._frames)
+        if not frames: return None
+        if len(frames) == 1: return frames[0]
+        return np.mean(np.stack(frames), axis=0).astype(np.uint8)
+
+    def next_frame_fn(self):
+        """ฟังก์ชัน grab_frame() ที่คืนภาพใหม่ทุกครั้งที่เรียก (สำหรับ wait_settled)"""
+        seq = [self.latest()[1]]
+        def grab():
+            frame, seq[0] = self.wait_new(seq[0])
+            return frame
+        return grab
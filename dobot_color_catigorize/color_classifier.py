@@ -0,0 +1,191 @@
+# color_classifier.py
+# จำแนกสีจากไฟล์ calibrate (color_classes.json) แทนเกณฑ์ Hue ที่เขียนตายตัวในโค้ด
+#
+# - แต่ละสีเก็บค่าเฉลี่ย/ส่วนเบี่ยงเบนในปริภูมิสี (lab หรือ hsv) -> เพิ่มสี/กล่องใหม่ได้โดยแก้แค่ไฟล์
+# - ทุกพิกเซลใน ROI "โหวต" ให้สีที่ใกล้ที่สุด (คำนวณพร้อมกันทั้ง ROI ด้วย numpy)
+#   พิกเซลที่ไกลจากทุกสีเกิน reject_distance ไม่นับ (เงา, พื้นหลัง, ขอบวัตถุ)
+# - confidence = สัดส่วนพิกเซลที่โหวตให้สีที่ชนะ ต่ำกว่า min_confidence -> "Unknown"
+#
+#   python color_classifier.py --fit crops/ --out color_classes.json   # สร้างไฟล์จากภาพตัวอย่าง
+#   python color_classifier.py --benchmark crops/                      # วัดความแม่นยำ/ความเร็ว
+#
+# โครงสร้างโฟลเดอร์ภาพตัวอย่าง: crops/<ชื่อสี>/*.png (ภาพครอปเฉพาะวัตถุ)
+import argparse
+import glob
+import json
+import os
+import re
+import time
+
+import cv2
+import numpy as np
+
+CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "color_classes.json")
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp")
+STD_FLOOR = 4.0                 # กัน std เล็กเกินไปเมื่อมีตัวอย่างน้อย
+
+
+def to_features(bgr, space):
+    """พิกเซล BGR (..., 3) uint8 -> (N, 3) float32 ในปริภูมิที่ใช้เทียบ"""
+    img = np.ascontiguousarray(bgr, dtype=np.uint8).reshape(-1, 1, 3)
+    if space == "lab":
+        return cv2.cvtColor(img, cv2.COLOR_BGR2LAB).reshape(-1, 3).astype(np.float32)
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV).reshape(-1, 3).astype(np.float32)
+    # Hue เป็นวงกลม (แดงอยู่ทั้ง 0 และ 179) -> แปลงเป็นจุดบนวงกลมที่รัศมี = Saturation
+    angle = hsv[:, 0] * (2 * np.pi / 180.0)
+    return np.stack([hsv[:, 1] * np.cos(angle), hsv[:, 1] * np.sin(angle), hsv[:, 2]], axis=1)
+
+
+class ColorClassifier:
+    def __init__(self, classes, space="hsv", reject_distance=3.0, min_confidence=0.5, roi_size=10):
+        """classes = {ชื่อ: {"mean": [3], "std": [3], ...}}"""
+        self.space = space
+        self.reject_distance = reject_distance
+        self.min_confidence = min_confidence
+        self.roi_size = roi_size
+        self.classes = classes
+        self.names = list(classes)
+        self.means = np.array([classes[n]["mean"] for n in self.names], np.float32)                   # (K, 3)
+        self.inv_std = 1.0 / np.maximum(np.array([classes[n]["std"] for n in self.names], np.float32), 1e-3)
+
+    # ----------------- ไฟล์ -----------------
+
+    @classmethod
+    def load(cls, path=CALIBRATION_FILE):
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(data["classes"], data.get("space", "hsv"), data.get("reject_distance", 3.0),
+                   data.get("min_confidence", 0.5), data.get("roi_size", 10))
+
+    def save(self, path=CALIBRATION_FILE):
+        text = json.dumps({"space": self.space, "reject_distance": self.reject_distance,
+                           "min_confidence": self.min_confidence, "roi_size": self.roi_size,
+                           "classes": self.classes}, indent=2, ensure_ascii=False)
+        # ตัวเลข 3 ค่าให้อยู่บรรทัดเดียว อ่าน/แก้ด้วยมือง่ายขึ้น
+        text = re.sub(r'\[\s+([^\[\]{}]+?)\s+\]', lambda m: '[' + ' '.join(m.group(1).split()) + ']', text)
+        with open(path, "w") as f:
+            f.write(text + "\n")
+
+    @classmethod
+    def fit(cls, samples, space="hsv", **kwargs):
+        """samples = {ชื่อ: [ภาพ BGR, ...]} -> ค่าเฉลี่ย/ส่วนเบี่ยงเบนของแต่ละสี"""
+        classes = {}
+        for name, images in samples.items():
+            feats = np.concatenate([to_features(img, space) for img in images])
+            classes[name] = {"mean": [round(float(v), 2) for v in feats.mean(axis=0)],
+                             "std": [round(float(v), 2) for v in np.maximum(feats.std(axis=0), STD_FLOOR)]}
+        return cls(classes, space, **kwargs)
+
+    # ----------------- จำแนก -----------------
+
+    def pixel_classes(self, bgr):
+        """ทุกพิกเซล -> index ของสีที่ใกล้ที่สุด (-1 = ไม่ใกล้สีไหนเลย)"""
+        feats = to_features(bgr, self.space)
+        # ระยะแบบ Mahalanobis (แกนอิสระ) ของทุกพิกเซลกับทุกสีพร้อมกัน: (N, K)
+        d = np.sqrt((((feats[:, None, :] - self.means[None]) * self.inv_std[None]) ** 2).sum(axis=2))
+        best = d.argmin(axis=1)
+        best[d[np.arange(len(best)), best] > self.reject_distance] = -1
+        return best
+
+    def classify_pixels(self, bgr):
+        """พิกเซลของวัตถุ 1 ชิ้น -> (ชื่อสี, confidence 0-1)"""
+        cls = self.pixel_classes(bgr)
+        if cls.size == 0: return "Unknown", 0.0
+        votes = np.bincount(cls + 1, minlength=len(self.names) + 1)[1:]
+        k = int(votes.argmax())
+        confidence = float(votes[k]) / cls.size
+        return (self.names[k] if confidence >= self.min_confidence else "Unknown"), confidence
+
+    def classify_roi(self, frame, center=None):
+        """ROI สี่เหลี่ยมรอบจุดกลางภาพ (หรือ center) -> (ชื่อสี, confidence)"""
+        h, w = frame.shape[:2]
+        cx, cy = center if center is not None else (w // 2, h // 2)
+        r = self.roi_size
+        roi = frame[max(0, cy - r):min(h, cy + r), max(0, cx - r):min(w, cx + r)]
+        return self.classify_pixels(roi)
+
+    def classify_components(self, frame, labels, n):
+        """ภาพ + labels จาก connectedComponents -> [(ชื่อสี, confidence)] ของ label 1..n-1 พร้อมกัน"""
+        fg = labels > 0
+        lab = labels[fg]
+        cls = self.pixel_classes(frame[fg]) + 1                      # 0 = ไม่ใกล้สีไหน
+        k = len(self.names) + 1
+        votes = np.bincount(lab * k + cls, minlength=n * k).reshape(n, k)[:, 1:]
+        totals = np.maximum(np.bincount(lab, minlength=n), 1)
+        best = votes.argmax(axis=1)
+        conf = votes[np.arange(n), best] / totals
+        return [((self.names[best[i]] if conf[i] >= self.min_confidence else "Unknown"), float(conf[i]))
+                for i in range(1, n)]
+
+    def drop_points(self):
+        """จุดวางที่กำหนดในไฟล์ (ถ้ามี) -> {ชื่อสี: {"x","y","z"}}"""
+        return {n: c["drop_point"] for n, c in self.classes.items() if "drop_point" in c}
+
+
+# ----------------- เครื่องมือ (CLI) -----------------
+
+def load_crops(directory):
+    samples = {}
+    for label in sorted(os.listdir(directory)):
+        folder = os.path.join(directory, label)
+        if not os.path.isdir(folder): continue
+        for path in sorted(glob.glob(os.path.join(folder, "*"))):
+            if not path.lower().endswith(IMAGE_EXTS): continue
+            img = cv2.imread(path)
+            if img is not None: samples.setdefault(label, []).append(img)
+    return samples
+
+def legacy_hue_classify(crop):
+    """เกณฑ์เดิมใน Color_sorting (ค่าเฉลี่ย Hue ของ ROI) ไว้เทียบใน benchmark"""
+    h_val = float(np.mean(cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)[..., 0]))
+    if (h_val < 10) or (h_val > 160): return "Red"
+    if 35 <= h_val <= 85: return "Green"
+    if 90 <= h_val <= 130: return "Blue"
+    return "Unknown"
+
+def benchmark(classifier, samples):
+    names = sorted(set(samples) | set(classifier.names) | {"Unknown"})
+    index = {n: i for i, n in enumerate(names)}
+    results = {}
+    for method, fn in (("classifier", lambda img: classifier.classify_pixels(img)[0]), ("legacy_hue", legacy_hue_classify)):
+        confusion = np.zeros((len(names), len(names)), np.int32)
+        t0 = time.perf_counter()
+        count = 0
+        for label, images in samples.items():
+            for img in images:
+                confusion[index[label], index[fn(img)]] += 1
+                count += 1
+        elapsed = time.perf_counter() - t0
+        accuracy = float(np.trace(confusion)) / max(count, 1)
+        results[method] = {"accuracy": accuracy, "ms_per_crop": elapsed / max(count, 1) * 1000.0}
+        print(f"\n== {method}: accuracy {accuracy * 100:.1f}% ({count} crops), {results[method]['ms_per_crop']:.3f} ms/crop")
+        print("   truth \\ pred  " + " ".join(f"{n[:7]:>7}" for n in names))
+        for n in names:
+            if confusion[index[n]].sum():
+                print(f"   {n[:13]:<13}  " + " ".join(f"{v:>7}" for v in confusion[index[n]]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Color classifier calibration / benchmark")
+    parser.add_argument("--fit", metavar="CROPS_DIR", help="สร้างไฟล์ calibrate จากภาพตัวอย่าง")
+    parser.add_argument("--space", choices=("lab", "hsv"), default="hsv")
+    parser.add_argument("--out", default=CALIBRATION_FILE)
+    parser.add_argument("--benchmark", metavar="CROPS_DIR", help="วัดผลกับภาพตัวอย่างที่มีป้ายกำกับ")
+    parser.add_argument("--calibration", default=CALIBRATION_FILE)
+    args = parser.parse_args()
+
+    if args.fit:
+        samples = load_crops(args.fit)
+        clf = ColorClassifier.fit(samples, args.space)
+        if os.path.exists(args.out):
+            # เก็บ drop_point เดิมไว้
+            old = ColorClassifier.load(args.out)
+            for name, point in old.drop_points().items():
+                if name in clf.classes: clf.classes[name]["drop_point"] = point
+        clf.save(args.out)
+        print(f"💾 บันทึก {args.out}: {', '.join(f'{n} ({len(samples[n])} ภาพ)' for n in samples)}")
+    elif args.benchmark:
+        benchmark(ColorClassifier.load(args.calibration), load_crops(args.benchmark))
+    else:
+        parser.print_help()
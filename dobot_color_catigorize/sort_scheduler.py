@@ -0,0 +1,181 @@
+# sort_scheduler.py
+# วางแผนรอบคัดแยกเป็น "โปรแกรมการเคลื่อนที่" ที่ส่งเข้าคิวของ Dobot ล่วงหน้า
+#
+# ลำดับต่อชิ้น (ทุกคำสั่งเข้าคิว ไม่มี move_to(wait=True) / time.sleep ฝั่งคอมพิวเตอร์):
+#   เหนือจุดดูด -> ลง -> ดูด -> Wait บนแขน -> ยก -> หน้ากล้อง
+#   [รอถึงกล้อง + รอภาพนิ่ง (settle)] -> ยกขึ้นระดับเดินทาง (แขนวิ่งอยู่ขณะคอมพิวเตอร์จำแนกสี)
+#   -> เหนือกล่องสี -> ลง -> ปล่อย -> ยก -> ต่อด้วยเส้นทางของชิ้นถัดไปทันที (ไม่แวะ start_point)
+#
+# จุดที่คอมพิวเตอร์ต้องรอแขนมีแค่ "ถึงหน้ากล้อง" เพราะต้องใช้ภาพ ส่วนที่เหลือแขนวิ่งต่อเนื่องตามคิว
+import time
+
+import cv2
+import numpy as np
+
+PICK_APPROACH = 40          # mm เหนือจุดดูดก่อนลง
+PICK_LIFT = 55              # mm ยกขึ้นหลังดูด
+DROP_APPROACH = 40          # mm เหนือจุดวาง
+CAMERA_LIFT = 30            # mm ยกขึ้นจากหน้ากล้องระหว่างรอผลสี
+SUCTION_SETTLE_MS = 300     # Wait บนแขนหลังเปิดหัวดูด (แทน sleep(1))
+RELEASE_SETTLE_MS = 200     # Wait บนแขนหลังปล่อย (แทน sleep(0.5))
+
+SETTLE_DIFF = 3.0           # ค่าต่างเฉลี่ยของภาพขาวดำ (0-255) ที่ถือว่านิ่ง
+SETTLE_STABLE_FRAMES = 2    # ต้องนิ่งติดกันกี่คู่ภาพ
+SETTLE_TIMEOUT = 1.5        # วินาที: ไม่นิ่งก็ใช้ภาพล่าสุด
+SETTLE_SIZE = (80, 60)      # ย่อภาพก่อนเทียบ
+QUEUE_POLL_INTERVAL = 0.05
+QUEUE_AHEAD_ITEMS = 2       # โหมดกล้องด้านบน: จำนวนชิ้นที่ส่งเข้าคิวล่วงหน้า (~10 คำสั่งต่อชิ้น)
+
+
+class QueuedMotion:
+    """ส่งคำสั่งเข้าคิวของ Dobot (dobot_common.device.DobotDevice) แบบไม่รอ แล้วจดเวลาที่แขนทำถึง"""
+
+    def __init__(self, dobot):
+        self.dobot = dobot
+        self._marks = {}        # index -> เวลาที่แขนทำถึง (None = ยังไม่ถึง)
+
+    def mark(self, index):
+        """จดเวลาที่แขนทำคำสั่งนี้เสร็จ (ตรวจระหว่าง wait_for)"""
+        self._marks[index] = None
+        return index
+
+    def reached_at(self, index):
+        return self._marks.get(index)
+
+    def move(self, p, dz=0, r=0):
+        return self.dobot.queue_move(p["x"], p["y"], p["z"] + dz, r)
+
+    def suction(self, on):
+        return self.dobot.queue_suction(on)
+
+    def dwell(self, ms):
+        return self.dobot.queue_wait(ms)
+
+    def wait_for(self, index):
+        while True:
+            current = self.dobot.current_index()
+            now = time.time()
+            for i, t in self._marks.items():
+                if t is None and i <= current: self._marks[i] = now
+            if current >= index: return now
+            time.sleep(QUEUE_POLL_INTERVAL)
+
+
+def wait_settled(grab_frame, timeout=SETTLE_TIMEOUT):
+    """อ่านภาพจนวัตถุที่ห้อยอยู่หยุดแกว่ง (ภาพติดกันต่างกันน้อย) แทนการ sleep คงที่"""
+    deadline = time.time() + timeout
+    prev, stable, frame = None, 0, None
+    while True:
+        frame = grab_frame()
+        if frame is None: return None
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), SETTLE_SIZE, interpolation=cv2.INTER_AREA)
+        if prev is not None:
+            diff = float(np.mean(cv2.absdiff(small, prev)))
+            stable = stable + 1 if diff < SETTLE_DIFF else 0
+            if stable >= SETTLE_STABLE_FRAMES: return frame
+        if time.time() > deadline:
+            print("   [WARN] ภาพยังไม่นิ่งภายในเวลาที่กำหนด ใช้ภาพล่าสุด")
+            return frame
+        prev = small
+
+
+class SortingScheduler:
+    """
+    dobot       : dobot_common.device.DobotDevice
+    classify    : frame -> ชื่อสี (เช่น "Red") หรือ "Unknown"
+    grab_frame  : () -> ภาพ BGR ล่าสุดจากกล้อง
+    """
+
+    def __init__(self, dobot, classify, grab_frame, pickup_points, camera_point, drop_points, home_point):
+        self.motion = QueuedMotion(dobot)
+        self.classify = classify
+        self.grab_frame = grab_frame
+        self.pickup_points = pickup_points
+        self.camera_point = camera_point
+        self.drop_points = drop_points
+        self.home_point = home_point
+
+    def _queue_pick(self, p):
+        m = self.motion
+        m.move(p, PICK_APPROACH)
+        m.move(p)
+        m.suction(True)
+        m.dwell(SUCTION_SETTLE_MS)
+        return m.move(p, PICK_LIFT)
+
+    def _queue_pickup(self, p):
+        self._queue_pick(p)
+        return self.motion.move(self.camera_point)
+
+    def _queue_drop(self, color):
+        m = self.motion
+        drop = self.drop_points.get(color)
+        if drop is None:
+            # สีไม่รู้จัก -> ปล่อยไว้ที่จุดเริ่มต้น (เหมือนเดิม)
+            m.move(self.home_point)
+            index = m.mark(m.suction(False))
+            m.dwell(RELEASE_SETTLE_MS)
+            return index
+        m.move(drop, DROP_APPROACH)
+        m.move(drop)
+        index = m.mark(m.suction(False))
+        m.dwell(RELEASE_SETTLE_MS)
+        m.move(drop, DROP_APPROACH)
+        return index
+
+    def run(self):
+        """ทำครบทุก pickup_points คืนสถิติ {colors, cycle_s, total_s, items_per_min}"""
+        m = self.motion
+        n = len(self.pickup_points)
+        colors, released = [], []
+        t_start = time.time()
+        camera_index = self._queue_pickup(self.pickup_points[0]) if n else None
+
+        for i in range(n):
+            print(f"\n--- Process Item {i+1} of {n} ---")
+            m.wait_for(camera_index)
+            frame = wait_settled(self.grab_frame)
+            # ส่งคำสั่งยกออกจากหน้ากล้องก่อน -> แขนเคลื่อนที่ไปพร้อมกับที่เราจำแนกสี
+            m.move(self.camera_point, CAMERA_LIFT)
+            color = self.classify(frame) if frame is not None else "Unknown"
+            colors.append(color)
+            print(f"   สีที่ตรวจพบ: {color}")
+            released.append(self._queue_drop(color))
+            if i + 1 < n:
+                camera_index = self._queue_pickup(self.pickup_points[i + 1])
+
+        # กลับจุดเริ่มต้นแล้วรอจนแขนทำครบทุกคำสั่ง
+        m.wait_for(m.move(self.home_point))
+        done_at = [m.reached_at(index) for index in released]
+        return self._report(t_start, done_at, colors)
+
+    def run_targets(self, targets):
+        """
+        โหมดกล้องด้านบน: รู้สีและตำแหน่งทุกชิ้นแล้ว [(จุดดูด, สี), ...]
+        ส่งทั้งรอบเข้าคิวรวดเดียว ไม่ต้องแวะกล้อง
+        """
+        m = self.motion
+        colors, released = [], []
+        t_start = time.time()
+        for p, color in targets:
+            # คิวของ Dobot จุได้จำกัด -> ส่งล่วงหน้าไม่เกิน QUEUE_AHEAD_ITEMS ชิ้น
+            if len(released) >= QUEUE_AHEAD_ITEMS: m.wait_for(released[-QUEUE_AHEAD_ITEMS])
+            self._queue_pick(p)
+            released.append(self._queue_drop(color))
+            colors.append(color)
+        m.wait_for(m.move(self.home_point))
+        done_at = [m.reached_at(index) for index in released]
+        return self._report(t_start, done_at, colors)
+
+    @staticmethod
+    def _report(t_start, done_at, colors):
+        """เวลาต่อชิ้นนับจากชิ้นก่อนถูกปล่อย (ชิ้นแรกนับจากเริ่มรอบ)"""
+        marks = [t_start] + done_at
+        cycle_s = [b - a for a, b in zip(marks, marks[1:])]
+        total_s = (done_at[-1] - t_start) if done_at else 0.0
+        for i, (c, dt) in enumerate(zip(colors, cycle_s), 1):
+            print(f"   ⏱️ ชิ้นที่ {i} ({c}): {dt:.2f} s")
+        ipm = len(done_at) / total_s * 60.0 if total_s > 0 else 0.0
+        if done_at:
+            print(f"   📊 {len(done_at)} ชิ้นใน {total_s:.1f} s -> {ipm:.1f} ชิ้น/นาที")
+        return {"colors": colors, "cycle_s": cycle_s, "total_s": total_s, "items_per_min": ipm}
@@ -0,0 +1,174 @@
+# vision_pickup.py
+# โหมดกล้องมองจากด้านบน: หาวัตถุทุกชิ้นจากภาพเดียว -> รู้ทั้งสีและตำแหน่ง -> วางแผนลำดับหยิบ
+#
+#   1) Mask วัตถุ (สีสด + สว่างพอ) ทั้งภาพด้วย numpy/cv2 ทีเดียว
+#   2) Connected components -> จุดศูนย์กลาง + ขนาดของแต่ละชิ้น
+#   3) ทุกพิกเซลโหวตสีด้วย ColorClassifier แล้วรวมคะแนนต่อชิ้นด้วย np.bincount (ไม่วนทีละพิกเซล)
+#   4) พิกเซล -> พิกัดแขน ผ่าน Homography ที่ calibrate ไว้ (overhead_calibration.json)
+#   5) เรียงลำดับหยิบให้ระยะเดินทางรวมสั้นที่สุด
+#
+# Calibrate (ครั้งเดียวหลังติดตั้งกล้อง):
+#   python vision_pickup.py --calibrate
+#   คลิกจุดอ้างอิงในภาพอย่างน้อย 4 จุด แล้วพิมพ์พิกัด X Y ของแขนที่จุดนั้น (อ่านจาก getpose.py)
+import argparse
+import itertools
+import json
+import math
+import os
+
+import cv2
+import numpy as np
+
+from color_classifier import ColorClassifier
+
+CALIBRATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "overhead_calibration.json")
+DEFAULT_PICK_Z = -56            # ความสูงดูดบนโต๊ะ (ใช้ถ้าไฟล์ calibrate ไม่ได้ระบุ)
+
+SAT_MIN = 80                    # วัตถุต้องมีสีสดกว่านี้ (พื้นโต๊ะสีเทา/ขาวจะไม่ติด)
+VAL_MIN = 60
+MIN_AREA = 150                  # พิกเซล: เล็กกว่านี้ถือเป็น Noise
+MAX_AREA = 50000
+MORPH_KERNEL = np.ones((5, 5), np.uint8)
+EXACT_ORDER_MAX = 7             # วัตถุไม่เกินนี้หาลำดับที่ดีที่สุดแบบไล่ทุกแบบ ที่เหลือใช้ nearest-neighbour
+
+
+# ----------------- ตรวจจับ -----------------
+
+def detect_objects(frame, classifier=None):
+    """ภาพ BGR -> [{"color", "confidence", "px": (x, y), "area"}] ทุกชิ้นในภาพ"""
+    if classifier is None: classifier = ColorClassifier.load()
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    s, v = hsv[..., 1], hsv[..., 2]
+    mask = ((s >= SAT_MIN) & (v >= VAL_MIN)).astype(np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, MORPH_KERNEL)
+    n, labels, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if n <= 1: return []
+
+    # สีของทุกชิ้นพร้อมกันในรอบเดียว
+    colors = classifier.classify_components(frame, labels, n)
+
+    objects = []
+    for i in range(1, n):
+        area = int(stats[i, cv2.CC_STAT_AREA])
+        if not MIN_AREA <= area <= MAX_AREA: continue
+        color, confidence = colors[i - 1]
+        objects.append({"color": color, "confidence": confidence,
+                        "px": (float(centroids[i][0]), float(centroids[i][1])), "area": area})
+    return objects
+
+
+# ----------------- Homography -----------------
+
+def load_calibration(path=CALIBRATION_FILE):
+    with open(path, "r") as f:
+        data = json.load(f)
+    H = np.array(data["homography"], dtype=np.float64)
+    return H, data.get("pick_z", DEFAULT_PICK_Z)
+
+def save_calibration(pixel_pts, arm_pts, pick_z=DEFAULT_PICK_Z, path=CALIBRATION_FILE):
+    if len(pixel_pts) < 4:
+        raise ValueError("ต้องมีจุดอ้างอิงอย่างน้อย 4 จุด")
+    H, _ = cv2.findHomography(np.float32(pixel_pts), np.float32(arm_pts), cv2.RANSAC if len(pixel_pts) > 4 else 0)
+    if H is None:
+        raise ValueError("คำนวณ Homography ไม่ได้ (จุดอ้างอิงอยู่แนวเดียวกันหรือซ้ำกัน)")
+    err = np.linalg.norm(pixel_to_arm(H, pixel_pts) - np.float32(arm_pts), axis=1)
+    with open(path, "w") as f:
+        json.dump({"homography": H.tolist(), "pick_z": pick_z,
+                   "pixel_points": [list(map(float, p)) for p in pixel_pts],
+                   "arm_points": [list(map(float, p)) for p in arm_pts]}, f, indent=2)
+    print(f"💾 บันทึก {path} (ความคลาดเคลื่อนเฉลี่ย {err.mean():.1f} mm, สูงสุด {err.max():.1f} mm)")
+    return H
+
+def pixel_to_arm(H, pixels):
+    pts = np.float32(pixels).reshape(-1, 1, 2)
+    return cv2.perspectiveTransform(pts, H).reshape(-1, 2)
+
+
+# ----------------- วางแผนลำดับหยิบ -----------------
+
+def _route_cost(order, items, start, drops):
+    cost, pos = 0.0, start
+    for i in order:
+        item = items[i]
+        cost += math.dist(pos, item["xy"])
+        pos = drops.get(item["color"], start)
+        cost += math.dist(item["xy"], pos)
+    return cost
+
+def plan_pick_order(items, start, drops):
+    """
+    items: [{"xy": (x, y), "color"}] ; start/drops: (x, y)
+    ระยะรวม = จุดเริ่ม -> ชิ้น -> กล่องสี -> ชิ้นถัดไป ... (ชิ้นสีไม่รู้จักวางที่จุดเริ่ม)
+    """
+    n = len(items)
+    if n <= 1: return list(range(n))
+    if n <= EXACT_ORDER_MAX:
+        return list(min(itertools.permutations(range(n)), key=lambda o: _route_cost(o, items, start, drops)))
+    order, left, pos = [], set(range(n)), start
+    while left:
+        i = min(left, key=lambda k: math.dist(pos, items[k]["xy"]))
+        order.append(i)
+        left.remove(i)
+        pos = drops.get(items[i]["color"], start)
+    return order
+
+def locate_targets(frame, H, pick_z, start_point, drop_points, classifier=None):
+    """ภาพจากด้านบน -> [(จุดดูด, สี)] เรียงตามลำดับที่ควรหยิบแล้ว"""
+    objects = detect_objects(frame, classifier)
+    if not objects: return []
+    arm_xy = pixel_to_arm(H, [o["px"] for o in objects])
+    items = [{"xy": (float(x), float(y)), "color": o["color"]} for o, (x, y) in zip(objects, arm_xy)]
+    drops = {c: (p["x"], p["y"]) for c, p in drop_points.items()}
+    order = plan_pick_order(items, (start_point["x"], start_point["y"]), drops)
+    return [({"x": items[i]["xy"][0], "y": items[i]["xy"][1], "z": pick_z}, items[i]["color"]) for i in order]
+
+def draw_objects(frame, objects):
+    out = frame.copy()
+    for o in objects:
+        x, y = map(int, o["px"])
+        cv2.circle(out, (x, y), 6, (255, 255, 255), 2)
+        cv2.putText(out, o["color"], (x + 8, y - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+    return out
+
+
+# ----------------- Calibrate (CLI) -----------------
+
+def calibrate_interactive(camera_index=1):
+    cap = cv2.VideoCapture(camera_index)
+    if not cap.isOpened(): cap = cv2.VideoCapture(0)
+    ret, frame = cap.read()
+    cap.release()
+    if not ret:
+        print("[ERROR] Cannot read camera frame.")
+        return
+    clicks = []
+    def on_mouse(event, x, y, flags, param):
+        if event == cv2.EVENT_LBUTTONDOWN: clicks.append((x, y))
+    cv2.namedWindow("calibrate")
+    cv2.setMouseCallback("calibrate", on_mouse)
+    print("คลิกจุดอ้างอิงอย่างน้อย 4 จุด แล้วกด Enter ที่หน้าต่างภาพ")
+    while True:
+        view = frame.copy()
+        for i, (x, y) in enumerate(clicks, 1):
+            cv2.circle(view, (x, y), 5, (0, 0, 255), -1)
+            cv2.putText(view, str(i), (x + 6, y - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+        cv2.imshow("calibrate", view)
+        if cv2.waitKey(30) in (13, 10) and len(clicks) >= 4: break
+    cv2.destroyAllWindows()
+    arm_pts = []
+    for i, p in enumerate(clicks, 1):
+        x, y = map(float, input(f"พิกัดแขนของจุด {i} {p} (X Y): ").split()[:2])
+        arm_pts.append((x, y))
+    pick_z = float(input(f"ความสูงดูดบนโต๊ะ Z [{DEFAULT_PICK_Z}]: ") or DEFAULT_PICK_Z)
+    save_calibration(clicks, arm_pts, pick_z)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Overhead camera pickup tools")
+    parser.add_argument("--calibrate", action="store_true", help="สร้าง overhead_calibration.json")
+    parser.add_argument("--camera", type=int, default=1)
+    args = parser.parse_args()
+    if args.calibrate:
+        calibrate_interactive(args.camera)
+    else:
+        parser.print_help()
@@ -0,0 +1,9 @@
+# dobot_common
+# โค้ดที่ใช้ร่วมกันระหว่างโปรเจกต์ย่อยทุกตัว (voice / web / gesture / sorting)
+#
+# แต่ละโปรเจกต์เพิ่มโฟลเดอร์ราก repo เข้า sys.path ก่อน import:
+#   sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+#   from dobot_common.trajectory import Trajectory, TrajectoryRecorder, TrajectoryPlayer
+#   from dobot_common.device import DobotDevice, find_dobot_port
+#   from dobot_common.arm_server import open_arm        # ใช้แขนร่วมกับแอปอื่นผ่าน arm server (ถ้ารันอยู่)
+#   from dobot_common.async_arm import open_async_arm   # API แบบ asyncio (await arm.move_to(...))
@@ -0,0 +1,619 @@
+# arm_server.py
+# Arm server: Process เดียวที่ถือ Serial ของ Dobot แล้วให้หลายแอป (เว็บ / เสียง / ท่ามือ / วาดภาพ / คัดแยกสี) ใช้แขนร่วมกัน
+#
+#   python -m dobot_common.arm_server               # รันค้างไว้ 1 ตัว (หา Port เอง หรือ --port COM5)
+#   python -m dobot_common.arm_server --status      # ดูสถานะสด (อ่านจากแคชของ server ไม่แตะ Serial)
+#
+# ในแอป:
+#   from dobot_common.arm_server import open_arm
+#   device = open_arm("gesture")                    # มี server -> ArmClient, ไม่มี -> DobotDevice ต่อ Serial เองแบบเดิม
+#   device.move_to(x, y, z, wait=True)              # API เดียวกับ DobotDevice
+#
+# - RPC: multiprocessing.managers บน localhost (แบบเดียวกับ Motion owner ของ dobot_web_drawing)
+#   หรือ Unix socket ถ้ากำหนด DOBOT_ARM_SERVER_SOCKET=/tmp/dobot-arm.sock
+# - Lease: ขยับแขนได้ทีละแอป แอปที่สั่งก่อนได้สิทธิ์ สิทธิ์หมดเองเมื่อแขนทำคำสั่งของแอปนั้นครบแล้วเงียบเกิน LEASE_TTL
+#   แอปที่ priority สูงกว่าแย่งสิทธิ์ได้ทันที (ทิ้งคิวของแอปเดิม), priority เท่ากัน/ต่ำกว่า -> รอตามลำดับ
+# - ทุกคำสั่งผ่าน Thread เดียวที่ถือ Serial เรียงตาม priority: คำสั่งเคลื่อนที่ก่อน การอ่านสถานะทีหลังสุด
+# - status() / current_index() / wait_index() ตอบจากแคชที่ sampler เติมให้ -> แอปที่แค่ดูสถานะไม่แย่ง Serial
+import argparse
+import heapq
+import itertools
+import os
+import threading
+import time
+import uuid
+from multiprocessing import AuthenticationError
+from multiprocessing.managers import BaseManager
+
+from dobot_common.device import QUEUE_LIMIT, QUEUE_POLL_INTERVAL, DobotDevice
+
+ARM_SERVER_HOST = '127.0.0.1'
+ARM_SERVER_PORT = int(os.environ.get('DOBOT_ARM_SERVER_PORT', 5010))
+ARM_SERVER_SOCKET = os.environ.get('DOBOT_ARM_SERVER_SOCKET')     # ตั้งค่า = ใช้ Unix socket แทน TCP
+ARM_SERVER_AUTHKEY = os.environ.get('DOBOT_ARM_SERVER_AUTHKEY', 'dobot-arm').encode()
+
+PRIORITY_BACKGROUND = 0         # งานยาวที่ถูกขัดได้ (วาดภาพ / คัดแยกสี)
+PRIORITY_NORMAL = 10            # แอปควบคุมทั่วไป (เสียง / ท่ามือ)
+PRIORITY_MANUAL = 20            # คนกดควบคุมเองจากหน้าเว็บ -> แย่งสิทธิ์จากแอปอื่นได้
+_PRIORITY_HALT = 1000           # หยุดคิวของแขนแทรกก่อนทุกคำสั่ง
+_PRIORITY_READ = -1             # pose ที่แอปขออ่านใหม่
+_PRIORITY_SAMPLE = -2           # sampler อ่านสถานะเมื่อไม่มีงานอื่นเท่านั้น
+
+LEASE_TTL = 3.0                 # วินาที: สิทธิ์หมดหลังแขนว่างและแอปเงียบนานเท่านี้
+ACQUIRE_TIMEOUT = 10.0          # วินาที: รอสิทธิ์นานสุดก่อน LeaseError
+STATUS_INTERVAL = 0.5           # วินาที: อ่าน pose + index ตอนแขนว่าง
+STATUS_INTERVAL_BUSY = 0.1      # วินาที: อ่าน index ตอนมีคำสั่งค้าง (รู้เร็วว่าแขนทำเสร็จ)
+POSE_INTERVAL_BUSY = 1.0        # วินาที: อ่าน pose ตอนแขนเคลื่อนที่ (เหลือ Serial ให้คำสั่งเคลื่อนที่)
+RECONNECT_AFTER_FAILURES = 3    # Serial ผิดพลาดติดกันเท่านี้ -> ปิดแล้วต่อใหม่
+RECONNECT_DELAY = 2.0
+REVOKED_HISTORY = 64            # จำ token ที่ถูกยกเลิกไว้บอกสาเหตุให้ผู้ถือเดิม
+
+MOTION_COMMANDS = ("queue_move", "queue_path", "queue_cp", "queue_suction", "queue_gripper", "queue_wait", "speed",
+                   "cp_params")
+
+
+class LeaseError(Exception):
+    """ไม่มีสิทธิ์ขยับแขน (สิทธิ์หมดอายุ / รอสิทธิ์เกินเวลา)"""
+
+
+class LeasePreempted(LeaseError):
+    """แอปที่ priority สูงกว่าแย่งสิทธิ์ไป คำสั่งที่ค้างอยู่ถูกทิ้งแล้ว"""
+
+
+class QueueFull(Exception):
+    """คิวของแขนเต็ม (server ไม่รอให้ว่างบน Thread Serial) -> ArmClient รอแล้วส่งใหม่เอง"""
+
+
+def default_address():
+    return ARM_SERVER_SOCKET or (ARM_SERVER_HOST, ARM_SERVER_PORT)
+
+
+class _Job:
+    __slots__ = ("fn", "token", "done", "result", "error")
+
+    def __init__(self, fn, token=None):
+        self.fn = fn
+        self.token = token
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def fail(self, error):
+        self.error = error
+        self.done.set()
+
+
+# ----------------- Server -----------------
+
+class ArmServer:
+    """เจ้าของ DobotDevice ตัวเดียว ทุก method ถูกเรียกผ่าน Proxy จากหลาย Process/Thread พร้อมกันได้"""
+
+    def __init__(self, device, port=None, lease_ttl=LEASE_TTL):
+        self.device = device
+        self.pinned_port = port                 # None = ต่อใหม่ด้วยการค้นหา Port (USB ถอดเสียบแล้วชื่ออาจเปลี่ยน)
+        self.lease_ttl = lease_ttl
+        self.connected = True
+        self.counts = {"commands": 0, "reads": 0, "samples": 0, "halts": 0, "preempted": 0,
+                       "expired": 0, "errors": 0, "reconnects": 0}
+        self._cond = threading.Condition()
+        self._jobs = []                         # heap: (-priority, seq, _Job)
+        self._seq = itertools.count()
+        self._lease = None
+        self._waiting = []                      # heap: (-priority, seq) ของแอปที่รอสิทธิ์
+        self._revoked = {}                      # token -> (ชนิด error, ข้อความ)
+        self._read_job = None                   # การอ่าน pose ที่ค้างอยู่ (หลายแอปขอพร้อมกันใช้ผลเดียวกัน)
+        self._failures = 0
+        self._status = {"pose": None, "pose_time": 0.0, "current_index": 0, "index_time": 0.0,
+                        "last_index": None, "last_error": None}
+        self._stop = threading.Event()
+        self._threads = [threading.Thread(target=self._serial_loop, name='arm-serial', daemon=True),
+                         threading.Thread(target=self._sampler_loop, name='arm-sampler', daemon=True)]
+        for t in self._threads:
+            t.start()
+
+    def shutdown(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=2.0)
+        try: self.device.close()
+        except Exception: pass
+
+    # ----------------- Serial (Thread เดียว) -----------------
+
+    def _enqueue(self, fn, priority, token=None):
+        job = _Job(fn, token)
+        with self._cond:
+            if not self.connected:
+                job.fail(ConnectionError("Dobot หลุดการเชื่อมต่อ (กำลังต่อใหม่)"))
+                return job
+            heapq.heappush(self._jobs, (-priority, next(self._seq), job))
+            self._cond.notify_all()
+        return job
+
+    def _run(self, fn, priority, token=None):
+        job = self._enqueue(fn, priority, token)
+        job.done.wait()
+        if job.error is not None: raise job.error
+        return job.result
+
+    def _serial_loop(self):
+        while not self._stop.is_set():
+            with self._cond:
+                if not self._cond.wait_for(lambda: self._jobs, 0.2): continue
+                _, _, job = heapq.heappop(self._jobs)
+            try:
+                job.result = job.fn()
+                self._failures = 0
+            except QueueFull as e:
+                job.error = e                   # ไม่ใช่ Serial เสีย ไม่นับเป็นความผิดพลาด
+            except Exception as e:
+                job.error = e
+                self._failures += 1
+                self.counts["errors"] += 1
+                self._status["last_error"] = f"{type(e).__name__}: {e}"
+            job.done.set()
+            if self._failures >= RECONNECT_AFTER_FAILURES:
+                self._reconnect()
+
+    def _reconnect(self):
+        """ปิด Port เดิมแล้วต่อใหม่ คำสั่งที่ค้างอยู่ล้มเหลวทันที (ไม่ปล่อยให้แขนขยับช้าไปหลายวินาทีหลังต่อติด)"""
+        print(f"⚠️ Dobot link lost: {self._status['last_error']} -> reconnecting")
+        with self._cond:
+            self.connected = False
+            jobs, self._jobs = self._jobs, []
+            self._status["last_index"] = None
+        for _, _, job in jobs:
+            job.fail(ConnectionError("Dobot หลุดการเชื่อมต่อ"))
+        try: self.device.close()
+        except Exception: pass
+        while not self._stop.is_set():
+            try:
+                device = DobotDevice.open(self.pinned_port)
+                break
+            except Exception as e:
+                self._status["last_error"] = str(e)
+                self._stop.wait(RECONNECT_DELAY)
+        else:
+            return
+        with self._cond:
+            self.device = device
+            self.connected = True
+            self._failures = 0
+            self.counts["reconnects"] += 1
+            self._cond.notify_all()
+
+    def _sample(self, read_pose=True):
+        index = self.device.current_index()
+        pose = tuple(self.device.pose()) if read_pose else None
+        now = time.time()
+        with self._cond:
+            self._status.update(current_index=index, index_time=now)
+            if pose is not None: self._status.update(pose=pose, pose_time=now)
+            self.counts["samples"] += 1
+            self._cond.notify_all()             # ปลุก wait_index()
+        return pose
+
+    def _room(self):
+        """ที่ว่างในคิวของแขน (เรียกตอนถือ _cond)"""
+        last = self._status["last_index"]
+        return QUEUE_LIMIT if last is None else QUEUE_LIMIT - max(0, last - self._status["current_index"])
+
+    def _busy(self):
+        """แขนยังทำคำสั่งที่ส่งไปไม่ครบ (เรียกตอนถือ _cond)"""
+        last = self._status["last_index"]
+        return last is not None and self._status["current_index"] < last
+
+    def _sampler_loop(self):
+        while not self._stop.is_set():
+            with self._cond:
+                busy = self._busy()
+                pose_age = time.time() - self._status["pose_time"]
+                connected = self.connected
+            if connected:
+                read_pose = pose_age >= (POSE_INTERVAL_BUSY if busy else STATUS_INTERVAL)
+                try:
+                    self._run(lambda: self._sample(read_pose), _PRIORITY_SAMPLE)
+                except Exception:
+                    pass                        # บันทึกไว้ใน last_error แล้ว
+                with self._cond:
+                    busy = self._busy()
+            self._stop.wait(STATUS_INTERVAL_BUSY if busy else STATUS_INTERVAL)
+
+    def _halt_arm(self):
+        self.device.halt()
+        with self._cond:
+            self._status["last_index"] = None
+            self.counts["halts"] += 1
+            self._cond.notify_all()             # wait_index() ของคำสั่งที่ถูกทิ้งไม่ต้องรอต่อ
+
+    # ----------------- Lease -----------------
+
+    def _revoke(self, error, message):
+        token = self._lease["token"]
+        self._revoked[token] = (error, message)
+        if len(self._revoked) > REVOKED_HISTORY:
+            self._revoked.pop(next(iter(self._revoked)))
+        self._lease = None
+        self._cond.notify_all()
+
+    def _expire(self, now):
+        lease = self._lease
+        if lease is None or now < lease["expires"]: return
+        if lease["last_index"] is not None and self._status["current_index"] < lease["last_index"]:
+            return                              # แขนยังทำคำสั่งของผู้ถือสิทธิ์อยู่
+        self.counts["expired"] += 1
+        self._revoke(LeaseError, f"สิทธิ์ของ {lease['client']} หมดอายุ (เงียบเกิน {self.lease_ttl:.0f} วินาที)")
+
+    def _preempt(self, client):
+        lease = self._lease
+        message = f"{client} แย่งสิทธิ์ควบคุมแขนจาก {lease['client']}"
+        kept = []
+        for item in self._jobs:
+            if item[2].token == lease["token"]: item[2].fail(LeasePreempted(message))
+            else: kept.append(item)
+        heapq.heapify(kept)
+        self._jobs = kept
+        heapq.heappush(self._jobs, (-_PRIORITY_HALT, next(self._seq), _Job(self._halt_arm)))
+        self.counts["preempted"] += 1
+        print(f"⚠️ {message}")
+        self._revoke(LeasePreempted, message)
+
+    def _check(self, token):
+        """lease ของ token นี้ หรือ raise สาเหตุที่ไม่มีสิทธิ์ (เรียกตอนถือ _cond)"""
+        self._expire(time.time())
+        lease = self._lease
+        if lease is not None and lease["token"] == token: return lease
+        error, message = self._revoked.get(token, (LeaseError, "ไม่ได้ถือสิทธิ์ควบคุมแขน"))
+        raise error(message)
+
+    def acquire(self, client, priority=PRIORITY_NORMAL, timeout=ACQUIRE_TIMEOUT):
+        """
+        ขอสิทธิ์ขยับแขน -> token (รอตามลำดับ priority ได้นานสุด timeout วินาที)
+        สิทธิ์ผูกกับ token ของแต่ละการเชื่อมต่อ ไม่ใช่ชื่อ client: ชื่อซ้ำกัน (เว็บ 2 หน้าต่าง / แอปที่รีสตาร์ท) ต้องรอคิวเหมือนแอปอื่น
+        """
+        deadline = time.time() + timeout
+        ticket = (-priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.time()
+                    self._expire(now)
+                    lease = self._lease
+                    if self._waiting[0] == ticket and (lease is None or priority > lease["priority"]):
+                        if lease is not None: self._preempt(client)
+                        self._lease = {"token": uuid.uuid4().hex, "client": client, "priority": priority,
+                                       "since": now, "expires": now + self.lease_ttl, "last_index": None}
+                        return self._lease["token"]
+                    if now >= deadline:
+                        holder = lease["client"] if lease is not None else "แอปที่รอก่อน"
+                        raise LeaseError(f"แขนถูกใช้งานโดย {holder} (รอเกิน {timeout:.0f} วินาที)")
+                    # สิทธิ์หมดอายุตามเวลา ไม่มีใคร notify -> ตื่นมาเช็คเป็นระยะ
+                    self._cond.wait(min(deadline - now, 0.2))
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def renew(self, token):
+        with self._cond:
+            self._check(token)["expires"] = time.time() + self.lease_ttl
+
+    def release(self, token):
+        """คืนสิทธิ์ (คำสั่งที่อยู่ในคิวของแขนแล้วยังทำต่อจนจบ)"""
+        with self._cond:
+            if self._lease is not None and self._lease["token"] == token:
+                self._lease = None
+                self._cond.notify_all()
+
+    # ----------------- คำสั่ง -----------------
+
+    def submit(self, token, command, *args):
+        """คำสั่งคิวของ DobotDevice (queue_move, queue_suction, ...) -> ผลลัพธ์ (index ในคิวของแขน)"""
+        if command not in MOTION_COMMANDS:
+            raise ValueError(f"ไม่รองรับคำสั่ง {command}")
+        with self._cond:
+            priority = self._check(token)["priority"]
+        count = len(args[0]) if command == "queue_path" else 0 if command in ("speed", "cp_params") else 1
+
+        def run():
+            # เช็คที่ว่างบน Thread Serial แล้วไม่รอ: คิวเต็มแล้วรอที่นี่ = halt / แย่งสิทธิ์ / อ่านสถานะของทุกแอปค้างตาม
+            with self._cond:
+                room = self._room()
+            if count > room: raise QueueFull(f"คิวของแขนว่าง {room} ที่ (ต้องการ {count})")
+            return getattr(self.device, command)(*args)
+
+        result = self._run(run, priority, token)
+        last = result[-1] if isinstance(result, list) and result else result
+        with self._cond:
+            lease = self._lease
+            if lease is not None and lease["token"] == token:
+                lease["expires"] = time.time() + self.lease_ttl
+                if isinstance(last, int): lease["last_index"] = last
+            if isinstance(last, int): self._status["last_index"] = last
+            self.counts["commands"] += 1
+        return result
+
+    def halt(self, token):
+        """หยุดคิวของแขน ทิ้งคำสั่งที่เหลือ (เฉพาะผู้ถือสิทธิ์)"""
+        with self._cond:
+            self._check(token)
+        self._run(self._halt_arm, _PRIORITY_HALT)
+
+    def pose(self, max_age=0.0):
+        """pose จากแคช ถ้าเก่ากว่า max_age -> อ่านใหม่ต่อท้ายคำสั่งเคลื่อนที่ที่รออยู่"""
+        with self._cond:
+            pose, stamp = self._status["pose"], self._status["pose_time"]
+            if pose is not None and time.time() - stamp <= max_age: return pose
+            job = self._read_job
+            if job is None or job.done.is_set():
+                job = self._read_job = self._enqueue(self._sample, _PRIORITY_READ)
+            self.counts["reads"] += 1
+        job.done.wait()
+        if job.error is not None: raise job.error
+        return job.result
+
+    def room(self):
+        """ที่ว่างในคิวของแขนจากแคช (ArmClient รอจนพอก่อนส่งคำสั่ง)"""
+        with self._cond:
+            return self._room()
+
+    def current_index(self):
+        """index ที่แขนทำถึงล่าสุด (แคช อายุไม่เกิน STATUS_INTERVAL_BUSY ตอนมีคำสั่งค้าง)"""
+        with self._cond:
+            return self._status["current_index"]
+
+    def wait_index(self, index, timeout=None):
+        """รอจนแขนทำคำสั่ง index เสร็จ (หรือคิวถูกหยุด) คืน True ถ้าทันเวลา"""
+        with self._cond:
+            halts = self.counts["halts"]
+            return self._cond.wait_for(lambda: self._status["current_index"] >= index or
+                                       self.counts["halts"] != halts, timeout)
+
+    def status(self):
+        """สถานะทั้งหมดจากแคช ไม่แตะ Serial (เรียกถี่แค่ไหนก็ได้)"""
+        with self._cond:
+            now = time.time()
+            self._expire(now)
+            lease = self._lease
+            return dict(self._status, connected=self.connected, port=getattr(self.device, 'port', None),
+                        busy=self._busy(), queued_jobs=len(self._jobs), waiting=len(self._waiting),
+                        lease=None if lease is None else {"client": lease["client"], "priority": lease["priority"],
+                                                          "held_s": round(now - lease["since"], 1)},
+                        counts=dict(self.counts))
+
+
+# ----------------- Client -----------------
+
+class ArmClient:
+    """
+    ใช้แทน DobotDevice ได้ (API เดียวกัน) แต่ทุกคำสั่งผ่าน arm server
+    ขอสิทธิ์อัตโนมัติเมื่อสั่งขยับ ถ้าสิทธิ์หมดอายุระหว่างว่างจะขอใหม่เอง ถ้าถูกแย่งจะ raise LeasePreempted
+    """
+
+    def __init__(self, server, client, priority=PRIORITY_NORMAL, address=None):
+        self.server = server
+        self.client = client
+        self.priority = priority
+        address = address or default_address()
+        self.port = f"arm-server {address if isinstance(address, str) else '%s:%d' % address}"
+        self.last_index = None
+        self._token = None
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            if self._token is None:
+                self._token = self.server.acquire(self.client, self.priority)
+            return self._token
+
+    def _wait_room(self, count=1):
+        """รอจนคิวของแขนว่างพอ count คำสั่ง (อ่านจากแคชของ server ไม่แตะ Serial)"""
+        count = min(count, QUEUE_LIMIT)
+        while self.server.room() < count:
+            time.sleep(QUEUE_POLL_INTERVAL)
+
+    def _submit(self, command, *args):
+        reacquired = False
+        while True:
+            try:
+                result = self.server.submit(self._acquire(), command, *args)
+                break
+            except QueueFull:
+                time.sleep(QUEUE_POLL_INTERVAL)  # แคชของ server ยังไม่เห็นว่าแขนทำไปแล้ว
+            except LeasePreempted:
+                self._token = None
+                raise
+            except LeaseError:
+                # lease หมดอายุ -> ขอใหม่ครั้งเดียวแล้ววนต่อ (ยังรอคิวว่างได้ตามปกติ)
+                self._token = None
+                if reacquired: raise
+                reacquired = True
+        last = result[-1] if isinstance(result, list) and result else result
+        if isinstance(last, int): self.last_index = last
+        return result
+
+    def close(self):
+        token, self._token = self._token, None
+        if token is not None:
+            try: self.server.release(token)
+            except Exception: pass
+
+    # ----------------- คิวคำสั่ง (ไม่รอ) -----------------
+
+    # ทุกคำสั่งรอที่ว่างฝั่ง client -> Thread Serial ของ server ไม่ต้องค้างรอแขน
+
+    def queue_move(self, x, y, z, r=0, mode=None):
+        self._wait_room()
+        return self._submit("queue_move", x, y, z, r, mode)
+
+    def queue_path(self, points, r=0, mode=None):
+        # แบ่งชุดตามที่ว่างในคิวของแขน
+        indices = []
+        points = [tuple(p) for p in points]
+        while points:
+            self._wait_room()
+            room = self.server.room()
+            batch, points = points[:room], points[room:]
+            indices += self._submit("queue_path", batch, r, mode)
+        return indices
+
+    def queue_cp(self, x, y, z):
+        self._wait_room()
+        return self._submit("queue_cp", x, y, z)
+
+    def queue_suction(self, enable):
+        self._wait_room()
+        return self._submit("queue_suction", enable)
+
+    def queue_gripper(self, enable):
+        self._wait_room()
+        return self._submit("queue_gripper", enable)
+
+    def queue_wait(self, ms):
+        self._wait_room()
+        return self._submit("queue_wait", ms)
+
+    def current_index(self):
+        return self.server.current_index()
+
+    def pending(self):
+        if self.last_index is None: return 0
+        return max(0, self.last_index - self.current_index())
+
+    def wait_for(self, index=None, timeout=None):
+        index = self.last_index if index is None else index
+        if index is None: return True
+        return self.server.wait_index(index, timeout)
+
+    def halt(self):
+        token = self._token
+        if token is None: return                # ไม่ได้ถือสิทธิ์ = ไม่มีคำสั่งของเราค้างอยู่
+        try:
+            self.server.halt(token)
+        except LeaseError:
+            self._token = None
+        self.last_index = None                  # คำสั่งที่ค้างถูกทิ้งแล้ว (เหมือน DobotDevice.clear_queue)
+
+    # ----------------- API แบบเดิมของ pydobot -----------------
+
+    def move_to(self, x, y, z, r=0, wait=False):
+        index = self.queue_move(x, y, z, r)
+        if wait: self.wait_for(index)
+        return index
+
+    def suck(self, enable, wait=False):
+        index = self.queue_suction(enable)
+        if wait: self.wait_for(index)
+        return index
+
+    def grip(self, enable, wait=False):
+        index = self.queue_gripper(enable)
+        if wait: self.wait_for(index)
+        return index
+
+    def speed(self, velocity=100., acceleration=100.):
+        self._submit("speed", velocity, acceleration)
+
+    def cp_params(self, plan_acc, junction_vel, acc, real_time=False):
+        self._submit("cp_params", plan_acc, junction_vel, acc, real_time)
+
+    def pose(self, max_age=0.0):
+        return self.server.pose(max_age)
+
+    def cached_pose(self):
+        status = self.server.status()
+        return status["pose"], status["pose_time"]
+
+    def status(self):
+        return self.server.status()
+
+
+# ----------------- RPC -----------------
+
+_server = None
+
+def _get_server():
+    return _server
+
+
+class ArmServerManager(BaseManager):
+    pass
+
+
+def serve_forever(port=None, address=None):
+    """จุดเริ่มของ Process arm server: ต่อ Dobot แล้วรอคำสั่งจากแอปต่างๆ"""
+    global _server
+    address = address or default_address()
+    if isinstance(address, str) and os.path.exists(address):
+        os.remove(address)                      # socket ค้างจากรอบก่อน
+    _server = ArmServer(DobotDevice.open(port, verbose=True), port)
+    ArmServerManager.register('ArmServer', callable=_get_server)
+    manager = ArmServerManager(address=address, authkey=ARM_SERVER_AUTHKEY)
+    server = manager.get_server()
+    print(f" 🦾 Arm server (PID {os.getpid()}) listening on {address}")
+    try:
+        server.serve_forever()
+    finally:
+        _server.shutdown()
+
+
+def connect_arm(client, priority=PRIORITY_NORMAL, address=None, timeout=0.0):
+    """ต่อ arm server ที่รันอยู่ -> ArmClient (ConnectionError ถ้าไม่มี server)"""
+    address = address or default_address()
+    ArmServerManager.register('ArmServer')
+    deadline = time.time() + timeout
+    while True:
+        try:
+            manager = ArmServerManager(address=address, authkey=ARM_SERVER_AUTHKEY)
+            manager.connect()
+            return ArmClient(manager.ArmServer(), client, priority, address)
+        except (OSError, EOFError, AuthenticationError) as e:
+            if time.time() >= deadline:
+                raise ConnectionError(f"ไม่พบ arm server ที่ {address}: {e}") from e
+            time.sleep(0.2)
+
+
+def open_arm(client, priority=PRIORITY_NORMAL, port=None, verbose=False):
+    """มี arm server -> ArmClient, ไม่มี -> DobotDevice.open() ต่อ Serial เองแบบเดิม"""
+    try:
+        arm = connect_arm(client, priority)
+    except ConnectionError:
+        return DobotDevice.open(port, verbose=verbose)
+    print(f"✅ ใช้แขนผ่าน {arm.port} (client: {client})")
+    return arm
+
+
+def monitor(interval=1.0):
+    """แสดงสถานะของ arm server เป็นระยะ (Ctrl+C = ออก)"""
+    arm = connect_arm("monitor", timeout=2.0)
+    try:
+        while True:
+            s = arm.status()
+            pose = s["pose"]
+            lease = s["lease"]
+            print(f"📍 {'-' if pose is None else '(%.1f, %.1f, %.1f)' % pose[:3]} "
+                  f"| index {s['current_index']}/{s['last_index']} | "
+                  f"{'busy' if s['busy'] else 'idle'} | lease {lease['client'] + '/' + str(lease['priority']) if lease else '-'} "
+                  f"| waiting {s['waiting']} | jobs {s['queued_jobs']} | {s['counts']}")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dobot arm server (ให้หลายแอปใช้แขนตัวเดียวกัน)")
+    parser.add_argument("--port", default=None, help="Serial port ของ Dobot (ไม่ระบุ = ค้นหาเอง)")
+    parser.add_argument("--status", action="store_true", help="ดูสถานะของ server ที่รันอยู่")
+    args = parser.parse_args()
+    if args.status:
+        monitor()
+    else:
+        serve_forever(args.port)
+
+
+if __name__ == "__main__":
+    # เรียกผ่านโมดูลที่ import ตามชื่อเต็ม: LeaseError ที่ส่งข้าม Process ต้องเป็น dobot_common.arm_server.LeaseError
+    # ไม่ใช่ __main__.LeaseError (แอปฝั่ง client unpickle ไม่ได้)
+    from dobot_common.arm_server import main as _main
+    _main()
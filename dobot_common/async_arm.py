@@ -0,0 +1,215 @@
+# async_arm.py
+# API แบบ asyncio สำหรับแขน Dobot: แอปเดียวรอกล้อง / ไมค์ / HTTP / แขน พร้อมกันใน event loop เดียวได้
+#
+#   from dobot_common.async_arm import open_async_arm
+#   async with await open_async_arm("voice") as arm:     # มี arm server -> ArmClient, ไม่มี -> DobotDevice
+#       await arm.move_to(x, y, z)                       # รอจนแขนไปถึง (ไม่ค้าง event loop)
+#       index = await arm.move_to(x, y, z, wait=False)   # เข้าคิวแล้วคืนเลข index ทันที
+#       done = arm.done_event(index)                     # Future ที่เสร็จเมื่อแขนทำคำสั่งนั้นเสร็จ
+#       async for pose in arm.poses(0.2):                # pose ต่อเนื่อง (ใช้แคชร่วมกับคำสั่งอื่น)
+#           ...
+#
+# - การเรียก Serial / arm server ทั้งหมดผ่าน Thread เดียวของ AsyncArm เรียงตามลำดับที่สั่ง
+#   (pydobot ไม่ thread-safe และแขนต้องได้คำสั่งตามลำดับ)
+# - ทุก coroutine ที่รอแขนทำคำสั่งเสร็จใช้ตัวอ่าน current_index ตัวเดียวกัน ไม่ว่าจะรอพร้อมกันกี่ตัว
+# - queue_path แบ่งชุดตามที่ว่างในคิวของแขนฝั่ง asyncio เอง -> Thread ของแขนไม่ค้างรอคิวว่าง
+#
+# ทดลอง (ดู pose และคิวของแขนแบบสด, Ctrl+C = ออก):
+#   python -m dobot_common.async_arm --watch
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from dobot_common.arm_server import PRIORITY_BACKGROUND, PRIORITY_NORMAL, open_arm
+from dobot_common.device import QUEUE_LIMIT, QUEUE_POLL_INTERVAL
+
+POSE_STREAM_INTERVAL = 0.2      # วินาที ระหว่าง pose แต่ละค่าของ poses()
+
+
+class AsyncArm:
+    """ห่อ DobotDevice / ArmClient ให้เรียกด้วย await ได้ (สร้างและใช้ใน event loop เดียวกัน)"""
+
+    def __init__(self, device, poll=QUEUE_POLL_INTERVAL):
+        self.device = device
+        self.poll = poll
+        self.port = device.port
+        self.current = 0                        # index ล่าสุดที่แขนทำถึง (อ่านโดย _poll_loop)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dobot-async')
+        self._waiters = []                      # [(index, Future)] ที่รอแขนทำถึง index
+        self._poller = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def close(self):
+        if self._poller is not None: self._poller.cancel()
+        for _, future in self._waiters:
+            future.cancel()
+        self._waiters = []
+        try:
+            await self._call(self.device.close)
+        finally:
+            self._executor.shutdown(wait=False)
+
+    @property
+    def last_index(self):
+        return self.device.last_index
+
+    # ----------------- รอคิวของแขน -----------------
+
+    def done_event(self, index=None):
+        """Future ที่เสร็จ (ค่า = current index) เมื่อแขนทำคำสั่ง index (ค่าเริ่มต้น = คำสั่งล่าสุด) เสร็จ"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        index = self.last_index if index is None else index
+        if index is None or index <= self.current:
+            future.set_result(self.current)
+            return future
+        self._waiters.append((index, future))
+        if self._poller is None or self._poller.done():
+            self._poller = loop.create_task(self._poll_loop())
+        return future
+
+    async def _poll_loop(self):
+        """อ่าน current_index ตัวเดียวให้ทุก Future ที่รออยู่ หยุดเองเมื่อไม่มีใครรอ"""
+        try:
+            while self._waiters:
+                self.current = await self._call(self.device.current_index)
+                waiting = []
+                for index, future in self._waiters:
+                    if future.done(): continue                  # ถูกยกเลิก / หมดเวลาไปแล้ว
+                    if index <= self.current: future.set_result(self.current)
+                    else: waiting.append((index, future))
+                self._waiters = waiting
+                if waiting: await asyncio.sleep(self.poll)
+        except Exception as e:
+            waiters, self._waiters = self._waiters, []
+            for _, future in waiters:
+                if not future.done(): future.set_exception(e)
+
+    async def wait_for(self, index=None, timeout=None):
+        """รอจนแขนทำคำสั่ง index (ค่าเริ่มต้น = คำสั่งล่าสุด) เสร็จ คืน True ถ้าทันเวลา"""
+        try:
+            await asyncio.wait_for(self.done_event(index), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def drain(self, timeout=None):
+        """รอจนคำสั่งทั้งหมดที่เราส่งเข้าคิวทำเสร็จ"""
+        return await self.wait_for(None, timeout)
+
+    async def pending(self):
+        if self.last_index is None: return 0
+        return max(0, self.last_index - await self.current_index())
+
+    async def current_index(self):
+        self.current = await self._call(self.device.current_index)
+        return self.current
+
+    # ----------------- คิวคำสั่ง (ไม่รอ) -----------------
+
+    async def queue_move(self, x, y, z, r=0, mode=None):
+        return await self._call(self.device.queue_move, x, y, z, r, mode)
+
+    async def queue_path(self, points, r=0, mode=None):
+        indices = []
+        points = [tuple(p) for p in points]
+        while points:
+            if self.last_index is not None and self.last_index - self.current >= QUEUE_LIMIT:
+                await self.done_event(self.last_index - QUEUE_LIMIT + 1)
+                continue
+            room = QUEUE_LIMIT if self.last_index is None else QUEUE_LIMIT - (self.last_index - self.current)
+            batch, points = points[:room], points[room:]
+            indices += await self._call(self.device.queue_path, batch, r, mode)
+        return indices
+
+    async def queue_cp(self, x, y, z):
+        return await self._call(self.device.queue_cp, x, y, z)
+
+    async def queue_suction(self, enable):
+        return await self._call(self.device.queue_suction, enable)
+
+    async def queue_gripper(self, enable):
+        return await self._call(self.device.queue_gripper, enable)
+
+    async def queue_wait(self, ms):
+        return await self._call(self.device.queue_wait, ms)
+
+    async def halt(self):
+        await self._call(self.device.halt)
+        await self.current_index()
+        waiters, self._waiters = self._waiters, []
+        for _, future in waiters:
+            if not future.done(): future.set_result(self.current)   # คำสั่งที่รอถูกทิ้งแล้ว ไม่ต้องรอต่อ
+
+    # ----------------- API แบบเดิมของ pydobot -----------------
+
+    async def move_to(self, x, y, z, r=0, wait=True):
+        index = await self.queue_move(x, y, z, r)
+        if wait: await self.wait_for(index)
+        return index
+
+    async def suck(self, enable, wait=True):
+        index = await self.queue_suction(enable)
+        if wait: await self.wait_for(index)
+        return index
+
+    async def grip(self, enable, wait=True):
+        index = await self.queue_gripper(enable)
+        if wait: await self.wait_for(index)
+        return index
+
+    async def speed(self, velocity=100., acceleration=100.):
+        await self._call(self.device.speed, velocity, acceleration)
+
+    async def cp_params(self, plan_acc, junction_vel, acc, real_time=False):
+        await self._call(self.device.cp_params, plan_acc, junction_vel, acc, real_time)
+
+    async def pose(self, max_age=0.0):
+        return await self._call(self.device.pose, max_age)
+
+    def cached_pose(self):
+        return self.device.cached_pose()
+
+    async def poses(self, interval=POSE_STREAM_INTERVAL):
+        """async generator: pose ทุก interval วินาที (หลาย stream พร้อมกันใช้ค่าที่อ่านรอบเดียวกัน)"""
+        while True:
+            yield await self.pose(max_age=interval)
+            await asyncio.sleep(interval)
+
+
+async def open_async_arm(client, priority=PRIORITY_NORMAL, port=None, verbose=False):
+    """เหมือน open_arm() แต่คืน AsyncArm (การค้นหา Port / ต่อ server ไม่ค้าง event loop)"""
+    device = await asyncio.get_running_loop().run_in_executor(None, open_arm, client, priority, port, verbose)
+    return AsyncArm(device)
+
+
+# ----------------- ทดลอง (CLI) -----------------
+
+async def watch(interval=0.5):
+    """pose stream กับ Future ของคิวที่เหลือ ทำงานพร้อมกันใน event loop เดียว"""
+    async with await open_async_arm("async-watch", PRIORITY_BACKGROUND, verbose=True) as arm:
+        async for pose in arm.poses(interval):
+            pending = await arm.pending()
+            print(f"📍 ({pose[0]:.1f}, {pose[1]:.1f}, {pose[2]:.1f}, {pose[3]:.1f}) | index {arm.current} | pending {pending}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dobot asyncio client")
+    parser.add_argument("--watch", action="store_true", help="แสดง pose และคิวของแขนแบบสด")
+    parser.add_argument("--interval", type=float, default=0.5)
+    args = parser.parse_args()
+    if args.watch:
+        try:
+            asyncio.run(watch(args.interval))
+        except KeyboardInterrupt:
+            pass
+    else:
+        parser.print_help()
@@ -0,0 +1,375 @@
+# device.py
+# ชั้นกลางสำหรับคุยกับ Dobot ที่ทุกโปรเจกต์ใช้ร่วมกัน (แทน find_dobot_port / Dobot(port=...) ที่เคยก๊อปกันไปมา)
+#
+#   from dobot_common.device import DobotDevice
+#   device = DobotDevice.open()              # หา Port เอง (หรือกำหนด DOBOT_PORT=COM5 / /dev/ttyUSB0)
+#   index = device.queue_move(x, y, z)       # เข้าคิวของแขนแบบไม่รอ -> เลข index ในคิว
+#   device.wait_for(index)                   # รอจนแขนทำคำสั่งนั้นเสร็จ
+#   device.pose(max_age=0.2)                 # ใช้ค่าในแคชถ้ายังใหม่พอ (ไม่แย่ง Serial จากงานเคลื่อนที่)
+#   device.move_to(x, y, z, r, wait=True)    # API เดิมของ pydobot ใช้ได้เหมือนเดิม (+ retry)
+#   device.queue_path([(x, y, z), ...])      # หลายจุดติดกัน ส่งแบบ pipeline (ไม่รอคำตอบทีละจุด)
+#   device._set_cp_cmd(...)                  # เมธอดอื่นของ pydobot.Dobot ส่งต่อให้อัตโนมัติ
+#
+# Transport (DOBOT_TRANSPORT): fast = dobot_common/transport.py (ค่าเริ่มต้น), pydobot = ส่งผ่าน pydobot.Dobot แบบเดิม
+#
+# ปรับปรุง driver ที่ไฟล์นี้ที่เดียว -> ทุกแอปได้ผลพร้อมกัน และวัดผลได้ที่เดียว:
+#   python -m dobot_common.device --benchmark
+import argparse
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+try:
+    import serial
+    import serial.tools.list_ports
+except ImportError:
+    serial = None
+
+try:
+    from pydobot import Dobot
+    from pydobot.enums import PTPMode
+    from pydobot.message import Message
+except ImportError:
+    Dobot = None
+    PTPMode = None
+    Message = None
+
+from dobot_common.transport import CTRL_QUEUED, PTP_MOVL_XYZ, SET_GET_CP_PARAMS, FastDobot
+
+PORT_ENV = 'DOBOT_PORT'
+# USB-Serial ที่ Dobot ใช้: (VID, PID) ของ Silicon Labs CP210x และ CH340
+DOBOT_USB_IDS = {(0x10C4, 0xEA60), (0x1A86, 0x7523)}
+DOBOT_PORT_KEYWORDS = ('SILICON LABS', 'CP210', 'CH340', 'USB-SERIAL', 'USB SERIAL')
+DOBOT_PORT_PATTERNS = ('ttyUSB', 'ttyACM', 'cu.usbserial', 'cu.SLAB_USBtoUART', 'cu.wchusbserial')
+
+RETRY_ATTEMPTS = 3
+RETRY_DELAY = 0.1               # วินาที ก่อนลองใหม่ครั้งแรก (คูณ RETRY_BACKOFF ทุกครั้ง)
+RETRY_BACKOFF = 2.0
+CONNECT_ATTEMPTS = 2            # ลองเปิดแต่ละ Port กี่ครั้ง (Port เพิ่งเสียบ/เพิ่งถูกปล่อยบางทีเปิดไม่ได้ครั้งแรก)
+QUEUE_POLL_INTERVAL = 0.05      # วินาที ระหว่างถามเลข index ที่แขนทำถึง
+QUEUE_LIMIT = 16                # คำสั่งที่ค้างในคิวของแขนได้สูงสุด (คิวของ Dobot เต็ม = คำสั่งใหม่หาย)
+TRANSPORTS = ('fast', 'pydobot')
+TRANSPORT = os.environ.get('DOBOT_TRANSPORT', 'fast')
+# วินาทีที่ฝั่งคอมพิวเตอร์ใช้ต่อ 1 คำสั่งเข้าคิว (ใช้ประมาณเวลา วัดใหม่ได้ด้วย --benchmark)
+COMMAND_OVERHEAD_S = {'fast': 0.005, 'pydobot': 0.2}
+
+
+class DobotNotFound(Exception):
+    pass
+
+
+# ----------------- ค้นหา Port -----------------
+
+def find_dobot_ports(verbose=False):
+    """Port ที่น่าจะเป็น Dobot เรียงตามความน่าจะเป็น (VID/PID > ชื่อชิป > ชื่อ Device) ค่าใน DOBOT_PORT มาก่อนเสมอ"""
+    ranked = []
+    ports = serial.tools.list_ports.comports() if serial is not None else []
+    if verbose: print("\n🔍 รายชื่อ Port ที่เจอ:")
+    for port in ports:
+        desc = f"{port.description or ''} {port.manufacturer or ''}".upper()
+        if verbose: print(f"   - Device: {port.device}, Desc: {port.description}")
+        if (port.vid, port.pid) in DOBOT_USB_IDS: rank = 0
+        elif any(k in desc for k in DOBOT_PORT_KEYWORDS): rank = 1
+        elif any(p in port.device for p in DOBOT_PORT_PATTERNS): rank = 2
+        elif port.device.upper().startswith('COM') and 'BLUETOOTH' not in desc: rank = 3
+        else: continue
+        ranked.append((rank, port.device))
+    candidates = [device for _, device in sorted(ranked)]
+    manual = os.environ.get(PORT_ENV)
+    if manual:
+        candidates = [manual] + [p for p in candidates if p != manual]
+    return candidates
+
+def find_dobot_port(verbose=False):
+    """Port แรกที่น่าจะเป็น Dobot หรือ None"""
+    candidates = find_dobot_ports(verbose)
+    if verbose: print(f" เลือกใช้ Port: {candidates[0]}" if candidates else " ไม่พบ Port ที่เข้าข่าย")
+    return candidates[0] if candidates else None
+
+
+# ----------------- Retry -----------------
+
+class RetryPolicy:
+    """
+    ลองใหม่เมื่อ Serial ผิดพลาด (pydobot คืน response=None เมื่ออ่านไม่ทัน -> AttributeError/struct.error)
+    ใช้กับคำสั่งที่ส่งซ้ำได้ไม่เสียหายเท่านั้น: อ่านค่า, ตั้งค่า, PTP ไปพิกัดสัมบูรณ์, เปิด/ปิดหัวดูด
+    """
+
+    def __init__(self, attempts=RETRY_ATTEMPTS, delay=RETRY_DELAY, backoff=RETRY_BACKOFF,
+                 exceptions=(OSError, AttributeError, struct.error, IndexError)):
+        self.attempts = attempts
+        self.delay = delay
+        self.backoff = backoff
+        self.exceptions = exceptions if serial is None else exceptions + (serial.SerialException,)
+        self.retries = 0
+
+    def call(self, fn, *args, **kwargs):
+        delay = self.delay
+        for attempt in range(self.attempts):
+            try:
+                return fn(*args, **kwargs)
+            except self.exceptions:
+                if attempt == self.attempts - 1: raise
+                self.retries += 1
+                time.sleep(delay)
+                delay *= self.backoff
+
+
+NO_RETRY = RetryPolicy(attempts=1)
+
+
+# ----------------- Device -----------------
+
+class DobotDevice:
+    def __init__(self, port, verbose=False, retry=None, transport=None):
+        transport = transport or TRANSPORT
+        if transport not in TRANSPORTS:
+            raise ValueError(f"transport ต้องเป็นหนึ่งใน {TRANSPORTS}")
+        self.port = port
+        self.transport = transport
+        self.retry = retry or RetryPolicy()
+        if transport == 'fast':
+            # ล้างบัฟเฟอร์ก่อนเริ่ม reader ในตัว FastDobot เอง
+            self.bot = FastDobot(port, verbose=verbose)
+        else:
+            if Dobot is None:
+                raise ImportError("ไม่พบ pydobot: pip install pydobot")
+            self.bot = Dobot(port=port, verbose=verbose)
+            try:
+                # ทิ้งข้อมูลค้างจากโปรแกรมก่อนหน้า (เคยต้องทำเองในแต่ละแอป)
+                self.bot.ser.reset_input_buffer()
+                self.bot.ser.reset_output_buffer()
+            except Exception:
+                pass
+        self.last_index = None          # index ของคำสั่งล่าสุดที่เราส่งเข้าคิว
+        self._current = 0               # index ที่แขนทำถึง (ค่าล่าสุดที่เคยถาม)
+        self._pose = None
+        self._pose_time = 0.0
+        self._pose_lock = threading.Lock()
+
+    @classmethod
+    def open(cls, port=None, verbose=False, retry=None, transport=None):
+        """ต่อ Port ที่ระบุ หรือไล่ทุก Port ที่น่าจะเป็น Dobot จนกว่าจะต่อได้"""
+        candidates = [port] if port else find_dobot_ports(verbose)
+        if not candidates:
+            raise DobotNotFound("ไม่พบ Dobot! กรุณาตรวจสอบการเชื่อมต่อ USB (หรือกำหนด DOBOT_PORT)")
+        errors = []
+        for candidate in candidates:
+            for _ in range(CONNECT_ATTEMPTS):
+                try:
+                    device = cls(candidate, verbose=verbose, retry=retry, transport=transport)
+                    print(f"✅ เชื่อมต่อ Dobot ที่ {candidate}")
+                    return device
+                except Exception as e:
+                    errors.append(f"{candidate}: {e}")
+                    time.sleep(RETRY_DELAY)
+        raise DobotNotFound("เชื่อมต่อ Dobot ไม่ได้ (" + "; ".join(errors[-3:]) + ")")
+
+    def __getattr__(self, name):
+        # เมธอดที่ไม่ได้ห่อไว้ (เช่น _set_cp_cmd, ser) ส่งต่อให้ pydobot.Dobot ตรงๆ
+        bot = self.__dict__.get("bot")
+        if bot is None: raise AttributeError(name)
+        return getattr(bot, name)
+
+    def close(self):
+        self.bot.close()
+
+    # ----------------- คิวคำสั่ง (ไม่รอ) -----------------
+
+    def _queued(self, response):
+        """response ของคำสั่งเข้าคิว -> index (และจำไว้เป็น last_index)"""
+        index = struct.unpack_from('L', response.params, 0)[0]
+        self.last_index = index
+        return index
+
+    def _wait_room(self, count=1):
+        """รอจนคิวของแขนมีที่ว่างพอ count คำสั่ง (ถามแขนเฉพาะตอนเลข index ที่จำไว้บอกว่าใกล้เต็ม)"""
+        count = min(count, QUEUE_LIMIT)
+        while self.last_index is not None and self.last_index - self._current > QUEUE_LIMIT - count:
+            if self.current_index() >= self.last_index - (QUEUE_LIMIT - count): return
+            time.sleep(QUEUE_POLL_INTERVAL)
+
+    def _default_mode(self, mode):
+        if mode is not None: return mode
+        return PTPMode.MOVL_XYZ if self.transport == 'pydobot' else PTP_MOVL_XYZ
+
+    def queue_move(self, x, y, z, r=0, mode=None):
+        mode = self._default_mode(mode)
+        self._wait_room()
+        return self.retry.call(lambda: self._queued(self.bot._set_ptp_cmd(x, y, z, r, mode=mode, wait=False)))
+
+    def queue_path(self, points, r=0, mode=None):
+        """
+        [(x, y, z), ...] -> [index, ...] เข้าคิวต่อกันทั้งหมด
+        transport fast: ส่งทีละชุดเท่าที่คิวของแขนว่าง โดยไม่รอคำตอบทีละจุด (ไม่ retry: ส่งซ้ำกลางชุดแล้วลำดับจุดเพี้ยน)
+        """
+        mode = self._default_mode(mode)
+        if self.transport != 'fast':
+            return [self.queue_move(x, y, z, r, mode) for x, y, z in points]
+        indices = []
+        points = list(points)
+        while points:
+            room = QUEUE_LIMIT if self.last_index is None else QUEUE_LIMIT - (self.last_index - self._current)
+            if room <= 0:
+                self._wait_room(min(len(points), QUEUE_LIMIT // 2))
+                continue
+            batch, points = points[:room], points[room:]
+            requests = [self.bot.send_ptp(x, y, z, r, mode) for x, y, z in batch]
+            for req in requests:
+                indices.append(self._queued(self.bot.transport.wait(req)))
+        return indices
+
+    def queue_cp(self, x, y, z):
+        # CP ต่อจากช่วงก่อนหน้าในคิว ส่งซ้ำ = เดินซ้ำอีกช่วง -> ไม่ retry
+        self._wait_room()
+        return self._queued(self.bot._set_cp_cmd(x, y, z))
+
+    def queue_suction(self, enable):
+        self._wait_room()
+        return self.retry.call(lambda: self._queued(self.bot._set_end_effector_suction_cup(enable)))
+
+    def queue_gripper(self, enable):
+        self._wait_room()
+        return self.retry.call(lambda: self._queued(self.bot._set_end_effector_gripper(enable)))
+
+    def queue_wait(self, ms):
+        # Wait ส่งซ้ำแล้วรอนานขึ้น -> ไม่ retry
+        self._wait_room()
+        return self._queued(self.bot._set_wait_cmd(int(ms)))
+
+    def current_index(self):
+        self._current = self.retry.call(self.bot._get_queued_cmd_current_index)
+        return self._current
+
+    def pending(self):
+        """จำนวนคำสั่งของเราที่แขนยังทำไม่ถึง"""
+        if self.last_index is None: return 0
+        return max(0, self.last_index - self.current_index())
+
+    def wait_for(self, index=None, timeout=None, poll=QUEUE_POLL_INTERVAL):
+        """รอจนแขนทำคำสั่ง index (ค่าเริ่มต้น = คำสั่งล่าสุด) เสร็จ คืน True ถ้าทันเวลา"""
+        index = self.last_index if index is None else index
+        if index is None: return True
+        deadline = None if timeout is None else time.time() + timeout
+        while self.current_index() < index:
+            if deadline is not None and time.time() > deadline: return False
+            time.sleep(poll)
+        self._pose_time = 0.0           # แขนขยับแล้ว แคชเก่า
+        return True
+
+    def stop_queue(self):
+        self.retry.call(self.bot._set_queued_cmd_stop_exec)
+
+    def clear_queue(self):
+        self.retry.call(self.bot._set_queued_cmd_clear)
+        self.last_index = None
+
+    def start_queue(self):
+        self.retry.call(self.bot._set_queued_cmd_start_exec)
+
+    def halt(self):
+        """หยุดคิว ทิ้งคำสั่งที่เหลือ แล้วเปิดรับคำสั่งใหม่"""
+        self.stop_queue()
+        self.clear_queue()
+        self.start_queue()
+        self._pose_time = 0.0
+
+    # ----------------- API แบบเดิมของ pydobot -----------------
+
+    def move_to(self, x, y, z, r=0, wait=False):
+        index = self.queue_move(x, y, z, r)
+        if wait: self.wait_for(index)
+        return index
+
+    def suck(self, enable, wait=False):
+        index = self.queue_suction(enable)
+        if wait: self.wait_for(index)
+        return index
+
+    def grip(self, enable, wait=False):
+        index = self.queue_gripper(enable)
+        if wait: self.wait_for(index)
+        return index
+
+    def speed(self, velocity=100., acceleration=100.):
+        self.retry.call(self.bot.speed, velocity, acceleration)
+
+    def cp_params(self, plan_acc, junction_vel, acc, real_time=False):
+        """ความเร่ง/ความเร็วที่รอยต่อของ CP (queue_cp) เข้าคิว -> มีผลกับช่วง CP ที่ส่งหลังจากนี้"""
+        if self.transport == 'fast':
+            self.retry.call(self.bot._set_cp_params, plan_acc, junction_vel, acc, real_time)
+            return
+        # pydobot ไม่มีคำสั่งนี้ -> ประกอบ Message เอง
+        msg = Message()
+        msg.id, msg.ctrl = SET_GET_CP_PARAMS, CTRL_QUEUED
+        msg.params = bytearray(struct.pack('<3fB', plan_acc, junction_vel, acc, 0x01 if real_time else 0x00))
+        self.retry.call(self.bot._send_command, msg)
+
+    def pose(self, max_age=0.0):
+        """(x, y, z, r, j1, j2, j3, j4) อ่านใหม่ถ้าแคชเก่ากว่า max_age วินาที"""
+        with self._pose_lock:
+            if self._pose is not None and time.time() - self._pose_time <= max_age:
+                return self._pose
+        pose = tuple(self.retry.call(self.bot.pose))
+        with self._pose_lock:
+            self._pose, self._pose_time = pose, time.time()
+        return pose
+
+    def cached_pose(self):
+        """(pose, เวลาที่อ่าน) จากแคช ไม่แตะ Serial (pose เป็น None ถ้ายังไม่เคยอ่าน)"""
+        with self._pose_lock:
+            return self._pose, self._pose_time
+
+
+# ----------------- Benchmark (CLI) -----------------
+
+def _timed(fn, n):
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return np.array(times)
+
+def benchmark(device, n=20):
+    """เวลาต่อคำสั่งของ driver (ไม่ขยับแขน: ใช้คำสั่งอ่านค่า + Wait 0 ms ในคิว)"""
+    results = {}
+    for name, fn in (("pose", lambda: device.pose()),
+                     ("current_index", device.current_index),
+                     ("queue_wait", lambda: device.queue_wait(0))):
+        t = _timed(fn, n)
+        results[name] = {"mean_ms": float(t.mean()), "p95_ms": float(np.percentile(t, 95))}
+        print(f"   {name:<14} เฉลี่ย {t.mean():7.1f} ms | p95 {np.percentile(t, 95):7.1f} ms | {1000.0 / t.mean():5.1f} คำสั่ง/วินาที")
+    t0 = time.perf_counter()
+    device.wait_for()
+    print(f"   queue drain    {(time.perf_counter() - t0) * 1000.0:7.1f} ms | retry {device.retry.retries} ครั้ง")
+    if device.transport == 'fast':
+        print("\n📊 latency ต่อคำสั่ง (ส่ง -> ได้คำตอบ):")
+        device.bot.transport.print_histograms()
+        results["transport"] = device.bot.transport.stats()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dobot device layer tools")
+    parser.add_argument("--list", action="store_true", help="แสดง Port ที่น่าจะเป็น Dobot")
+    parser.add_argument("--benchmark", action="store_true", help="วัดเวลาต่อคำสั่งของ driver")
+    parser.add_argument("--port", default=None)
+    parser.add_argument("--transport", choices=TRANSPORTS, default=None, help="ค่าเริ่มต้นตาม DOBOT_TRANSPORT (fast)")
+    parser.add_argument("-n", type=int, default=20)
+    args = parser.parse_args()
+    if args.list:
+        ports = find_dobot_ports(verbose=True)
+        print("\n📋 ลำดับที่จะลองต่อ: " + (", ".join(ports) if ports else "(ไม่มี)"))
+    elif args.benchmark:
+        dev = DobotDevice.open(args.port, transport=args.transport)
+        print(f"🚚 transport: {dev.transport}")
+        try:
+            benchmark(dev, args.n)
+        finally:
+            dev.close()
+    else:
+        parser.print_help()
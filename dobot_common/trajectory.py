@@ -0,0 +1,250 @@
+# trajectory.py
+# บันทึกและเล่นซ้ำเส้นทางของแขนกล (ตำแหน่ง + การเปิด/ปิดหัวดูด/Gripper พร้อมเวลา)
+#
+#   rec = TrajectoryRecorder()
+#   rec.add_pose(device.pose())          # หรือ rec.start_sampling(lambda: device.pose(), hz=5)
+#   rec.add_event('suction', True)
+#   traj = rec.stop()
+#   traj.save('trajectories/demo.dtraj')  # .dtraj = binary, .json = อ่านได้ด้วยตา
+#
+#   player = TrajectoryPlayer(device)       # device = DobotDevice หรือ ArmClient (dobot_common.arm_server)
+#   player.play(Trajectory.load('trajectories/demo.dtraj'), time_scale=1.0)
+#
+# การเล่นซ้ำส่งคำสั่งทั้งหมดเข้าคิวของ Dobot ต่อเนื่อง (ไม่รอทีละจุด) โดยคุมให้ค้างในคิวไม่เกิน
+# QUEUE_WINDOW คำสั่ง และแทรกคำสั่ง Wait ของ Dobot เองเมื่อต้องรักษาจังหวะเวลาตามที่บันทึกไว้
+import json
+import math
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+KIND_POSE = 0
+KIND_SUCTION = 1
+KIND_GRIPPER = 2
+KIND_NAMES = {KIND_POSE: 'pose', KIND_SUCTION: 'suction', KIND_GRIPPER: 'gripper'}
+KIND_CODES = {name: code for code, name in KIND_NAMES.items()}
+
+# 1 record = 25 bytes: เวลา (วินาทีจากจุดเริ่ม), ชนิด, x, y, z, r, ค่า (เปิด/ปิด)
+RECORD_DTYPE = np.dtype([('t', '<f8'), ('kind', 'u1'), ('x', '<f4'), ('y', '<f4'),
+                         ('z', '<f4'), ('r', '<f4'), ('value', 'u1')])
+BINARY_MAGIC = b'DTRJ'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sHI')   # magic, version, จำนวน record
+
+QUEUE_WINDOW = 8                # จำนวนคำสั่งที่ค้างในคิวของแขนได้พร้อมกัน
+QUEUE_POLL_INTERVAL = 0.05      # วินาที
+MIN_WAIT_MS = 50                # ช่วงหยุดที่สั้นกว่านี้ไม่ต้องแทรก Wait
+EST_PLAY_SPEED_MM_S = 100.0     # ความเร็วเฉลี่ยโดยประมาณของแขน (ใช้หักเวลาเดินทางออกจากช่วงรอ)
+RECORD_MIN_DISTANCE = 2.0       # mm จุดที่ขยับน้อยกว่านี้ไม่บันทึก (ตอน sampling)
+
+
+class Trajectory:
+    """ลำดับ record เรียงตามเวลา เก็บเป็น numpy structured array"""
+
+    def __init__(self, records=None, meta=None):
+        self.records = records if records is not None else np.zeros(0, RECORD_DTYPE)
+        self.meta = dict(meta or {})
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def duration(self):
+        return float(self.records['t'][-1]) if len(self.records) else 0.0
+
+    def poses(self):
+        """เฉพาะตำแหน่ง (N, 4)"""
+        rec = self.records[self.records['kind'] == KIND_POSE]
+        return np.stack([rec['x'], rec['y'], rec['z'], rec['r']], axis=1)
+
+    # ----------------- บันทึก/โหลด -----------------
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if path.lower().endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump(self.to_dict(), f, indent=1, ensure_ascii=False)
+            return path
+        meta = json.dumps(self.meta, ensure_ascii=False).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(self.records)))
+            f.write(self.records.tobytes())
+            f.write(struct.pack('<I', len(meta)))
+            f.write(meta)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        if path.lower().endswith('.json'):
+            with open(path, 'r') as f:
+                return cls.from_dict(json.load(f))
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, count = BINARY_HEADER.unpack_from(data, 0)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError(f"Not a trajectory file (v{BINARY_VERSION}): {path}")
+        offset = BINARY_HEADER.size
+        records = np.frombuffer(data, RECORD_DTYPE, count, offset).copy()
+        offset += count * RECORD_DTYPE.itemsize
+        meta = {}
+        if len(data) >= offset + 4:
+            (meta_len,) = struct.unpack_from('<I', data, offset)
+            meta = json.loads(data[offset + 4:offset + 4 + meta_len].decode('utf-8'))
+        return cls(records, meta)
+
+    def to_dict(self):
+        events = []
+        for rec in self.records:
+            kind = KIND_NAMES[int(rec['kind'])]
+            item = {"t": round(float(rec['t']), 4), "kind": kind}
+            if kind == 'pose':
+                item.update(x=round(float(rec['x']), 2), y=round(float(rec['y']), 2),
+                            z=round(float(rec['z']), 2), r=round(float(rec['r']), 2))
+            else:
+                item["on"] = bool(rec['value'])
+            events.append(item)
+        return {"meta": self.meta, "events": events}
+
+    @classmethod
+    def from_dict(cls, data):
+        events = data.get("events", [])
+        records = np.zeros(len(events), RECORD_DTYPE)
+        for i, ev in enumerate(events):
+            records[i] = (ev["t"], KIND_CODES[ev["kind"]], ev.get("x", 0), ev.get("y", 0),
+                          ev.get("z", 0), ev.get("r", 0), 1 if ev.get("on") else 0)
+        return cls(records, data.get("meta"))
+
+
+class TrajectoryRecorder:
+    """เก็บ record พร้อมเวลา (เรียก add_* เองหรือให้ sampling thread อ่าน pose เป็นรอบ)"""
+
+    def __init__(self, min_distance=RECORD_MIN_DISTANCE, trajectory=None):
+        self.min_distance = min_distance
+        self._rows = []
+        self._lock = threading.Lock()
+        self._t0 = time.time()
+        self._last_pose = None
+        if trajectory is not None and len(trajectory):
+            # บันทึกต่อจากไฟล์เดิม: เวลาใหม่เริ่มหลัง record สุดท้าย
+            self._rows = [tuple(rec.item()) for rec in trajectory.records]
+            self._t0 -= trajectory.duration
+        self._sampler = None
+        self._stop = threading.Event()
+
+    def _now(self):
+        return time.time() - self._t0
+
+    def add_pose(self, pose, force=True):
+        """pose = (x, y, z, r, ...) ; force=False จะข้ามจุดที่ขยับน้อยกว่า min_distance"""
+        x, y, z, r = (float(v) for v in pose[:4])
+        with self._lock:
+            if not force and self._last_pose is not None:
+                if math.dist(self._last_pose[:3], (x, y, z)) < self.min_distance:
+                    return False
+            self._rows.append((self._now(), KIND_POSE, x, y, z, r, 0))
+            self._last_pose = (x, y, z, r)
+        return True
+
+    def add_event(self, kind, on):
+        """kind = 'suction' หรือ 'gripper'"""
+        with self._lock:
+            self._rows.append((self._now(), KIND_CODES[kind], 0.0, 0.0, 0.0, 0.0, 1 if on else 0))
+
+    def start_sampling(self, pose_fn, hz=5.0):
+        """อ่าน pose_fn() เป็นรอบใน Background (เช่นตอนบังคับแขนด้วยมือ/Gesture)"""
+        self._stop.clear()
+        def loop():
+            while not self._stop.wait(1.0 / hz):
+                try:
+                    self.add_pose(pose_fn(), force=False)
+                except Exception as e:
+                    print(f" ⚠️ Trajectory sample failed: {e}")
+        self._sampler = threading.Thread(target=loop, daemon=True)
+        self._sampler.start()
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._last_pose = None
+            self._t0 = time.time()
+
+    def snapshot(self, **meta):
+        """Trajectory ของสิ่งที่บันทึกไว้ถึงตอนนี้ (ยังบันทึกต่อได้)"""
+        with self._lock:
+            records = np.array(self._rows, dtype=RECORD_DTYPE)
+        meta.setdefault("created", time.strftime('%Y-%m-%d %H:%M:%S'))
+        return Trajectory(records, meta)
+
+    def stop(self, **meta):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=2.0)
+            self._sampler = None
+        return self.snapshot(**meta)
+
+
+class TrajectoryPlayer:
+    """
+    เล่น Trajectory แบบส่งเข้าคิวต่อเนื่อง
+    time_scale: None = เร็วที่สุด (ไม่รอ), 1.0 = ตามจังหวะที่บันทึก, 0.5 = เร็วขึ้น 2 เท่า
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self._stop = threading.Event()
+
+    def stop(self):
+        """หยุดกลางคัน: ทิ้งคำสั่งที่ค้างในคิวของแขน"""
+        self._stop.set()
+
+    def _send(self, rec, dwell_ms):
+        device = self.device
+        if dwell_ms >= MIN_WAIT_MS:
+            device.queue_wait(int(dwell_ms))
+        kind = int(rec['kind'])
+        if kind == KIND_POSE:
+            return device.queue_move(float(rec['x']), float(rec['y']), float(rec['z']), float(rec['r']))
+        if kind == KIND_SUCTION:
+            return device.queue_suction(bool(rec['value']))
+        return device.queue_gripper(bool(rec['value']))
+
+    def _wait_window(self, pending, limit):
+        """รอจนคำสั่งที่ค้างในคิวเหลือ < limit (limit=1 = รอจนหมดคิว)"""
+        while pending and not self._stop.is_set():
+            current = self.device.current_index()
+            while pending and pending[0] <= current:
+                pending.pop(0)
+            if len(pending) < limit: return
+            time.sleep(QUEUE_POLL_INTERVAL)
+
+    def play(self, trajectory, time_scale=1.0, on_progress=None):
+        """ส่งทุก record เข้าคิว คืนจำนวน record ที่ส่งไป (บล็อกจนแขนทำครบหรือถูก stop)"""
+        self._stop.clear()
+        pending = []
+        prev_t, prev_xyz = None, None
+        sent = 0
+        for i, rec in enumerate(trajectory.records):
+            if self._stop.is_set(): break
+            dwell_ms = 0.0
+            if time_scale and prev_t is not None:
+                gap_s = (float(rec['t']) - prev_t) * time_scale
+                travel_s = 0.0
+                if int(rec['kind']) == KIND_POSE and prev_xyz is not None:
+                    travel_s = math.dist(prev_xyz, (float(rec['x']), float(rec['y']), float(rec['z']))) / EST_PLAY_SPEED_MM_S
+                dwell_ms = (gap_s - travel_s) * 1000.0
+            self._wait_window(pending, QUEUE_WINDOW)
+            index = self._send(rec, dwell_ms)
+            if index is not None: pending.append(index)
+            prev_t = float(rec['t'])
+            if int(rec['kind']) == KIND_POSE:
+                prev_xyz = (float(rec['x']), float(rec['y']), float(rec['z']))
+            sent += 1
+            if on_progress: on_progress(i + 1, len(trajectory))
+        if self._stop.is_set():
+            self.device.halt()
+        else:
+            self._wait_window(pending, 1)
+        return sent
@@ -0,0 +1,368 @@
+# transport.py
+# ชั้นส่ง/รับแพ็กเก็ต Dobot แบบ pipeline แทน _send_command ของ pydobot
+#
+# pydobot ส่ง 1 คำสั่ง = sleep 0.1s -> เขียน -> sleep 0.1s -> read_all() (~5 คำสั่ง/วินาที ไม่ว่าสายจะเร็วแค่ไหน)
+# DobotTransport:
+#   - เขียนแพ็กเก็ตทันที ลงบัฟเฟอร์ที่จองไว้ครั้งเดียว (struct.pack_into ไม่สร้าง bytes ใหม่ทุกคำสั่ง)
+#   - Thread reader แยกเฟรมจาก Serial ตลอดเวลา แล้วจับคู่กับคำขอด้วย command ID (Dobot ตอบตามลำดับที่ส่ง)
+#   - ส่งล่วงหน้าได้ PIPELINE_DEPTH คำสั่งโดยไม่ต้องรอคำตอบทีละคำสั่ง
+#   - เก็บ latency (ส่ง -> ได้คำตอบ) แยกตามคำสั่งเป็น histogram
+#
+# FastDobot ใช้แทน pydobot.Dobot ใน DobotDevice ได้ (เมธอดชุดเดียวกัน) เลือกด้วย DOBOT_TRANSPORT=fast|pydobot
+#   python -m dobot_common.device --benchmark                      # fast (ค่าเริ่มต้น)
+#   DOBOT_TRANSPORT=pydobot python -m dobot_common.device --benchmark
+import bisect
+import struct
+import threading
+import time
+from collections import deque
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+PIPELINE_DEPTH = 8              # คำสั่งที่ส่งไปแล้วรอคำตอบได้พร้อมกันสูงสุด
+RESPONSE_TIMEOUT = 0.5          # วินาที: ไม่ได้คำตอบภายในนี้ -> TimeoutError (RetryPolicy ลองใหม่ได้)
+READ_TIMEOUT = 0.05             # วินาที: timeout ของ ser.read ใน reader (ความไวในการหยุด Thread)
+MAX_PARAMS = 255 - 2
+HEADER = b'\xaa\xaa'
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Command ID ตาม Dobot Communication Protocol (ชุดเดียวกับ pydobot.enums.CommunicationProtocolIDs)
+GET_POSE = 10
+SET_GET_END_EFFECTOR_SUCTION_CUP = 62
+SET_GET_END_EFFECTOR_GRIPPER = 63
+SET_GET_PTP_JOINT_PARAMS = 80
+SET_GET_PTP_COORDINATE_PARAMS = 81
+SET_GET_PTP_JUMP_PARAMS = 82
+SET_GET_PTP_COMMON_PARAMS = 83
+SET_PTP_CMD = 84
+SET_GET_CP_PARAMS = 90
+SET_CP_CMD = 91
+SET_WAIT_CMD = 110
+SET_QUEUED_CMD_START_EXEC = 240
+SET_QUEUED_CMD_STOP_EXEC = 241
+SET_QUEUED_CMD_CLEAR = 245
+GET_QUEUED_CMD_CURRENT_INDEX = 246
+COMMAND_NAMES = {v: k.lower() for k, v in list(globals().items()) if k.isupper() and isinstance(v, int)
+                 and (k.startswith(('GET_', 'SET_')))}
+
+CTRL_READ = 0x00
+CTRL_WRITE = 0x01
+CTRL_QUEUED = 0x03              # write + เข้าคิวของแขน (คำตอบคือ index ในคิว)
+PTP_MOVL_XYZ = 2                # ค่าเดียวกับ pydobot PTPMode.MOVL_XYZ
+
+# layout ของ params (little-endian) -> pack_into ลงบัฟเฟอร์ส่งโดยตรง
+_PTP = struct.Struct('<B4f')
+_CP = struct.Struct('<B3fB')
+_CP_PARAMS = struct.Struct('<3fB')     # planAcc, junctionVel, acc (realTimeTrack=0) / period, realTimeTrack
+_ON_OFF = struct.Struct('<BB')
+_WAIT = struct.Struct('<I')
+_F2 = struct.Struct('<2f')
+_F4 = struct.Struct('<4f')
+_F8 = struct.Struct('<8f')
+_POSE = struct.Struct('<8f')
+
+
+class Response:
+    """เฟรมคำตอบจาก Dobot (มี .params เหมือน pydobot Message)"""
+
+    __slots__ = ("id", "ctrl", "params")
+
+    def __init__(self, cmd_id, ctrl, params):
+        self.id = cmd_id
+        self.ctrl = ctrl
+        self.params = params
+
+
+class _Request:
+    __slots__ = ("cmd_id", "sent", "done", "response", "abandoned")
+
+    def __init__(self, cmd_id):
+        self.cmd_id = cmd_id
+        self.sent = 0.0
+        self.done = threading.Event()
+        self.response = None
+        self.abandoned = False
+
+
+class LatencyHistogram:
+    """นับ latency (ms) เป็นช่วง LATENCY_BUCKETS_MS (ช่องสุดท้าย = เกินช่วงบนสุด)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.n += 1
+        self.total += ms
+        if ms > self.max: self.max = ms
+
+    def percentile(self, q):
+        """ขอบบนของช่องที่ครอบ percentile q (ช่องสุดท้ายใช้ค่าสูงสุดที่เจอ)"""
+        if self.n == 0: return 0.0
+        target = q / 100.0 * self.n
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return float(self.buckets[i]) if i < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self):
+        return {"n": self.n, "mean_ms": self.total / self.n if self.n else 0.0,
+                "p50_ms": self.percentile(50), "p95_ms": self.percentile(95), "max_ms": self.max,
+                "buckets": dict(zip([f"<={b}" for b in self.buckets] + [f">{self.buckets[-1]}"], self.counts))}
+
+
+class DobotTransport:
+    def __init__(self, ser, depth=PIPELINE_DEPTH, timeout=RESPONSE_TIMEOUT):
+        self.ser = ser
+        self.timeout = timeout
+        self.histograms = {}            # command ID -> LatencyHistogram
+        self.timeouts = 0
+        self.unmatched = 0              # คำตอบที่ไม่มีคำขอรออยู่ (เช่น มาช้าหลัง timeout ไปแล้ว)
+        self.bad_frames = 0
+        self.error = None
+        self._tx = bytearray(5 + MAX_PARAMS + 1)
+        self._rx = bytearray()
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()   # คุม _pending / histogram
+        self._pending = {}              # command ID -> deque[_Request] (ตามลำดับที่ส่ง)
+        self._window = threading.BoundedSemaphore(depth)
+        self._running = True
+        self._reader = threading.Thread(target=self._read_loop, name='dobot-reader', daemon=True)
+        self._reader.start()
+
+    def close(self):
+        self._running = False
+        self._reader.join(timeout=1.0)
+
+    # ----------------- ส่ง -----------------
+
+    def send(self, cmd_id, ctrl, layout=None, *values):
+        """เขียนแพ็กเก็ตแล้วคืนทันที -> _Request (รอคำตอบด้วย wait())"""
+        if self.error is not None: raise self.error
+        if not self._window.acquire(timeout=self.timeout):
+            self.timeouts += 1
+            raise TimeoutError(f"Dobot ไม่ตอบ ({PIPELINE_DEPTH} คำสั่งค้าง)")
+        req = _Request(cmd_id)
+        size = layout.size if layout is not None else 0
+        tx = self._tx
+        with self._write_lock:
+            tx[0] = tx[1] = 0xAA
+            tx[2] = 2 + size
+            tx[3] = cmd_id
+            tx[4] = ctrl
+            if layout is not None: layout.pack_into(tx, 5, *values)
+            view = memoryview(tx)
+            tx[5 + size] = -(cmd_id + ctrl + sum(view[5:5 + size])) & 0xFF
+            # ลงทะเบียนก่อนเขียน: คำตอบมาเร็วกว่าบรรทัดถัดไปได้
+            with self._lock:
+                self._pending.setdefault(cmd_id, deque()).append(req)
+            req.sent = time.perf_counter()
+            try:
+                self.ser.write(view[:6 + size])
+            except Exception:
+                self._abandon(req)
+                raise
+        return req
+
+    def wait(self, req, timeout=None):
+        """คำตอบของ req หรือ TimeoutError"""
+        if req.done.wait(self.timeout if timeout is None else timeout):
+            return req.response
+        with self._lock:
+            if req.done.is_set(): return req.response
+            self._abandon_locked(req)
+        self.timeouts += 1
+        if self.error is not None: raise self.error
+        raise TimeoutError(f"Dobot ไม่ตอบคำสั่ง {COMMAND_NAMES.get(req.cmd_id, req.cmd_id)}")
+
+    def request(self, cmd_id, ctrl, layout=None, *values):
+        return self.wait(self.send(cmd_id, ctrl, layout, *values))
+
+    def _abandon(self, req):
+        with self._lock:
+            self._abandon_locked(req)
+
+    def _abandon_locked(self, req):
+        # เอาออกจากคิวของ ID นั้นทันที: คำตอบที่หาย/เสีย 1 เฟรมไม่ทำให้ทุกคำขอหลังจากนี้เลื่อนคู่กันไปตลอด
+        # (คำตอบที่มาช้ากว่า RESPONSE_TIMEOUT ถือว่าหาย ถ้ามาจริงจะจับคู่ผิดได้อย่างมาก 1 ครั้งแล้วกลับมาตรงกันเอง)
+        if not req.abandoned:
+            req.abandoned = True
+            queue = self._pending.get(req.cmd_id)
+            if queue is not None:
+                try: queue.remove(req)
+                except ValueError: pass
+            self._window.release()
+
+    # ----------------- รับ -----------------
+
+    def _read_loop(self):
+        ser = self.ser
+        while self._running:
+            try:
+                chunk = ser.read(ser.in_waiting or 1)
+            except Exception as e:
+                if self._running:
+                    self.error = ConnectionError(f"Serial error: {e}")
+                    self._fail_pending()
+                return
+            if chunk:
+                self._rx += chunk
+                self._parse()
+
+    def _parse(self):
+        rx = self._rx
+        while True:
+            start = rx.find(HEADER)
+            if start < 0:
+                del rx[:-1]             # เก็บ 0xAA ตัวสุดท้ายไว้เผื่อเป็นครึ่งแรกของ header
+                return
+            if start:
+                del rx[:start]
+            if len(rx) < 3: return
+            total = rx[2] + 4
+            if len(rx) < total: return
+            if sum(memoryview(rx)[3:total]) & 0xFF:
+                self.bad_frames += 1
+                del rx[:2]              # checksum ผิด -> หา header ถัดไป
+                continue
+            self._complete(rx[3], rx[4], bytes(rx[5:total - 1]))
+            del rx[:total]
+
+    def _complete(self, cmd_id, ctrl, params):
+        now = time.perf_counter()
+        with self._lock:
+            queue = self._pending.get(cmd_id)
+            if not queue:
+                self.unmatched += 1
+                return
+            req = queue.popleft()
+            hist = self.histograms.get(cmd_id)
+            if hist is None: hist = self.histograms[cmd_id] = LatencyHistogram()
+            hist.add((now - req.sent) * 1000.0)
+            req.response = Response(cmd_id, ctrl, params)
+            req.done.set()
+            self._window.release()
+
+    def _fail_pending(self):
+        with self._lock:
+            for queue in self._pending.values():
+                for req in queue:
+                    if not req.abandoned and not req.done.is_set():
+                        req.abandoned = True
+                        self._window.release()
+                        req.done.set()  # response = None -> wait() คืน None แล้วผู้เรียก raise เอง
+                queue.clear()
+
+    # ----------------- สถิติ -----------------
+
+    def stats(self):
+        with self._lock:
+            per_command = {COMMAND_NAMES.get(k, str(k)): h.summary() for k, h in self.histograms.items()}
+        return {"commands": per_command, "timeouts": self.timeouts, "unmatched": self.unmatched,
+                "bad_frames": self.bad_frames}
+
+    def print_histograms(self):
+        stats = self.stats()
+        for name, s in sorted(stats["commands"].items()):
+            print(f"   {name:<34} n={s['n']:<5} เฉลี่ย {s['mean_ms']:6.1f} ms | p50 <={s['p50_ms']:g} | "
+                  f"p95 <={s['p95_ms']:g} | max {s['max_ms']:.1f} ms")
+            print("      " + "  ".join(f"{k}:{v}" for k, v in s["buckets"].items() if v))
+        print(f"   timeout {stats['timeouts']} | ไม่มีคู่ {stats['unmatched']} | เฟรมเสีย {stats['bad_frames']}")
+
+
+class FastDobot:
+    """ใช้แทน pydobot.Dobot ใน DobotDevice (เมธอดชุดเดียวกัน) แต่ส่งผ่าน DobotTransport"""
+
+    def __init__(self, port, verbose=False, depth=PIPELINE_DEPTH):
+        if serial is None:
+            raise ImportError("ไม่พบ pyserial: pip install pyserial")
+        self.verbose = verbose
+        self.ser = serial.Serial(port, baudrate=115200, parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE,
+                                 bytesize=serial.EIGHTBITS, timeout=READ_TIMEOUT)
+        self.transport = None
+        try:
+            self.ser.reset_input_buffer()
+            self.ser.reset_output_buffer()
+            self.transport = DobotTransport(self.ser, depth)
+            if verbose: print(f"FastDobot: {self.ser.name} open")
+            # ค่าเริ่มต้นเดียวกับ pydobot.Dobot.__init__
+            self._set_queued_cmd_start_exec()
+            self._set_queued_cmd_clear()
+            self._command(SET_GET_PTP_JOINT_PARAMS, CTRL_QUEUED, _F8, *([200.0] * 8))
+            self._command(SET_GET_PTP_JUMP_PARAMS, CTRL_QUEUED, _F2, 10.0, 200.0)
+            self.speed(100.0, 100.0)
+            self.pose()
+        except Exception:
+            # ต่อไม่สำเร็จ -> ปิด reader + Port ก่อน ไม่งั้น reader ที่ค้างจะแย่งคำตอบจากการลองครั้งถัดไป
+            # (Windows เปิด Port ที่ยังมี handle ค้างไม่ได้เลย)
+            self.close()
+            raise
+
+    def _command(self, cmd_id, ctrl, layout=None, *values):
+        response = self.transport.request(cmd_id, ctrl, layout, *values)
+        if response is None: raise ConnectionError("Serial ปิดระหว่างรอคำตอบ")
+        return response
+
+    def close(self):
+        if self.transport is not None: self.transport.close()
+        self.ser.close()
+
+    # ----------------- คำสั่งเข้าคิว (คืน Response ที่ params = index) -----------------
+
+    def _set_ptp_cmd(self, x, y, z, r, mode, wait=False):
+        response = self._command(SET_PTP_CMD, CTRL_QUEUED, _PTP, getattr(mode, 'value', mode), x, y, z, r)
+        if wait:
+            index = struct.unpack_from('<Q', response.params, 0)[0]
+            while self._get_queued_cmd_current_index() < index:
+                time.sleep(0.05)
+        return response
+
+    def send_ptp(self, x, y, z, r=0.0, mode=PTP_MOVL_XYZ):
+        """ส่ง PTP แบบไม่รอคำตอบ (pipeline) -> _Request ใช้กับ transport.wait()"""
+        return self.transport.send(SET_PTP_CMD, CTRL_QUEUED, _PTP, getattr(mode, 'value', mode), x, y, z, r)
+
+    def _set_cp_cmd(self, x, y, z):
+        return self._command(SET_CP_CMD, CTRL_QUEUED, _CP, 0x01, x, y, z, 0x00)
+
+    def _set_cp_params(self, plan_acc, junction_vel, acc, real_time=False):
+        return self._command(SET_GET_CP_PARAMS, CTRL_QUEUED, _CP_PARAMS, plan_acc, junction_vel, acc,
+                             0x01 if real_time else 0x00)
+
+    def _set_end_effector_suction_cup(self, enable=False):
+        return self._command(SET_GET_END_EFFECTOR_SUCTION_CUP, CTRL_QUEUED, _ON_OFF, 0x01, 0x01 if enable else 0x00)
+
+    def _set_end_effector_gripper(self, enable=False):
+        return self._command(SET_GET_END_EFFECTOR_GRIPPER, CTRL_QUEUED, _ON_OFF, 0x01, 0x01 if enable else 0x00)
+
+    def _set_wait_cmd(self, ms):
+        return self._command(SET_WAIT_CMD, CTRL_QUEUED, _WAIT, ms)
+
+    # ----------------- ควบคุมคิว / อ่านค่า -----------------
+
+    def _get_queued_cmd_current_index(self):
+        return struct.unpack_from('<Q', self._command(GET_QUEUED_CMD_CURRENT_INDEX, CTRL_READ).params, 0)[0]
+
+    def _set_queued_cmd_start_exec(self):
+        return self._command(SET_QUEUED_CMD_START_EXEC, CTRL_WRITE)
+
+    def _set_queued_cmd_stop_exec(self):
+        return self._command(SET_QUEUED_CMD_STOP_EXEC, CTRL_WRITE)
+
+    def _set_queued_cmd_clear(self):
+        return self._command(SET_QUEUED_CMD_CLEAR, CTRL_WRITE)
+
+    def speed(self, velocity=100., acceleration=100.):
+        self._command(SET_GET_PTP_COMMON_PARAMS, CTRL_QUEUED, _F2, velocity, acceleration)
+        self._command(SET_GET_PTP_COORDINATE_PARAMS, CTRL_QUEUED, _F4, velocity, velocity, acceleration, acceleration)
+
+    def pose(self):
+        return _POSE.unpack_from(self._command(GET_POSE, CTRL_READ).params, 0)
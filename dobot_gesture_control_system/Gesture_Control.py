@@ -1,44 +1,32 @@
 import cv2
 import mediapipe as mp
-import time
-from pydobot import Dobot
-import serial.tools.list_ports
+import os
+import sys
+
+from gesture_pipeline import GesturePipeline, MotionCommand
+from motion_filter import OneEuroFilter, TargetSender
+from hand_tracker import HandTracker
+from gesture_classifier import (DATASET_FILE, GestureClassifier, GestureHysteresis, landmarks_to_array,
+                                normalize_landmarks)
+
+# ไลบรารีกลางของ repo (หา Port / ต่อ Dobot / คิวคำสั่ง / ใช้แขนร่วมกับแอปอื่นผ่าน arm server)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dobot_common.arm_server import PRIORITY_NORMAL, open_arm
 
 # --------------------- Dobot Setup ---------------------
-def find_dobot_port():
-    import serial.tools.list_ports
-    ports = serial.tools.list_ports.comports()
-    print("\n🔍 DEBUG: รายชื่อ Port ที่เจอ (Auto):")
-    for p in ports:
-        print(f"   - Device: {p.device}, Desc: {p.description}")
-        if not hasattr(p, 'description') or not hasattr(p, 'device'): continue
-        is_dobot = "USB" in p.description.upper() or \
-                   "SERIAL" in p.description.upper() or \
-                   "CH340" in p.description.upper() or \
-                   "CP210" in p.description.upper() or \
-                   "USB" in p.device.upper()
-        if is_dobot:
-            print(f" เลือกใช้ Port: {p.device}")
-            return p.device
-    print(" ไม่พบ Port ที่เข้าข่าย")
-    return None
-
-
-dobot_port = find_dobot_port()
-if not dobot_port:
-    raise Exception("ไม่พบ Dobot! กรุณาตรวจสอบการเชื่อมต่อ USB")
-
-device = Dobot(port=dobot_port, verbose=False)
-time.sleep(0.5)
+device = open_arm("gesture", PRIORITY_NORMAL, verbose=True)
 device.move_to(x=220, y=0, z=50, r=0, wait=True)
 device.suck(False)
 
 # --------------------- MediaPipe Setup ---------------------
+# โหมดประมวลผลมือ: full (ภาพเต็มแบบเดิม) / fast (ย่อภาพ + โมเดลเล็ก + ข้ามภาพเมื่อช้า) / roi (fast + ครอปรอบมือ)
+HAND_MODE = os.environ.get("DOBOT_HAND_MODE", "fast")
 mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.7)
+hands = HandTracker(HAND_MODE, max_num_hands=1, min_detection_confidence=0.7)
 mp_draw = mp.solutions.drawing_utils
 
 cap = cv2.VideoCapture(0)
+cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)   # ไม่ให้ Driver เก็บภาพเก่าค้างคิว
 
 # --------------------- Finger Detection ---------------------
 def finger_states(landmarks):
@@ -55,123 +43,183 @@ def finger_states(landmarks):
         'pinky': pinky_up
     }
 
+# --------------------- Gesture Classifier ---------------------
+# มีชุดข้อมูลจาก gesture_classifier.py --record -> ใช้ k-NN, ไม่มี -> ใช้ finger_states แบบเดิม
+gesture_model = GestureClassifier.load() if os.path.exists(DATASET_FILE) else None
+gesture_filter = GestureHysteresis()   # ท่าต้องคงที่หลายภาพก่อนสั่งแขน (กัน grab หลอก)
+print(f"✋ จำแนกท่ามือด้วย: {'k-NN (' + str(len(gesture_model.targets)) + ' ตัวอย่าง)' if gesture_model else 'finger_states'}")
+
+def classify_gesture(hand_landmarks, handedness, w, h):
+    """มือ 1 ข้าง -> (ท่า "move"/"hold"/"grab"/"none", confidence)"""
+    if gesture_model is not None:
+        mirror = handedness is not None and handedness.classification[0].label == "Left"
+        return gesture_model.predict(normalize_landmarks(landmarks_to_array(hand_landmarks, w, h), mirror))
+    states = finger_states(hand_landmarks.landmark)
+    thumb, index, middle, ring, pinky = (states[k] for k in ('thumb', 'index', 'middle', 'ring', 'pinky'))
+    if thumb and index and middle and not ring and not pinky: return "move", 1.0
+    if all([thumb, index, middle, ring, pinky]): return "hold", 1.0
+    if not any([thumb, index, middle, ring, pinky]): return "grab", 1.0
+    return "none", 1.0
+
 # --------------------- Variables ---------------------
-last_state = None
-vacuum_on = False
+last_state = None   # ใช้ใน inference thread เท่านั้น
+vacuum_on = False   # ใช้ใน motion thread เท่านั้น
 default_z = 50   # ค่า Z คงที่
-
-# --------------------- Main Loop ---------------------
+DROP_POINT = {"x": 178.96, "y": -148.89, "z": 50}   # จุดวางของหลัง Grab
+target_filter = OneEuroFilter()   # กรองสั่นของปลายนิ้วในโหมด move (inference thread)
+
+# --------------------- Inference (ภาพ -> คำสั่ง) ---------------------
+def interpret_frame(frame):
+    """ภาพจากกล้อง -> (ภาพที่วาดผลแล้ว, [MotionCommand], status) ไม่สั่งแขนเองเด็ดขาด"""
+    global last_state
+    frame = cv2.flip(frame, 1)
+    img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    results = hands.process(img_rgb)
+    h, w, _ = frame.shape
+
+    # Default position
+    dobot_x, dobot_y, dobot_z = 50, 0, default_z
+    commands = []
+    gesture, confidence = "none", 0.0
+
+    if hands.skipped_last:
+        # ภาพที่ถูกข้ามได้ผลของภาพก่อนหน้าซ้ำ: ไม่นับเข้า hysteresis (ENTER_FRAMES) และไม่สั่งแขนซ้ำ
+        gesture = gesture_filter.state
+        for hand_landmarks in results.multi_hand_landmarks or ():
+            mp_draw.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+    elif results.multi_hand_landmarks:
+        for i, hand_landmarks in enumerate(results.multi_hand_landmarks):
+            mp_draw.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+            landmarks = hand_landmarks.landmark
+
+            handedness = results.multi_handedness[i] if results.multi_handedness else None
+            raw_gesture, confidence = classify_gesture(hand_landmarks, handedness, w, h)
+            gesture = gesture_filter.update(raw_gesture)
+
+            # ✌️ Movement mode (3 นิ้วกลาง+หัวแม่มือ)
+            if gesture == "move":
+                index_tip = landmarks[8]
+
+                # Mapping X (เข้า–ออก) จากแกน Y ของมือ
+                y_px = int(index_tip.y * h)
+                dobot_x = 100 + (h/2 - y_px) * 0.5
+                dobot_x = max(120, min(230, dobot_x))
+
+                # Mapping Y (ซ้าย–ขวา) จากแกน X ของมือ
+                x_px = int(index_tip.x * w)
+                dobot_y = (x_px - w/2) * 0.5
+                dobot_y = max(-150, min(150, dobot_y))
+
+                # Z คงที่
+                dobot_z = default_z
+
+                if last_state != 'move':
+                    commands.append(MotionCommand("release", None))
+                    target_filter.reset()   # เข้าโหมดใหม่ ไม่เอาค่าจากครั้งก่อนมาเฉลี่ย
+                dobot_x, dobot_y = target_filter((dobot_x, dobot_y))
+                commands.append(MotionCommand("move", None, x=dobot_x, y=dobot_y, z=dobot_z))
+                last_state = 'move'
+
+            # 🖐️ Hold (หยุดนิ่ง)
+            elif gesture == "hold":
+                if last_state != 'hold':
+                    commands.append(MotionCommand("release", None))
+                last_state = 'hold'
+
+            # ✊ Grab (ดูด → ยกขึ้น → เคลื่อนไป → ปล่อย)
+            elif gesture == "grab":
+                if last_state != 'suck':
+                    commands.append(MotionCommand("grab", None))
+                last_state = 'suck'
+
+    else:
+        gesture_filter.update("none")
+        last_state = 'hold'
+
+    status = {"state": last_state, "gesture": gesture, "confidence": confidence,
+              "x": dobot_x, "y": dobot_y, "z": dobot_z, "hands": hands.stats()}
+    return frame, commands, status
+
+# --------------------- Motion (คำสั่ง -> แขน) ---------------------
+def grab_sequence():
+    """ดูด -> ยก -> ลง -> ยก -> ไปจุดวาง -> ปล่อย (ทำใน motion thread ภาพไม่ค้าง)"""
+    global vacuum_on
+    device.suck(True)
+    vacuum_on = True
+
+    # ยกขึ้นเล็กน้อย
+    pose_values = device.pose()
+    x_current = pose_values[0]
+    y_current = pose_values[1]
+    r_current = pose_values[3] if len(pose_values) > 3 else 0
+    device.move_to(x=x_current, y=y_current, z=50, r=r_current, wait=True)
+
+    # เคลื่อนที่ไปปลายทาง (ตัวอย่าง)
+    device.move_to(x=x_current, y=y_current, z=-50, r=r_current, wait=True)
+    device.move_to(x=x_current, y=y_current, z=50, r=r_current, wait=True)
+    device.move_to(x=DROP_POINT["x"], y=DROP_POINT["y"], z=DROP_POINT["z"], r=0, wait=True)
+
+    # ปล่อยของ
+    device.suck(False)
+    vacuum_on = False
+
+# ส่งเฉพาะเป้าหมายที่ขยับเกิน deadband และเมื่อคิวบนแขนยังไม่ค้าง (motion thread)
+move_sender = TargetSender(lambda target: device.queue_move(*target), device.current_index)
+
+def execute_command(cmd):
+    global vacuum_on
+    if cmd.kind == "move":
+        p = cmd.params
+        return move_sender.offer((p["x"], p["y"], p["z"]), cmd.stamp)
+    move_sender.reset()
+    if cmd.kind == "release":
+        if vacuum_on:
+            device.suck(False)
+            vacuum_on = False
+    elif cmd.kind == "grab":
+        try:
+            grab_sequence()
+        except Exception:
+            # ท่าหยุดกลางทาง -> ปิดลมดูดไว้ก่อนเพื่อความปลอดภัย
+            if vacuum_on:
+                device.suck(False)
+                vacuum_on = False
+            raise
+
+# --------------------- Main Loop (แสดงผล) ---------------------
+pipeline = GesturePipeline(cap, interpret_frame, execute_command, idle=move_sender.pump)
 try:
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        frame = cv2.flip(frame, 1)
-        img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = hands.process(img_rgb)
-        h, w, _ = frame.shape
-
-        # Default position
-        dobot_x, dobot_y, dobot_z = 50, 0, default_z
-
-        if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                mp_draw.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-                landmarks = hand_landmarks.landmark
-
-                states = finger_states(landmarks)
-                thumb = states['thumb']
-                index = states['index']
-                middle = states['middle']
-                ring = states['ring']
-                pinky = states['pinky']
-
-                # ✌️ Movement mode (3 นิ้วกลาง+หัวแม่มือ)
-                if thumb and index and middle and not ring and not pinky:
-                    index_tip = landmarks[8]
-
-                    # Mapping X (เข้า–ออก) จากแกน Y ของมือ
-                    y_px = int(index_tip.y * h)
-                    dobot_x = 100 + (h/2 - y_px) * 0.5
-                    dobot_x = max(120, min(230, dobot_x))
-
-                    # Mapping Y (ซ้าย–ขวา) จากแกน X ของมือ
-                    x_px = int(index_tip.x * w)
-                    dobot_y = (x_px - w/2) * 0.5
-                    dobot_y = max(-150, min(150, dobot_y))
-
-                    # Z คงที่
-                    dobot_z = default_z
-
-                    try:
-                        device.move_to(x=dobot_x, y=dobot_y, z=dobot_z, r=0, wait=False)
-                    except Exception as e:
-                        print(f"Move Error: {e}")
-
-                    if vacuum_on:
-                        try:
-                            device.suck(False)
-                        except Exception as e:
-                            print(f"Suck Off Error: {e}")
-                        vacuum_on = False
-
-                    last_state = 'move'
-
-                # 🖐️ Hold (หยุดนิ่ง)
-                elif all([thumb, index, middle, ring, pinky]):
-                    if vacuum_on:
-                        try:
-                            device.suck(False)
-                        except Exception as e:
-                            print(f"Suck Off Error: {e}")
-                        vacuum_on = False
-                    last_state = 'hold'
-
-                # ✊ Grab (ดูด → ยกขึ้น → เคลื่อนไป → ปล่อย)
-                elif not any([thumb, index, middle, ring, pinky]):
-                    if last_state != 'suck':
-                        try:
-                            device.suck(True)
-                            vacuum_on = True
-
-                            # ยกขึ้นเล็กน้อย
-                            pose_values = device.pose()
-                            x_current = pose_values[0]
-                            y_current = pose_values[1]
-                            r_current = pose_values[3] if len(pose_values) > 3 else 0
-                            device.move_to(x=x_current, y=y_current, z=50, r=r_current, wait=True)
-
-                            # เคลื่อนที่ไปปลายทาง (ตัวอย่าง)
-                            device.move_to(x=x_current, y=y_current, z=-50, r=r_current, wait=True)
-                            device.move_to(x=x_current, y=y_current, z=50, r=r_current, wait=True)
-                            device.move_to(x=178.96, y=-148.89, z=50, r=0, wait=True)
-
-                            # ปล่อยของ
-                            device.suck(False)
-                            vacuum_on = False
-
-                        except Exception as e:
-                            print(f"Suck On/Move Error: {e}")
-
-                        last_state = 'suck'
-
-        else:
-            last_state = 'hold'
+    pipeline.start()
+    seq = 0
+    while pipeline.running:
+        frame, status, seq = pipeline.display_frame(seq)
+        if frame is None:
+            if cv2.waitKey(1) & 0xFF == 27: break
+            continue
 
         # Display status
         cv2.putText(frame,
-                    f"State: {last_state if last_state else 'None'}  Vacuum: {'ON' if vacuum_on else 'OFF'}",
+                    f"State: {status['state'] if status['state'] else 'None'}  Vacuum: {'ON' if vacuum_on else 'OFF'}  "
+                    f"Gesture: {status['gesture']} ({status['confidence']:.2f})",
                     (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         cv2.putText(frame,
-                    f"X:{int(dobot_x)} Y:{int(dobot_y)} Z:{int(dobot_z)}",
+                    f"X:{int(status['x'])} Y:{int(status['y'])} Z:{int(status['z'])}",
                     (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        hs = status['hands']
+        lines = pipeline.overlay_lines() + [f"Hands {hs['mode']}: {hs['ms_ema']:.0f} ms | 1/{hs['step']} frames"]
+        for i, line in enumerate(lines):
+            cv2.putText(frame, line, (10, 90 + 25 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (0, 255, 255), 1)
 
         cv2.imshow("Dobot Control by Hand", frame)
         if cv2.waitKey(1) & 0xFF == 27:  # กด Esc เพื่อออก
             break
 finally:
+    pipeline.stop()
+    pipeline.summary()
+    print(f"📊 เป้าหมาย move: ส่ง {move_sender.sent} | อยู่ใน deadband {move_sender.suppressed} "
+          f"| ถูกแทนระหว่างรอคิว {move_sender.replaced}")
     cap.release()
+    hands.close()
     cv2.destroyAllWindows()
     if 'device' in locals():
         device.close()
@@ -0,0 +1,184 @@
+# gesture_classifier.py
+# จำแนกท่ามือจาก 21 จุดของ MediaPipe ด้วย k-NN (numpy ล้วน) แทนการเทียบแกน y ของปลายนิ้วตรงๆ
+#
+# - normalize: ย้ายข้อมือเป็นจุดกำเนิด, หมุนให้แนวข้อมือ -> โคนนิ้วกลางชี้ขึ้น, ย่อขยายตามขนาดมือ
+#   (ท่าเดียวกันได้เวกเตอร์ใกล้กันไม่ว่ามือจะเอียง/อยู่ใกล้ไกลกล้อง, มือซ้ายกลับด้านให้เหมือนมือขวา)
+# - k-NN: ระยะจากทุกตัวอย่างคำนวณพร้อมกันด้วย numpy (ตัวอย่างหลักพัน ~ไม่กี่สิบไมโครวินาที)
+# - GestureHysteresis: ต้องเห็นท่าใหม่ติดกันหลายภาพก่อนเปลี่ยน (grab ต้องแน่ใจกว่าท่าอื่น)
+#
+# เก็บตัวอย่าง (กด Space = เก็บ 1 ภาพ, ค้าง r = เก็บต่อเนื่อง, Esc = จบ):
+#   python gesture_classifier.py --record move
+#   python gesture_classifier.py --record hold
+#   python gesture_classifier.py --record grab
+#   python gesture_classifier.py --record none      # ท่าอื่นๆ ที่ไม่ควรสั่งอะไร
+# วัดผล (cross-validation + เวลาต่อภาพ):
+#   python gesture_classifier.py --benchmark
+import argparse
+import os
+import time
+
+import numpy as np
+
+DATASET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gesture_data.npz")
+GESTURES = ("move", "hold", "grab", "none")
+K_NEIGHBORS = 5
+MIN_CONFIDENCE = 0.6            # สัดส่วนเพื่อนบ้านที่เห็นตรงกัน ต่ำกว่านี้ = "none"
+ENTER_FRAMES = {"grab": 6}      # จำนวนภาพติดกันก่อนยอมเปลี่ยนเป็นท่านั้น (ท่าที่ไม่ระบุใช้ค่า default)
+DEFAULT_ENTER_FRAMES = 3
+WRIST, MIDDLE_MCP = 0, 9
+
+
+def normalize_landmarks(points, mirror=False):
+    """(21, 3) พิกัดที่ปรับสัดส่วนภาพแล้ว -> เวกเตอร์ 63 ค่าที่ไม่ขึ้นกับตำแหน่ง/ขนาด/การหมุนของมือ"""
+    p = np.asarray(points, dtype=np.float32).reshape(21, 3).copy()
+    if mirror: p[:, 0] = -p[:, 0]
+    p -= p[WRIST]
+    axis = p[MIDDLE_MCP, :2]
+    scale = float(np.linalg.norm(axis))
+    if scale < 1e-6: return np.zeros(63, np.float32)
+    # หมุนในระนาบภาพให้แกนข้อมือ -> โคนนิ้วกลาง ชี้ขึ้น (y ลบ)
+    c, s = -axis[1] / scale, -axis[0] / scale
+    x, y = p[:, 0].copy(), p[:, 1].copy()
+    p[:, 0] = c * x - s * y
+    p[:, 1] = s * x + c * y
+    return (p / scale).reshape(-1)
+
+
+def landmarks_to_array(hand_landmarks, width, height):
+    """MediaPipe NormalizedLandmarkList -> (21, 3) ในหน่วยพิกเซล (x, y ไม่เพี้ยนตามสัดส่วนภาพ)"""
+    return np.array([(lm.x * width, lm.y * height, lm.z * width) for lm in hand_landmarks.landmark], np.float32)
+
+
+class GestureClassifier:
+    def __init__(self, features, labels, k=K_NEIGHBORS, min_confidence=MIN_CONFIDENCE):
+        self.names = sorted(set(labels))
+        self.features = np.ascontiguousarray(features, dtype=np.float32)          # (N, 63)
+        self.sq_norms = (self.features ** 2).sum(axis=1)
+        self.targets = np.array([self.names.index(l) for l in labels], np.int32)
+        self.k = min(k, len(self.targets))
+        self.min_confidence = min_confidence
+
+    @classmethod
+    def load(cls, path=DATASET_FILE, **kwargs):
+        data = np.load(path)
+        return cls(data["features"], [str(l) for l in data["labels"]], **kwargs)
+
+    def predict(self, feature):
+        """เวกเตอร์ 63 ค่า -> (ท่า, confidence 0-1)"""
+        f = np.asarray(feature, dtype=np.float32)
+        # |a-b|^2 = |a|^2 - 2ab + |b|^2 (ไม่ต้องสร้างอาร์เรย์ส่วนต่าง N x 63)
+        d = self.sq_norms - 2.0 * (self.features @ f)
+        nearest = np.argpartition(d, self.k - 1)[:self.k] if self.k < len(d) else np.arange(len(d))
+        votes = np.bincount(self.targets[nearest], minlength=len(self.names))
+        best = int(votes.argmax())
+        confidence = float(votes[best]) / self.k
+        return (self.names[best] if confidence >= self.min_confidence else "none"), confidence
+
+
+class GestureHysteresis:
+    """เปลี่ยนท่าเมื่อท่าใหม่ถูกทายติดกันครบ ENTER_FRAMES ภาพ ไม่งั้นคงท่าเดิม"""
+
+    def __init__(self, enter_frames=None, default_frames=DEFAULT_ENTER_FRAMES):
+        self.enter_frames = dict(ENTER_FRAMES if enter_frames is None else enter_frames)
+        self.default_frames = default_frames
+        self.state = "none"
+        self._candidate = None
+        self._count = 0
+
+    def update(self, label):
+        if label == self.state:
+            self._candidate, self._count = None, 0
+            return self.state
+        if label == self._candidate:
+            self._count += 1
+        else:
+            self._candidate, self._count = label, 1
+        if self._count >= self.enter_frames.get(label, self.default_frames):
+            self.state, self._candidate, self._count = label, None, 0
+        return self.state
+
+
+# ----------------- เครื่องมือ (CLI) -----------------
+
+def load_dataset(path=DATASET_FILE):
+    if not os.path.exists(path): return np.zeros((0, 63), np.float32), []
+    data = np.load(path)
+    return data["features"], [str(l) for l in data["labels"]]
+
+def save_dataset(features, labels, path=DATASET_FILE):
+    np.savez_compressed(path, features=np.asarray(features, np.float32), labels=np.array(labels))
+
+def record(label, camera_index=0, path=DATASET_FILE):
+    import cv2
+    import mediapipe as mp
+    hands = mp.solutions.hands.Hands(max_num_hands=1, min_detection_confidence=0.7)
+    features, labels = load_dataset(path)
+    features, labels = list(features), list(labels)
+    before = len(labels)
+    cap = cv2.VideoCapture(camera_index)
+    print(f"🎥 เก็บท่า '{label}': Space = 1 ภาพ, ค้าง r = ต่อเนื่อง, Esc = บันทึกและออก")
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret: break
+            frame = cv2.flip(frame, 1)
+            h, w, _ = frame.shape
+            results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            feature = None
+            if results.multi_hand_landmarks:
+                hand = results.multi_hand_landmarks[0]
+                mirror = results.multi_handedness[0].classification[0].label == "Left"
+                feature = normalize_landmarks(landmarks_to_array(hand, w, h), mirror)
+                mp.solutions.drawing_utils.draw_landmarks(frame, hand, mp.solutions.hands.HAND_CONNECTIONS)
+            cv2.putText(frame, f"{label}: {len(labels) - before} new", (10, 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.imshow("record gesture", frame)
+            key = cv2.waitKey(1) & 0xFF
+            if key == 27: break
+            if key in (ord(' '), ord('r')) and feature is not None:
+                features.append(feature)
+                labels.append(label)
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
+    save_dataset(features, labels, path)
+    counts = {n: labels.count(n) for n in sorted(set(labels))}
+    print(f"💾 บันทึก {path}: +{len(labels) - before} ภาพ | รวม {counts}")
+
+def benchmark(path=DATASET_FILE, folds=5, seed=0):
+    features, labels = load_dataset(path)
+    labels = np.array(labels)
+    if len(labels) < folds:
+        print("ตัวอย่างน้อยเกินไป ให้เก็บด้วย --record ก่อน")
+        return None
+    order = np.random.default_rng(seed).permutation(len(labels))
+    correct, times = 0, []
+    for fold in range(folds):
+        test = order[fold::folds]
+        train = np.setdiff1d(order, test)
+        clf = GestureClassifier(features[train], list(labels[train]))
+        for i in test:
+            t0 = time.perf_counter()
+            name, _ = clf.predict(features[i])
+            times.append(time.perf_counter() - t0)
+            correct += name == labels[i]
+    accuracy = correct / len(labels)
+    times = np.array(times) * 1000.0
+    print(f"📊 {len(labels)} ตัวอย่าง {folds}-fold: accuracy {accuracy * 100:.1f}% | "
+          f"predict เฉลี่ย {times.mean():.3f} ms | p99 {np.percentile(times, 99):.3f} ms")
+    return {"accuracy": accuracy, "ms_mean": float(times.mean()), "ms_p99": float(np.percentile(times, 99))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gesture dataset recorder / benchmark")
+    parser.add_argument("--record", metavar="LABEL", help=f"เก็บตัวอย่างท่า ({', '.join(GESTURES)})")
+    parser.add_argument("--benchmark", action="store_true", help="cross-validation + เวลาต่อภาพ")
+    parser.add_argument("--camera", type=int, default=0)
+    parser.add_argument("--data", default=DATASET_FILE)
+    args = parser.parse_args()
+    if args.record:
+        record(args.record, args.camera, args.data)
+    elif args.benchmark:
+        benchmark(args.data)
+    else:
+        parser.print_help()
@@ -0,0 +1,276 @@
+# gesture_pipeline.py
+# แยกงานควบคุมด้วยท่ามือเป็น 3 Thread ต่อกันแบบสายพาน งานช้าของขั้นหนึ่งไม่ทำให้ขั้นอื่นค้าง
+#
+#   capture   : อ่านกล้องตลอดเวลา เก็บไว้แค่ภาพล่าสุด (ไม่มีภาพค้างคิว)
+#   inference : MediaPipe + ตีความท่ามือกับ "ภาพล่าสุด" เสมอ ภาพที่ประมวลผลไม่ทันถูกข้ามไป
+#   motion    : สั่ง Dobot ตามคิวคำสั่งที่จำกัดขนาด (ท่า grab ที่ใช้เวลาหลายวินาทีไม่ทำให้ภาพค้าง)
+#   main      : แสดงภาพล่าสุด + FPS ของแต่ละขั้น + latency
+#
+# latency = เวลาที่ถ่ายภาพ -> เวลาที่ motion thread เริ่มส่งคำสั่งนั้นให้แขน (gesture-to-motion)
+#
+#   pipeline = GesturePipeline(cap, interpret, execute)
+#   pipeline.start()
+#   frame, status, seq = pipeline.display_frame(seq)
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+MOTION_QUEUE_SIZE = 4           # คำสั่งที่รอส่งให้แขนได้สูงสุด (เต็มแล้วทิ้งอันเก่าสุด)
+MAX_COMMAND_AGE = 0.5           # วินาที: คำสั่ง move ที่เก่ากว่านี้ (เช่น ค้างระหว่าง grab) ไม่ส่ง
+RATE_WINDOW = 2.0               # วินาที: ช่วงเวลาที่ใช้คำนวณ FPS
+LATENCY_HISTORY = 200           # จำนวนค่า latency ล่าสุดที่เก็บไว้สรุป
+READ_FAIL_LIMIT = 30            # อ่านกล้องพลาดติดกันเท่านี้ -> หยุด Pipeline
+MOTION_IDLE_INTERVAL = 0.02     # วินาที: คิวว่างนานเท่านี้ -> เรียก idle() (ส่งเป้าหมายที่ยังรออยู่)
+
+
+class MotionCommand:
+    """kind = "move" / "grab" / "release", stamp = เวลาที่ถ่ายภาพที่ทำให้เกิดคำสั่งนี้"""
+
+    __slots__ = ("kind", "params", "stamp")
+
+    def __init__(self, kind, stamp, **params):
+        self.kind = kind
+        self.params = params
+        self.stamp = stamp
+
+    def __repr__(self):
+        return f"MotionCommand({self.kind}, {self.params})"
+
+
+class FrameSlot:
+    """ช่องเก็บค่าล่าสุดค่าเดียว + เลขลำดับ ผู้อ่านรอค่าที่ใหม่กว่าที่เคยเห็นได้"""
+
+    def __init__(self):
+        self._value = None
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def put(self, value):
+        with self._cond:
+            self._value = value
+            self._seq += 1
+            self._cond.notify_all()
+
+    def latest(self):
+        with self._cond:
+            return self._value, self._seq
+
+    def wait_newer(self, after_seq, timeout=0.5):
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq, timeout)
+            return self._value, self._seq
+
+
+class MotionQueue:
+    """คิวคำสั่งแขนแบบจำกัดขนาด: move ติดกันรวมเป็นเป้าหมายล่าสุดอันเดียว"""
+
+    def __init__(self, maxsize=MOTION_QUEUE_SIZE):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, cmd):
+        with self._cond:
+            if cmd.kind == "move" and self._items and self._items[-1].kind == "move":
+                self._items[-1] = cmd
+                self.dropped += 1
+            else:
+                if len(self._items) >= self.maxsize:
+                    self._items.popleft()
+                    self.dropped += 1
+                self._items.append(cmd)
+            self._cond.notify()
+
+    def get(self, timeout=0.2):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout): return None
+            return self._items.popleft()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+class RateMeter:
+    """นับจำนวนครั้งต่อวินาทีในช่วง RATE_WINDOW ล่าสุด"""
+
+    def __init__(self, window=RATE_WINDOW):
+        self.window = window
+        self._stamps = deque()
+        self._lock = threading.Lock()
+
+    def tick(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._stamps.append(now)
+            while self._stamps and now - self._stamps[0] > self.window:
+                self._stamps.popleft()
+
+    def rate(self):
+        with self._lock:
+            if len(self._stamps) < 2: return 0.0
+            span = self._stamps[-1] - self._stamps[0]
+            return (len(self._stamps) - 1) / span if span > 0 else 0.0
+
+
+class LatencyStats:
+    """latency ภาพ -> คำสั่งถึงแขน (มิลลิวินาที) ของคำสั่งล่าสุด LATENCY_HISTORY ครั้ง"""
+
+    def __init__(self, history=LATENCY_HISTORY):
+        self._values = deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def add(self, stamp, done=None):
+        done = time.time() if done is None else done
+        with self._lock:
+            self._values.append((done - stamp) * 1000.0)
+
+    def summary(self):
+        """{"last", "mean", "p95"} หรือ None ถ้ายังไม่มีคำสั่ง"""
+        with self._lock:
+            if not self._values: return None
+            values = np.array(self._values)
+        return {"last": float(values[-1]), "mean": float(values.mean()), "p95": float(np.percentile(values, 95))}
+
+
+class GesturePipeline:
+    """
+    cap       : cv2.VideoCapture ที่เปิดแล้ว
+    interpret : frame -> (ภาพที่วาดผลแล้ว, [MotionCommand], status dict)   (เรียกใน inference thread)
+    execute   : MotionCommand -> None หรือ False = ยังไม่ได้ส่งให้แขน (เรียกใน motion thread เท่านั้น)
+    idle      : () -> stamp ของคำสั่งที่เพิ่งส่งได้ หรือ None (เรียกใน motion thread ตอนคิวว่าง)
+    """
+
+    def __init__(self, cap, interpret, execute, idle=None, queue_size=MOTION_QUEUE_SIZE):
+        self.cap = cap
+        self.interpret = interpret
+        self.execute = execute
+        self.idle = idle
+        self.commands = MotionQueue(queue_size)
+        self.frames = FrameSlot()            # (ภาพดิบ, เวลาที่ถ่าย)
+        self.results = FrameSlot()           # (ภาพที่วาดแล้ว, status)
+        self.capture_fps = RateMeter()
+        self.inference_fps = RateMeter()
+        self.latency = LatencyStats()
+        self.inference_ms = 0.0
+        self.skipped = 0                      # ภาพที่ inference ข้ามไปเพราะมีภาพใหม่กว่าแล้ว
+        self.stale = 0                        # คำสั่ง move ที่เก่าเกินไปตอนถึงคิว
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [threading.Thread(target=fn, name=name, daemon=True) for fn, name in
+                         ((self._capture_loop, 'gesture-capture'),
+                          (self._inference_loop, 'gesture-inference'),
+                          (self._motion_loop, 'gesture-motion'))]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout=5.0):
+        """หยุดทุก Thread (motion thread ทำคำสั่งที่กำลังทำให้จบก่อน)"""
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    @property
+    def running(self):
+        return not self._stop.is_set()
+
+    # ----------------- Threads -----------------
+
+    def _capture_loop(self):
+        failures = 0
+        while not self._stop.is_set():
+            ret, frame = self.cap.read()
+            if not ret:
+                failures += 1
+                if failures >= READ_FAIL_LIMIT:
+                    print("[ERROR] กล้องไม่ส่งภาพ หยุดการทำงาน")
+                    self._stop.set()
+                time.sleep(0.01)
+                continue
+            failures = 0
+            now = time.time()
+            self.frames.put((frame, now))
+            self.capture_fps.tick(now)
+
+    def _inference_loop(self):
+        seq = 0
+        while not self._stop.is_set():
+            item, new_seq = self.frames.wait_newer(seq)
+            if new_seq == seq: continue
+            self.skipped += max(0, new_seq - seq - 1)
+            seq = new_seq
+            frame, stamp = item
+            t0 = time.perf_counter()
+            try:
+                shown, commands, status = self.interpret(frame)
+            except Exception as e:
+                print(f"Inference Error: {e}")
+                continue
+            self.inference_ms = (time.perf_counter() - t0) * 1000.0
+            self.inference_fps.tick()
+            for cmd in commands:
+                if cmd.stamp is None: cmd.stamp = stamp
+                self.commands.put(cmd)
+            self.results.put((shown, status))
+
+    def _motion_loop(self):
+        while not self._stop.is_set():
+            cmd = self.commands.get(MOTION_IDLE_INTERVAL)
+            if cmd is None:
+                if self.idle is None: continue
+                try:
+                    stamp = self.idle()
+                except Exception as e:
+                    print(f"Motion Error (idle): {e}")
+                    continue
+                if stamp is not None: self.latency.add(stamp)
+                continue
+            if cmd.kind == "move" and time.time() - cmd.stamp > MAX_COMMAND_AGE:
+                self.stale += 1
+                continue
+            # นับ latency ตอนเริ่มส่ง (grab ทั้งท่าใช้หลายวินาที ไม่ใช่ความหน่วงของการตอบสนอง)
+            sent_at = time.time()
+            try:
+                if self.execute(cmd) is False: continue
+            except Exception as e:
+                print(f"Motion Error ({cmd.kind}): {e}")
+                continue
+            self.latency.add(cmd.stamp, sent_at)
+
+    # ----------------- แสดงผล (main thread) -----------------
+
+    def display_frame(self, after_seq=0, timeout=0.5):
+        """รอผลที่ใหม่กว่า after_seq -> (ภาพที่วาดแล้ว, status, seq) ภาพเป็น None ถ้ายังไม่มีผล"""
+        item, seq = self.results.wait_newer(after_seq, timeout)
+        frame, status = item if item is not None else (None, None)
+        return frame, status, seq
+
+    def stats(self):
+        return {"capture_fps": self.capture_fps.rate(), "inference_fps": self.inference_fps.rate(),
+                "inference_ms": self.inference_ms, "latency": self.latency.summary(),
+                "queued": len(self.commands), "dropped": self.commands.dropped,
+                "skipped": self.skipped, "stale": self.stale}
+
+    def overlay_lines(self):
+        s = self.stats()
+        lines = [f"FPS cam {s['capture_fps']:.0f} | infer {s['inference_fps']:.0f} ({s['inference_ms']:.0f} ms)"]
+        lat = s["latency"]
+        if lat:
+            lines.append(f"Latency last {lat['last']:.0f} | mean {lat['mean']:.0f} | p95 {lat['p95']:.0f} ms")
+        lines.append(f"Queue {s['queued']} | dropped {s['dropped']} | stale {s['stale']}")
+        return lines
+
+    def summary(self):
+        s = self.stats()
+        lat = s["latency"]
+        print(f"📊 FPS กล้อง {s['capture_fps']:.1f} | inference {s['inference_fps']:.1f} "
+              f"| ข้ามภาพ {s['skipped']} | คำสั่งที่ถูกแทน/ทิ้ง {s['dropped']} | เก่าเกิน {s['stale']}")
+        if lat:
+            print(f"📊 Latency ภาพ -> แขน: เฉลี่ย {lat['mean']:.0f} ms | p95 {lat['p95']:.0f} ms")
@@ -0,0 +1,216 @@
+# hand_tracker.py
+# ห่อ MediaPipe Hands ให้เลือกโหมดประมวลผลได้ (เครื่องแล็บไม่มี GPU -> hands.process เป็นคอขวดหลัก)
+#
+#   full : ภาพเต็ม model_complexity=1 (แบบเดิม)
+#   fast : ย่อภาพเหลือกว้าง INFER_WIDTH, model_complexity=0, ข้ามภาพอัตโนมัติเมื่อช้ากว่า BUDGET_MS
+#   roi  : fast + ครอปเฉพาะรอบกรอบมือล่าสุด (มือหลุดกรอบ -> ตรวจทั้งภาพใหม่ในภาพเดียวกันทันที)
+#
+# ภาพที่ไม่ต้องหาฝ่ามือใหม่ MediaPipe (static_image_mode=False) ใช้แค่โมเดล landmark ตามตำแหน่งเดิมอยู่แล้ว
+# โหมด roi ใช้ Hands แยกอีกตัวสำหรับภาพครอป เพื่อไม่ให้ตำแหน่งที่ติดตามของภาพเต็ม/ภาพครอปปนกัน
+#
+# ผลลัพธ์ใช้แทน hands.process ได้เลย: results.multi_hand_landmarks อยู่ในพิกัด normalized ของภาพเต็มเสมอ
+#
+# Benchmark (บันทึกวิดีโอครั้งเดียว แล้วเล่นซ้ำผ่านทุกโหมด):
+#   python hand_tracker.py --record hands.mp4
+#   python hand_tracker.py --benchmark hands.mp4
+import argparse
+import math
+import time
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+HAND_MODES = ("full", "fast", "roi")
+INFER_WIDTH = 320               # ความกว้างภาพก่อนส่งเข้า MediaPipe (fast / roi)
+ROI_MARGIN = 0.5                # ขยายกรอบมือออกไปด้านละ (เท่าของขนาดมือ) ให้มือขยับในกรอบได้
+ROI_MIN_SIZE = 120              # px: กรอบครอปเล็กสุด
+BUDGET_MS = 33.0                # เวลาต่อภาพที่ยอมรับได้ ช้ากว่านี้เริ่มข้ามภาพ
+MAX_SKIP = 3                    # ประมวลผลอย่างน้อย 1 ใน MAX_SKIP ภาพ
+EMA_ALPHA = 0.2                 # ความไวของค่าเฉลี่ยเวลาประมวลผล
+
+
+class HandTracker:
+    def __init__(self, mode="full", max_num_hands=1, min_detection_confidence=0.7, min_tracking_confidence=0.5,
+                 infer_width=INFER_WIDTH, budget_ms=BUDGET_MS):
+        if mode not in HAND_MODES:
+            raise ValueError(f"mode ต้องเป็นหนึ่งใน {HAND_MODES}")
+        self.mode = mode
+        self.infer_width = infer_width
+        self.budget_ms = budget_ms
+        options = dict(max_num_hands=max_num_hands, model_complexity=1 if mode == "full" else 0,
+                       min_detection_confidence=min_detection_confidence,
+                       min_tracking_confidence=min_tracking_confidence)
+        self._hands = mp.solutions.hands.Hands(**options)
+        self._roi_hands = mp.solutions.hands.Hands(**options) if mode == "roi" else None
+        self._crop = None               # (x0, y0, x1, y1) ในภาพเต็ม
+        self._last = None
+        self._frame = 0
+        self.step = 1                   # ประมวลผล 1 ภาพทุก step ภาพ
+        self.ms_ema = 0.0
+        self.last_ms = 0.0
+        self.skipped_last = False
+        self.counts = {"processed": 0, "skipped": 0, "roi": 0, "full": 0, "lost": 0}
+
+    def close(self):
+        self._hands.close()
+        if self._roi_hands is not None: self._roi_hands.close()
+
+    def _resize(self, img):
+        h, w = img.shape[:2]
+        if self.mode == "full" or w <= self.infer_width: return img
+        return cv2.resize(img, (self.infer_width, max(1, round(h * self.infer_width / w))), interpolation=cv2.INTER_AREA)
+
+    def process(self, rgb):
+        """ภาพ RGB เต็ม -> results แบบ MediaPipe (ภาพที่ถูกข้ามคืนผลของภาพก่อนหน้า)"""
+        self._frame += 1
+        if self.step > 1 and self._last is not None and self._frame % self.step:
+            self.counts["skipped"] += 1
+            self.skipped_last = True
+            return self._last
+        self.skipped_last = False
+        t0 = time.perf_counter()
+        h, w = rgb.shape[:2]
+        results = None
+        if self._crop is not None:
+            x0, y0, x1, y1 = self._crop
+            results = self._roi_hands.process(np.ascontiguousarray(self._resize(rgb[y0:y1, x0:x1])))
+            if results.multi_hand_landmarks:
+                self.counts["roi"] += 1
+                self._to_full_frame(results, self._crop, w, h)
+            else:
+                self.counts["lost"] += 1
+                results = None
+        if results is None:
+            self.counts["full"] += 1
+            results = self._hands.process(self._resize(rgb))
+        if self.mode == "roi": self._crop = self._next_crop(results, w, h)
+
+        self.last_ms = (time.perf_counter() - t0) * 1000.0
+        self.ms_ema = self.last_ms if self.counts["processed"] == 0 else \
+            self.ms_ema + EMA_ALPHA * (self.last_ms - self.ms_ema)
+        if self.mode != "full":
+            self.step = max(1, min(MAX_SKIP, math.ceil(self.ms_ema / self.budget_ms)))
+        self.counts["processed"] += 1
+        self._last = results
+        return results
+
+    @staticmethod
+    def _to_full_frame(results, crop, w, h):
+        """landmark ในพิกัดของภาพครอป -> พิกัด normalized ของภาพเต็ม (แก้ในที่)"""
+        x0, y0, x1, y1 = crop
+        cw, ch = x1 - x0, y1 - y0
+        for hand in results.multi_hand_landmarks:
+            for lm in hand.landmark:
+                lm.x = (x0 + lm.x * cw) / w
+                lm.y = (y0 + lm.y * ch) / h
+                lm.z = lm.z * cw / w
+
+    @staticmethod
+    def _next_crop(results, w, h):
+        """กรอบสี่เหลี่ยมจัตุรัสรอบมือ (ขยาย ROI_MARGIN) หรือ None ถ้าไม่เจอมือ"""
+        if not results.multi_hand_landmarks: return None
+        pts = np.array([(lm.x * w, lm.y * h) for hand in results.multi_hand_landmarks for lm in hand.landmark])
+        (ax, ay), (bx, by) = pts.min(axis=0), pts.max(axis=0)
+        side = max(bx - ax, by - ay) * (1 + 2 * ROI_MARGIN)
+        side = int(min(max(side, ROI_MIN_SIZE), w, h))
+        cx, cy = (ax + bx) / 2, (ay + by) / 2
+        x0 = int(min(max(cx - side / 2, 0), w - side))
+        y0 = int(min(max(cy - side / 2, 0), h - side))
+        return x0, y0, x0 + side, y0 + side
+
+    def stats(self):
+        return dict(self.counts, mode=self.mode, step=self.step, ms_ema=self.ms_ema)
+
+
+# ----------------- Benchmark (CLI) -----------------
+
+def record_video(path, seconds=20, camera_index=0):
+    cap = cv2.VideoCapture(camera_index)
+    ret, frame = cap.read()
+    if not ret:
+        print("[ERROR] Cannot read camera frame.")
+        return
+    h, w = frame.shape[:2]
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (w, h))
+    print(f"🎥 บันทึก {seconds} วินาที -> {path} (ขยับมือหลายๆ ท่า, Esc = หยุด)")
+    t_end = time.time() + seconds
+    try:
+        while time.time() < t_end and ret:
+            out.write(frame)
+            cv2.imshow("record", frame)
+            if cv2.waitKey(1) & 0xFF == 27: break
+            ret, frame = cap.read()
+    finally:
+        out.release()
+        cap.release()
+        cv2.destroyAllWindows()
+
+def replay(path, mode):
+    """เล่นวิดีโอผ่าน HandTracker 1 โหมด -> (สถิติ, ตำแหน่งปลายนิ้วชี้ต่อภาพ (px) หรือ None)"""
+    cap = cv2.VideoCapture(path)
+    tracker = HandTracker(mode)
+    tips, times, t_start = [], [], time.perf_counter()
+    while True:
+        ret, frame = cap.read()
+        if not ret: break
+        h, w = frame.shape[:2]
+        rgb = cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB)
+        t0 = time.perf_counter()
+        results = tracker.process(rgb)
+        times.append((time.perf_counter() - t0) * 1000.0)
+        if results.multi_hand_landmarks:
+            tip = results.multi_hand_landmarks[0].landmark[8]
+            tips.append((tip.x * w, tip.y * h))
+        else:
+            tips.append(None)
+    elapsed = time.perf_counter() - t_start
+    cap.release()
+    tracker.close()
+    n = len(tips)
+    found = [t is not None for t in tips]
+    flips = sum(a != b for a, b in zip(found, found[1:]))
+    steps = [math.dist(a, b) for a, b in zip(tips, tips[1:]) if a is not None and b is not None]
+    times = np.array(times) if times else np.zeros(1)
+    stats = {"mode": mode, "frames": n, "fps": n / elapsed if elapsed > 0 else 0.0,
+             "ms_mean": float(times.mean()), "ms_p95": float(np.percentile(times, 95)),
+             "detect_rate": sum(found) / max(n, 1), "flips_per_100": 100.0 * flips / max(n - 1, 1),
+             "tip_step_px": float(np.median(steps)) if steps else 0.0,
+             "skipped": tracker.counts["skipped"], "roi": tracker.counts["roi"], "lost": tracker.counts["lost"]}
+    return stats, tips
+
+def benchmark(path, modes=HAND_MODES):
+    results, reference = [], None
+    for mode in modes:
+        stats, tips = replay(path, mode)
+        if reference is None:
+            reference = tips
+        else:
+            # ความต่างจากโหมดแรก (ปกติคือ full) ในภาพที่เจอมือทั้งคู่
+            diffs = [math.dist(a, b) for a, b in zip(reference, tips) if a is not None and b is not None]
+            stats["vs_first_px"] = float(np.median(diffs)) if diffs else None
+        results.append(stats)
+    print(f"\n{'mode':<6} {'FPS':>6} {'ms':>6} {'p95':>6} {'detect':>7} {'flips%':>7} {'step px':>8} "
+          f"{'skip':>5} {'roi':>5} {'lost':>5} {'vs first':>9}")
+    for s in results:
+        vs = s.get("vs_first_px")
+        print(f"{s['mode']:<6} {s['fps']:>6.1f} {s['ms_mean']:>6.1f} {s['ms_p95']:>6.1f} {s['detect_rate'] * 100:>6.1f}% "
+              f"{s['flips_per_100']:>7.2f} {s['tip_step_px']:>8.1f} {s['skipped']:>5} {s['roi']:>5} {s['lost']:>5} "
+              f"{('-' if vs is None else f'{vs:.1f} px'):>9}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MediaPipe hand tracking modes / replay benchmark")
+    parser.add_argument("--record", metavar="VIDEO", help="บันทึกวิดีโอจากกล้องไว้ใช้ benchmark")
+    parser.add_argument("--seconds", type=int, default=20)
+    parser.add_argument("--camera", type=int, default=0)
+    parser.add_argument("--benchmark", metavar="VIDEO", help="เล่นวิดีโอซ้ำผ่านทุกโหมด แล้วเทียบ FPS/ความนิ่ง")
+    parser.add_argument("--modes", nargs="+", choices=HAND_MODES, default=list(HAND_MODES))
+    args = parser.parse_args()
+    if args.record:
+        record_video(args.record, args.seconds, args.camera)
+    elif args.benchmark:
+        benchmark(args.benchmark, args.modes)
+    else:
+        parser.print_help()
@@ -0,0 +1,120 @@
+# motion_filter.py
+# ทำให้เป้าหมายจากปลายนิ้วนิ่งพอที่แขนจะตามทัน ก่อนส่งเข้าคิวของ Dobot
+#
+#   OneEuroFilter : กรองสั่นของมือ (ขยับช้า -> กรองหนัก, ขยับเร็ว -> ตามทันแทบไม่หน่วง)
+#   TargetSender  : ส่งเป้าหมายใหม่เฉพาะเมื่อ
+#                     - ห่างจากเป้าหมายล่าสุดที่ส่งไปเกิน deadband
+#                     - ห่างจากครั้งก่อนอย่างน้อย min_interval
+#                     - คิวบนแขนยังค้างไม่เกิน max_depth คำสั่ง (แขนตามไม่ทัน -> รอ ไม่ยัดเพิ่ม)
+#                   เป้าหมายที่ยังส่งไม่ได้เก็บไว้อันเดียว (อันใหม่แทนอันเก่า) -> ความหน่วงไม่สะสม
+import math
+import time
+
+import numpy as np
+
+MIN_CUTOFF = 1.0                # Hz: ความถี่ตัดตอนมือนิ่ง (ต่ำ = นิ่งขึ้นแต่หน่วงขึ้น)
+BETA = 0.02                     # เพิ่มความถี่ตัดตามความเร็วมือ (mm/s)
+D_CUTOFF = 1.0                  # Hz: กรองค่าความเร็วก่อนนำไปคำนวณ
+DEADBAND_MM = 3.0               # เป้าหมายขยับน้อยกว่านี้ไม่ส่ง
+MIN_SEND_INTERVAL = 0.05        # วินาที: ส่งไม่เกิน ~20 เป้าหมาย/วินาที
+MAX_QUEUE_DEPTH = 2             # คำสั่งที่ค้างอยู่บนแขนได้สูงสุดก่อนหยุดส่งเพิ่ม
+DEPTH_POLL_INTERVAL = 0.03      # วินาที: ถามเลขคิวจากแขนไม่ถี่กว่านี้ (แต่ละครั้งคือ 1 รอบ Serial)
+
+
+def _alpha(cutoff, dt):
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """One Euro Filter (Casiez et al.) สำหรับเวกเตอร์ เช่น (x, y) ของปลายนิ้ว"""
+
+    def __init__(self, min_cutoff=MIN_CUTOFF, beta=BETA, d_cutoff=D_CUTOFF):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._x = None
+        self._dx = None
+        self._t = None
+
+    def __call__(self, value, t=None):
+        t = time.time() if t is None else t
+        x = np.asarray(value, dtype=np.float64)
+        if self._x is None or t <= self._t:
+            if self._x is None:
+                self._x, self._dx = x, np.zeros_like(x)
+            self._t = t
+            return self._x.copy()
+        dt = t - self._t
+        dx = (x - self._x) / dt
+        self._dx = self._dx + _alpha(self.d_cutoff, dt) * (dx - self._dx)
+        cutoff = self.min_cutoff + self.beta * float(np.linalg.norm(self._dx))
+        self._x = self._x + _alpha(cutoff, dt) * (x - self._x)
+        self._t = t
+        return self._x.copy()
+
+
+class TargetSender:
+    """
+    send          : (x, y, z) -> เลข index ในคิวของ Dobot
+    current_index : () -> เลข index ที่แขนทำถึงแล้ว
+    """
+
+    def __init__(self, send, current_index, deadband=DEADBAND_MM, min_interval=MIN_SEND_INTERVAL,
+                 max_depth=MAX_QUEUE_DEPTH):
+        self.send = send
+        self.current_index = current_index
+        self.deadband = deadband
+        self.min_interval = min_interval
+        self.max_depth = max_depth
+        self.sent = 0
+        self.suppressed = 0             # ไม่ส่งเพราะอยู่ใน deadband
+        self.replaced = 0               # เป้าหมายที่รอส่งแล้วถูกอันใหม่แทน
+        self._pending = None            # (target, stamp)
+        self._last_target = None
+        self._last_index = None
+        self._last_time = 0.0
+        self._depth = 0
+        self._depth_time = 0.0
+
+    def reset(self):
+        """ลืมเป้าหมายเดิม (หลังแขนถูกสั่งไปที่อื่น เช่น ท่า grab)"""
+        self._pending = None
+        self._last_target = None
+
+    def offer(self, target, stamp):
+        """เป้าหมายใหม่จากมือ -> True ถ้าส่งให้แขนทันที"""
+        if self._pending is not None: self.replaced += 1
+        self._pending = (tuple(target), stamp)
+        return self.pump() is not None
+
+    def queue_depth(self, now=None):
+        """จำนวนคำสั่งของเราที่ยังค้างบนแขน (ถามแขนไม่ถี่กว่า DEPTH_POLL_INTERVAL)"""
+        if self._last_index is None: return 0
+        now = time.time() if now is None else now
+        if now - self._depth_time >= DEPTH_POLL_INTERVAL:
+            self._depth = max(0, self._last_index - self.current_index())
+            self._depth_time = now
+        return self._depth
+
+    def pump(self):
+        """ลองส่งเป้าหมายที่รออยู่ -> stamp ของเป้าหมายที่ส่ง หรือ None"""
+        if self._pending is None: return None
+        target, stamp = self._pending
+        if self._last_target is not None and math.dist(target, self._last_target) < self.deadband:
+            self._pending = None
+            self.suppressed += 1
+            return None
+        now = time.time()
+        if now - self._last_time < self.min_interval: return None
+        if self.queue_depth(now) >= self.max_depth: return None
+        self._last_index = self.send(target)
+        self._last_target = target
+        self._last_time = now
+        self._depth = self._depth + 1
+        self._pending = None
+        self.sent += 1
+        return stamp
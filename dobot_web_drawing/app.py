@@ -1,3 +1,4 @@
+import atexit
 import os
 import shutil
 import time
@@ -8,22 +9,22 @@ import subprocess
 import sys
 import socket 
 import base64
-import signal # สำหรับสั่งปิด Process
-from flask import Flask, jsonify, request, send_from_directory, render_template
+from flask import Flask, Response, abort, jsonify, request, send_from_directory, render_template
 from flask_cors import CORS
-from threading import Lock
 import numpy as np
 import cv2
 
 try:
     import dobot_drawing_logic as ddl 
     from dobot_drawing_logic import (
-        DOBOT_SPEED, DOBOT_ACCELERATION, 
         PEN_DOWN_Z, PEN_UP_Z, TEST_PARAMS
     )
 except ImportError:
     print(" ไม่พบไฟล์ dobot_drawing_logic.py")
     exit()
+import telemetry
+import motion_owner
+import image_ingest
 
 app = Flask(__name__) 
 CORS(app) 
@@ -41,33 +42,32 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 os.makedirs(RAW_UPLOAD_FOLDER, exist_ok=True) 
 
-bot = None
-drawing_thread = None
-drawing_state_lock = Lock()  # Thread lock for drawing state
-drawing_state = {
-    "status": "idle", 
-    "message": "Disconnected",
-    "progress": 0,
-    "progress_image_url": "",
-    "stop_flag": False
-}
-processed_data = {
-    "current_run_dir": None,
-    "all_steps_dir": None,
-    "base_bgr_image": None,
-    "bw_image_path": None, 
-    "img_gray_resized": None,
-    "filtered_contours": None,
-    "processed_paths": None,
-    "contour_lengths": None,
-    "total_contours": 0,
-    "original_image_name": None 
-}
+# Dobot + สถานะงานทั้งหมดอยู่ที่ Motion owner
+# - python app.py : สร้างใน Process นี้เลย (โหมดพัฒนา)
+# - python serve.py : ตั้ง DOBOT_MOTION_OWNER=remote ให้ทุก Worker ต่อไปที่ Process เจ้าของแขนกลตัวเดียว
+if os.environ.get('DOBOT_MOTION_OWNER') == 'remote':
+    motion = motion_owner.connect_remote()
+else:
+    motion = motion_owner.MotionOwner()
 
 DFCALL_SCRIPT_PATH = '/Users/pongsathon/Desktop/visionlab_dobot/Dobot_for_institution/dobot_web_drawing/png_to_cartoon/draw_cartoon_df.py' # path เรียกใช้แปลงรูป
 DFCALL_OUTPUT_IMAGE_PATH = '/Users/pongsathon/Desktop/visionlab_dobot/Dobot_for_institution/dobot_web_drawing/png_to_cartoon/stitched_cartoon_512x512.jpg' # output image
 DFCALL_DIR = os.path.dirname(DFCALL_SCRIPT_PATH)
 
+# inprocess: โหลด GAN ครั้งเดียวแล้วแปลงภาพจาก Array ในหน่วยความจำ / subprocess: รันสคริปต์แยกแบบเดิม
+GAN_MODE = os.environ.get('DOBOT_GAN_MODE', 'inprocess')
+
+# ไฟล์ผลลัพธ์เขียนลงดิสก์แบบ Background, Browser ขอผ่าน /artifacts/...
+artifacts = image_ingest.ArtifactStore()
+atexit.register(artifacts.flush, 5.0)
+cartoonizer = image_ingest.Cartoonizer(DFCALL_DIR)
+if GAN_MODE == 'inprocess':
+    # โหลดโมเดลรอไว้ตั้งแต่เปิดเซิร์ฟเวอร์ Request แรกจะได้ไม่ต้องรอ
+    threading.Thread(target=cartoonizer.available, daemon=True).start()
+
+def artifact_url(path):
+    return f"artifacts/{path}".replace(os.path.sep, '/')
+
 # --- ฟังก์ชันหา IP Address ---
 def get_ip():
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -81,28 +81,7 @@ def get_ip():
     return IP
 
 MY_IP = get_ip()
-PORT = 5001
-
-# ---  ฟังก์ชัน Kill Port  ---
-def kill_port(port):
-    """ค้นหาและปิด Process ที่ใช้งาน Port นั้นอยู่"""
-    print(f" กำลังตรวจสอบ Port {port}...")
-    try:
-        # หา PID ของโปรแกรมที่ใช้ Port นี้อยู่
-        cmd = f"lsof -t -i :{port}"
-        pid_list = subprocess.check_output(cmd, shell=True).decode().strip().split('\n')
-        
-        for pid in pid_list:
-            if pid:
-                pid = int(pid)
-                print(f" เจอ Process ค้างอยู่ (PID: {pid}) กำลังสั่ง Kill...")
-                os.kill(pid, signal.SIGKILL) # สั่งปิดทันที
-                print(f" กำจัด Process {pid} เรียบร้อยแล้ว")
-    except subprocess.CalledProcessError:
-        print(f" Port {port} ว่างอยู่ เริ่มรันได้เลย")
-    except Exception as e:
-        print(f" เกิดข้อผิดพลาดในการ Kill port: {e}")
-# --------------------------------------------------------
+PORT = int(os.environ.get('DOBOT_DRAWING_PORT', 5001))
 
 @app.route('/')
 def index():
@@ -124,7 +103,9 @@ def quick_upload():
             if file:
                 safe_filename = f"mobile_{timestamp}_{i}_{file.filename}"
                 save_path = os.path.join(RAW_UPLOAD_FOLDER, safe_filename)
-                file.save(save_path)
+                with telemetry.span('upload_save'):
+                    # เก็บ bytes ที่ได้มาตรงๆ ให้ Thread เขียนดิสก์ (ปุ่มนี้มีไว้บันทึกไฟล์ จึงเขียนเสมอ)
+                    artifacts.put_bytes(save_path, file.stream.read(), persist=True)
                 saved_files.append(safe_filename)
                 print(f"📱 Saved: {save_path}")
         
@@ -137,43 +118,29 @@ def quick_upload():
         print(f" Upload error: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/artifacts/<path:relpath>')
+def get_artifact(relpath):
+    relpath = os.path.normpath(relpath).replace(os.path.sep, '/')
+    if not relpath.startswith('static/') or '..' in relpath.split('/'):
+        abort(404)
+    data = artifacts.get(relpath)
+    if data is None: abort(404)
+    return Response(data, mimetype=artifacts.mimetype(relpath), headers={"Cache-Control": "no-cache"})
+
 @app.route('/connect', methods=['POST'])
 def connect_dobot():
-    global bot
-    if bot: return jsonify({"status": "success", "message": "Already connected", "port": bot.port, "model": "Dobot Magician"}), 200
-    port = ddl.find_dobot_port()
-    if not port:
-        drawing_state["message"] = "Dobot not found"
-        return jsonify({"status": "error", "message": "Dobot not found. Check connection."}), 404
-    try:
-        bot = ddl.Dobot(port=port, verbose=False)
-        bot.speed(DOBOT_SPEED, DOBOT_ACCELERATION)
-        drawing_state["status"] = "idle"
-        drawing_state["message"] = "Connected"
-        print(f" Dobot connected at {port}")
-        return jsonify({"status": "success", "message": "Connected", "port": port, "model": "Dobot Magician"}), 200
-    except Exception as e:
-        drawing_state["message"] = f"Connection failed: {e}"
-        return jsonify({"status": "error", "message": str(e)}), 500
+    payload, code = motion.connect()
+    return jsonify(payload), code
 
 @app.route('/disconnect', methods=['POST'])
 def disconnect_dobot():
-    global bot
-    if bot:
-        try: bot.close()
-        except Exception as e: print(f" Error closing dobot: {e}")
-        bot = None
-    drawing_state["status"] = "idle"
-    drawing_state["message"] = "Disconnected"
-    return jsonify({"status": "success", "message": "Disconnected"})
+    payload, code = motion.disconnect()
+    return jsonify(payload), code
 
 @app.route('/get_position', methods=['GET'])
 def get_position():
-    if not bot: return jsonify({"status": "error", "message": "Dobot not connected"}), 400
-    try:
-        pose = bot.pose()
-        return jsonify({"status": "success", "x": round(pose[0], 2), "y": round(pose[1], 2)})
-    except Exception as e: return jsonify({"status": "error", "message": str(e)}), 500
+    payload, code = motion.get_position()
+    return jsonify(payload), code
 
 @app.route('/set_paper_corners', methods=['POST'])
 def set_paper_corners():
@@ -218,15 +185,13 @@ def load_external_config():
 
 @app.route('/process_image', methods=['POST'])
 def process_image():
-    global processed_data
     if 'image' not in request.files:
         return jsonify({"status": "error", "message": "No image file provided"}), 400
     file = request.files['image']
     if file.filename == '':
         return jsonify({"status": "error", "message": "No selected file"}), 400
 
-    drawing_state["status"] = "processing"
-    drawing_state["message"] = "Starting DFCall..."
+    motion.set_status("processing", "Starting DFCall...")
 
     try:
         if os.path.exists(DFCALL_OUTPUT_IMAGE_PATH):
@@ -234,110 +199,174 @@ def process_image():
             os.remove(DFCALL_OUTPUT_IMAGE_PATH)
             
         run_dir = ddl.get_next_experiment_dir() 
-        processed_data["current_run_dir"] = run_dir
-        processed_data["all_steps_dir"] = os.path.join(run_dir, 'all_steps')
-        os.makedirs(processed_data["all_steps_dir"], exist_ok=True)
+        all_steps_dir = os.path.join(run_dir, 'all_steps')
+        os.makedirs(all_steps_dir, exist_ok=True)
         
         original_image_name = f"original_{file.filename}"
         original_image_path = os.path.join(UPLOAD_FOLDER, original_image_name)
-        file.save(original_image_path)
-        print(f"  Saved original image to {original_image_path}")
-        
-        processed_data["original_image_name"] = original_image_name 
-
-        python_executable = sys.executable 
-        input_image_full_path = os.path.abspath(original_image_path)
-        command = [python_executable, DFCALL_SCRIPT_PATH, input_image_full_path, DFCALL_DIR]
-        
-        print(f" Subprocess: กำลังรันสคริปต์ (Detached)...")
-        
-        subprocess.Popen(
-            command,
-            cwd=DFCALL_DIR,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            start_new_session=True 
+        # ถอดรหัสจาก stream ครั้งเดียว (bytes ต้นฉบับเก็บลงดิสก์ทีหลังโดยไม่เข้ารหัสใหม่)
+        with telemetry.span('upload_decode'):
+            img_bgr, raw_bytes = image_ingest.decode_upload(file)
+        motion.update_job(
+            current_run_dir=run_dir, all_steps_dir=all_steps_dir,
+            original_image_name=original_image_name,
+            gan_started_at=None, gan_result=None, gan_error=None, last_result=None
         )
+
+        if GAN_MODE == 'inprocess' and cartoonizer.available():
+            artifacts.put_bytes(original_image_path, raw_bytes)
+            threading.Thread(target=run_cartoon_inprocess, args=(img_bgr,), daemon=True).start()
+            print("--- [app.py] Cartoon GAN is running in-process. ---")
+        else:
+            # สคริปต์แยกต้องอ่านจากไฟล์ -> เขียนให้เสร็จก่อนสั่งรัน
+            with telemetry.span('upload_save'):
+                with open(original_image_path, 'wb') as f:
+                    f.write(raw_bytes)
+            artifacts.put_bytes(original_image_path, raw_bytes, persist=False)
+            print(f"  Saved original image to {original_image_path}")
+
+            python_executable = sys.executable 
+            input_image_full_path = os.path.abspath(original_image_path)
+            command = [python_executable, DFCALL_SCRIPT_PATH, input_image_full_path, DFCALL_DIR]
+            
+            print(f" Subprocess: กำลังรันสคริปต์ (Detached)...")
+            
+            with telemetry.span('gan_launch'):
+                subprocess.Popen(
+                    command,
+                    cwd=DFCALL_DIR,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    start_new_session=True 
+                )
+            motion.update_job(gan_started_at=time.time())
+            
+            print(f"--- [app.py] draw_cartoon is running in background. ---")
         
-        print(f"--- [app.py] draw_cartoon is running in background. ---")
-        
-        drawing_state["message"] = "Processing draw_cartoon... (Polling)"
+        motion.set_status(message="Processing draw_cartoon... (Polling)")
         return jsonify({
             "status": "processing_started",
             "message": "draw_cartoon started. Polling for result..."
         })
 
     except Exception as e:
-        drawing_state["status"] = "idle"
-        drawing_state["message"] = f"Error: {e}"
+        motion.set_status("idle", f"Error: {e}")
         print(f" /process_image Error (Pre-run): {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+def run_cartoon_inprocess(img_bgr):
+    """Thread: GAN ในหน่วยความจำ -> ส่งผลลัพธ์ (Array) เข้า Job ให้ /check_processing หยิบไป"""
+    try:
+        with telemetry.span('gan_inference'):
+            result_bgr = cartoonizer.run(img_bgr)
+        motion.update_job(gan_result=result_bgr)
+    except Exception as e:
+        print(f" Cartoon GAN Error: {e}")
+        motion.update_job(gan_error=str(e))
+
 @app.route('/check_processing', methods=['GET'])
 def check_processing():
-    global processed_data
-    
     try:
-        if not os.path.exists(DFCALL_OUTPUT_IMAGE_PATH):
-            return jsonify({"status": "processing", "message": "DFCall is running..."})
+        job = motion.get_job("current_run_dir", "original_image_name", "gan_started_at", "last_result")
+        run_dir = job["current_run_dir"]
+        bw_image_path = os.path.join(run_dir, "processed_bw_image.jpg") if run_dir else None
+
+        # GAN แบบ in-process: ได้ Array มาตรงๆ ไม่ต้องอ่านไฟล์
+        img_color = motion.take_job("gan_result")
+        if img_color is not None:
+            artifacts.put_image(bw_image_path, img_color)
+        else:
+            gan_error = motion.take_job("gan_error")
+            if gan_error: raise Exception(f"Cartoon GAN failed: {gan_error}")
+            if not os.path.exists(DFCALL_OUTPUT_IMAGE_PATH):
+                # Worker อื่นประมวลผลรอบนี้เสร็จไปแล้ว -> ตอบผลเดิมซ้ำ
+                if job["last_result"]: return jsonify(job["last_result"])
+                return jsonify({"status": "processing", "message": "DFCall is running..."})
+            img_color = load_subprocess_result(bw_image_path)
+            if img_color is None:
+                return jsonify({"status": "processing", "message": "DFCall result is being processed..."})
 
-        print(f"draw_cartoon Success: พบไฟล์ผลลัพธ์!")
-        drawing_state["message"] = "DFCall complete. Processing comparison..."
-        
-        run_dir = processed_data["current_run_dir"]
         run_dir_basename = os.path.basename(run_dir)
-        original_image_name = processed_data["original_image_name"]
-
-        bw_image_path = os.path.join(run_dir, "processed_bw_image.jpg")
-        shutil.copy(DFCALL_OUTPUT_IMAGE_PATH, bw_image_path)
-        os.remove(DFCALL_OUTPUT_IMAGE_PATH) 
-        
-        print(f"คัดลอกภาพมาที่: {bw_image_path}")
-        
-        img_color = cv2.imread(bw_image_path)
-        if img_color is None:
-            raise Exception(f"Could not read B&W image at {bw_image_path}")
+        original_image_name = job["original_image_name"]
+        # GAN รันคนละ Process -> วัดจากตอนสั่งรันจนเจอไฟล์ผลลัพธ์ (ละเอียดเท่ารอบ polling)
+        if job["gan_started_at"]:
+            telemetry.record('gan_inference', time.time() - job["gan_started_at"])
+        motion.set_status(message="DFCall complete. Processing comparison...")
             
-        original_h, original_w = img_color.shape[:2]
-        scale_factor = ddl.IMAGE_MAX_SIZE / max(original_h, original_w)
-        target_w = int(original_w * scale_factor)
-        target_h = int(original_h * scale_factor)
-        img_color_resized = cv2.resize(img_color, (target_w, target_h), interpolation=cv2.INTER_AREA)
-        img_gray_resized = cv2.cvtColor(img_color_resized, cv2.COLOR_BGR2GRAY)
-        processed_data["img_gray_resized"] = img_gray_resized.copy()
-        processed_data["base_bgr_image"] = cv2.cvtColor(img_gray_resized, cv2.COLOR_GRAY2BGR)
-
-        drawing_state["message"] = "Generating parameter comparison..."
-        comparison_image_path = ddl.visualize_parameters(
-            img_color_resized, 
-            img_gray_resized.copy(), 
-            ddl.TEST_PARAMS, 
-            run_dir 
-        )
-        print(f" Saved comparison sheet to {comparison_image_path}")
+        with telemetry.span('resize'):
+            original_h, original_w = img_color.shape[:2]
+            scale_factor = ddl.IMAGE_MAX_SIZE / max(original_h, original_w)
+            target_w = int(original_w * scale_factor)
+            target_h = int(original_h * scale_factor)
+            img_color_resized = cv2.resize(img_color, (target_w, target_h), interpolation=cv2.INTER_AREA)
+            img_gray_resized = cv2.cvtColor(img_color_resized, cv2.COLOR_BGR2GRAY)
+        motion.update_job(img_gray_resized=img_gray_resized, gan_started_at=None,
+                          filtered_contours=None, processed_paths=None, contour_lengths=None, total_contours=0)
+
+        motion.set_status(message="Generating parameter comparison...")
+        with telemetry.span('comparison_sheet'):
+            comparison_jpg = ddl.visualize_parameters(
+                img_color_resized, 
+                img_gray_resized.copy(), 
+                ddl.TEST_PARAMS, 
+                None,
+                stage_hook=telemetry.stage_hook('comparison')
+            )
+        comparison_image_path = os.path.join(run_dir, "parameter_comparison.jpg")
+        artifacts.put_bytes(comparison_image_path, comparison_jpg)
 
-        drawing_state["status"] = "idle"
-        drawing_state["message"] = "Ready for parameter selection"
+        motion.set_status("idle", "Ready for parameter selection")
         
-        return jsonify({
+        result = {
             "status": "success",
             "message": "Processing complete. Please select parameters.",
-            "original_url": f"{UPLOAD_FOLDER}/{original_image_name}".replace(os.path.sep, '/'),
-            "bw_image_url": f"{OUTPUT_FOLDER}/{run_dir_basename}/processed_bw_image.jpg".replace(os.path.sep, '/'), 
-            "comparison_url": f"{OUTPUT_FOLDER}/{run_dir_basename}/parameter_comparison.jpg".replace(os.path.sep, '/')
-        })
+            "original_url": artifact_url(f"{UPLOAD_FOLDER}/{original_image_name}"),
+            "bw_image_url": artifact_url(f"{OUTPUT_FOLDER}/{run_dir_basename}/processed_bw_image.jpg"), 
+            "comparison_url": artifact_url(f"{OUTPUT_FOLDER}/{run_dir_basename}/parameter_comparison.jpg")
+        }
+        motion.update_job(last_result=result)
+        return jsonify(result)
 
     except Exception as e:
-        drawing_state["status"] = "idle"
-        drawing_state["message"] = f"Error: {e}"
+        motion.set_status("idle", f"Error: {e}")
         print(f" /check_processing Error: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def load_subprocess_result(bw_image_path):
+    """GAN แบบ Subprocess: ย้ายไฟล์ผลลัพธ์เข้า run dir แล้วถอดรหัสครั้งเดียว (None = Worker อื่นหยิบไปแล้ว)"""
+    with telemetry.span('result_load'):
+        # ย้ายไฟล์ (rename) = จองงานแบบ atomic ถ้ามีหลาย Worker poll พร้อมกัน
+        try:
+            shutil.move(DFCALL_OUTPUT_IMAGE_PATH, bw_image_path)
+        except FileNotFoundError:
+            return None
+        print(f"draw_cartoon Success: พบไฟล์ผลลัพธ์!")
+        with open(bw_image_path, 'rb') as f:
+            raw_bytes = f.read()
+        artifacts.put_bytes(bw_image_path, raw_bytes, persist=False)
+        img_color = cv2.imdecode(np.frombuffer(raw_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if img_color is None:
+            raise Exception(f"Could not read B&W image at {bw_image_path}")
+    return img_color
+
+def get_fill_options(data):
+    """อ่านค่าโหมดถมดำจาก Frontend (ถ้าไม่ส่งมาใช้ค่า Default ใน Logic)"""
+    fill_mode = data.get('fill_mode') or ddl.FILL_MODE
+    if fill_mode not in ddl.FILL_MODES:
+        raise ValueError(f"Unknown fill_mode: {fill_mode}")
+    hatch_angle = data.get('hatch_angle')
+    hatch_spacing = data.get('hatch_spacing')
+    return {
+        "fill_mode": fill_mode,
+        "hatch_angle": float(hatch_angle) if hatch_angle is not None else ddl.HATCH_ANGLE,
+        "hatch_spacing": float(hatch_spacing) if hatch_spacing is not None else ddl.HATCH_SPACING,
+    }
+
 # API ใหม่: สำหรับ Preview ภาพสดๆ (ไม่เซฟไฟล์) 
 @app.route('/preview_parameters', methods=['POST'])
+@telemetry.profiled
 def preview_parameters():
-    global processed_data
     data = request.json
     choice_index = data.get('choice_index')
     
@@ -346,7 +375,8 @@ def preview_parameters():
     custom_min_area = data.get('min_area')
     custom_merge = data.get('merge_threshold')
 
-    if processed_data["img_gray_resized"] is None:
+    img_gray_resized = motion.get_job("img_gray_resized")["img_gray_resized"]
+    if img_gray_resized is None:
         return jsonify({"status": "error", "message": "No image processed yet."}), 400
     
     try:
@@ -361,21 +391,25 @@ def preview_parameters():
         final_eps = float(custom_epsilon) if custom_epsilon is not None else eps
         final_min_area = float(custom_min_area) if custom_min_area is not None else min_area
         final_merge = float(custom_merge) if custom_merge is not None else ddl.MERGE_DISTANCE_THRESHOLD
+        fill_options = get_fill_options(data)
 
         # เรียกฟังก์ชัน Logic แต่เน้นเอาแค่รูป preview
         preview_img_bgr, contours, _ = ddl.process_and_draw_contours(
-            processed_data["img_gray_resized"].copy(),
+            img_gray_resized.copy(),
             blur_ksize=blur, 
             thresh_blocksize=block, 
             thresh_c=c, 
             epsilon_factor=final_eps, 
             min_contour_area=final_min_area,
-            merge_threshold=final_merge
+            merge_threshold=final_merge,
+            stage_hook=telemetry.stage_hook('preview'),
+            **fill_options
         )
         
         # แปลงภาพเป็น Base64 ส่งกลับไป Frontend
-        _, buffer = cv2.imencode('.jpg', preview_img_bgr)
-        img_str = base64.b64encode(buffer).decode('utf-8')
+        with telemetry.span('preview_encode'):
+            _, buffer = cv2.imencode('.jpg', preview_img_bgr)
+            img_str = base64.b64encode(buffer).decode('utf-8')
         
         return jsonify({
             "status": "success",
@@ -388,9 +422,24 @@ def preview_parameters():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+def write_step_previews(base_bgr, filtered_contours, all_steps_dir, current_run_dir):
+    with telemetry.span('step_previews'):
+        for ci in range(1, len(filtered_contours) + 1):
+            ddl.create_progress_image(
+                base_bgr, filtered_contours, ci, is_final=False,
+                output_all_steps_path=all_steps_dir,
+                output_current_run_path=current_run_dir
+            )
+        ddl.create_progress_image(
+            base_bgr, filtered_contours, len(filtered_contours) + 1, is_final=True,
+            output_all_steps_path=all_steps_dir,
+            output_current_run_path=current_run_dir
+        )
+    print(f" Generated {len(filtered_contours)} all_steps images in {all_steps_dir}")
+
 @app.route('/select_parameters', methods=['POST'])
+@telemetry.profiled
 def select_parameters():
-    global processed_data
     data = request.json
     choice_index = data.get('choice_index')
     
@@ -401,11 +450,12 @@ def select_parameters():
 
     if choice_index is None or not (0 <= choice_index < len(TEST_PARAMS)):
         return jsonify({"status": "error", "message": "Invalid parameter choice"}), 400
-    if processed_data["img_gray_resized"] is None:
+    job = motion.get_job("img_gray_resized", "current_run_dir", "all_steps_dir")
+    img_gray_resized = job["img_gray_resized"]
+    if img_gray_resized is None:
         return jsonify({"status": "error", "message": "No image processed yet. Please /process_image first."}), 400
     
-    drawing_state["status"] = "processing"
-    drawing_state["message"] = "Generating contours..."
+    motion.set_status("processing", "Generating contours...")
     try:
         selected_params = TEST_PARAMS[choice_index]
         name, blur, block, c, eps, min_area = selected_params
@@ -414,276 +464,125 @@ def select_parameters():
         final_eps = float(custom_epsilon) if custom_epsilon is not None else eps
         final_min_area = float(custom_min_area) if custom_min_area is not None else min_area
         final_merge = float(custom_merge) if custom_merge is not None else ddl.MERGE_DISTANCE_THRESHOLD
+        fill_options = get_fill_options(data)
 
-        print(f" Generating Paths: {name} | Eps: {final_eps} | Area: {final_min_area} | Merge: {final_merge}")
+        print(f" Generating Paths: {name} | Eps: {final_eps} | Area: {final_min_area} | Merge: {final_merge} | Fill: {fill_options['fill_mode']}")
         
         preview_img_bgr, filtered_contours, total_length_mm = ddl.process_and_draw_contours(
-            processed_data["img_gray_resized"].copy(),
+            img_gray_resized.copy(),
             blur_ksize=blur, 
             thresh_blocksize=block, 
             thresh_c=c, 
             epsilon_factor=final_eps, 
             min_contour_area=final_min_area,
-            merge_threshold=final_merge 
+            merge_threshold=final_merge,
+            stage_hook=telemetry.stage_hook('select'),
+            **fill_options
         )
         
         if not filtered_contours:
             raise Exception("No contours found with these parameters.")
         
-        run_dir_basename = os.path.basename(processed_data["current_run_dir"])
-        lineart_path = os.path.join(processed_data["current_run_dir"], "final_lineart.jpg")
-        cv2.imwrite(lineart_path, preview_img_bgr)
-        print(f" Saved final lineart to {lineart_path}")
-
-        drawing_state["message"] = "Generating all_steps previews..."
-        base_bgr = processed_data["base_bgr_image"]
-        all_steps_dir = processed_data["all_steps_dir"]
-        current_run_dir = processed_data["current_run_dir"]
-        for ci in range(1, len(filtered_contours) + 1):
-            ddl.create_progress_image(
-                base_bgr, filtered_contours, ci, is_final=False,
-                output_all_steps_path=all_steps_dir,
-                output_current_run_path=current_run_dir
-            )
-        ddl.create_progress_image(
-            base_bgr, filtered_contours, len(filtered_contours) + 1, is_final=True,
-            output_all_steps_path=all_steps_dir,
-            output_current_run_path=current_run_dir
+        current_run_dir = job["current_run_dir"]
+        run_dir_basename = os.path.basename(current_run_dir)
+        lineart_path = os.path.join(current_run_dir, "final_lineart.jpg")
+        with telemetry.span('lineart_save'):
+            artifacts.put_image(lineart_path, preview_img_bgr)
+
+        # ภาพทีละขั้น (all_steps) เป็นแค่ไฟล์บันทึก -> เขียนใน Background ไม่ต้องรอ
+        base_bgr = cv2.cvtColor(img_gray_resized, cv2.COLOR_GRAY2BGR)
+        artifacts.defer(write_step_previews, base_bgr, filtered_contours, job["all_steps_dir"], current_run_dir)
+        with telemetry.span('plan_build'):
+            img_h, img_w = img_gray_resized.shape 
+            img_corners = np.float32([[0, 0], [img_w-1, 0], [img_w-1, img_h-1], [0, img_h-1]])
+            current_paper_corners = ddl.load_calibration() 
+            M = cv2.getPerspectiveTransform(img_corners, current_paper_corners) 
+            processed_paths = []
+            contour_lengths = []
+            for cnt in filtered_contours:
+                pts = np.array(cnt, dtype=np.float32).reshape(-1, 1, 2)
+                pts_transformed = cv2.perspectiveTransform(pts, M) 
+                processed_paths.append(pts_transformed)
+                length = np.sum(np.sqrt(np.sum(np.diff(pts_transformed.reshape(-1, 2), axis=0)**2, axis=1)))
+                contour_lengths.append(length)
+        motion.update_job(
+            filtered_contours=filtered_contours,
+            processed_paths=processed_paths,
+            contour_lengths=contour_lengths,
+            total_contours=len(filtered_contours)
         )
-        print(f" Generated {len(filtered_contours)} all_steps images in {all_steps_dir}")
-        img_h, img_w = processed_data["img_gray_resized"].shape 
-        img_corners = np.float32([[0, 0], [img_w-1, 0], [img_w-1, img_h-1], [0, img_h-1]])
-        current_paper_corners = ddl.load_calibration() 
-        M = cv2.getPerspectiveTransform(img_corners, current_paper_corners) 
-        processed_paths = []
-        contour_lengths = []
-        for cnt in filtered_contours:
-            pts = np.array(cnt, dtype=np.float32).reshape(-1, 1, 2)
-            pts_transformed = cv2.perspectiveTransform(pts, M) 
-            processed_paths.append(pts_transformed)
-            length = np.sum(np.sqrt(np.sum(np.diff(pts_transformed.reshape(-1, 2), axis=0)**2, axis=1)))
-            contour_lengths.append(length)
-        processed_data["filtered_contours"] = filtered_contours
-        processed_data["processed_paths"] = processed_paths
-        processed_data["contour_lengths"] = contour_lengths
-        processed_data["total_contours"] = len(filtered_contours)
-        drawing_state["status"] = "idle"
-        drawing_state["message"] = "Ready to select start contour"
+        motion.set_status("idle", "Ready to select start contour")
         
-        lineart_url = f"{OUTPUT_FOLDER}/{run_dir_basename}/final_lineart.jpg"
         return jsonify({
             "status": "success",
             "message": "Paths generated. Ready to draw.",
-            "lineart_url": lineart_url.replace(os.path.sep, '/'),
+            "lineart_url": artifact_url(f"{OUTPUT_FOLDER}/{run_dir_basename}/final_lineart.jpg"),
             "total_contours": len(filtered_contours)
         })
     except Exception as e:
         print(f" /select_parameters Error: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
-def drawing_thread_task(start_contour_index, pen_down_z, pen_up_z, home_x, home_y):
-    global drawing_state, processed_data
-    try:
-        with drawing_state_lock:
-            drawing_state["status"] = "drawing"
-            drawing_state["message"] = "Initializing..."
-            drawing_state["progress"] = 0
-            drawing_state["stop_flag"] = False
-        base_bgr = processed_data["base_bgr_image"]
-        current_run_dir = processed_data["current_run_dir"]
-        run_dir_basename = os.path.basename(current_run_dir)
-        
-        contours_to_draw = list(processed_data["filtered_contours"])
-        paths_to_draw = list(processed_data["processed_paths"])
-        lengths_to_draw = list(processed_data["contour_lengths"])
-        total_contours = len(paths_to_draw)
-        total_length_to_draw = sum(lengths_to_draw)
-        start_index = start_contour_index - 1
-        if start_index != 0:
-            print(f" Re-ordering drawing. Starting at {start_contour_index}")
-            contours_to_draw = contours_to_draw[start_index:] + contours_to_draw[:start_index]
-            paths_to_draw = paths_to_draw[start_index:] + paths_to_draw[:start_index]
-            lengths_to_draw = lengths_to_draw[start_index:] + lengths_to_draw[:start_index]
-            original_indices = list(range(start_index, total_contours)) + list(range(0, start_index))
-        else:
-            original_indices = list(range(total_contours))
-        ddl.safe_move(bot, home_x, home_y, pen_up_z, wait=True)
-        start_time = time.time()
-        current_length_drawn = 0
-        
-        progress_img_path = os.path.join(current_run_dir, "current_progress_drawing.jpg")
-        progress_img_url_base = f"{OUTPUT_FOLDER}/{run_dir_basename}/current_progress_drawing.jpg".replace(os.path.sep, '/')
-
-        print(f" Start Drawing: {total_contours} contours, Total Length: {total_length_to_draw:.2f} mm")
-
-        for i in range(total_contours):
-            if drawing_state["stop_flag"]:
-                drawing_state["message"] = "Drawing stopped"
-                print(" Drawing interrupted by User.")
-                break
-            while drawing_state["status"] == "paused":
-                if drawing_state["stop_flag"]:
-                    break
-                time.sleep(0.2) 
-            if drawing_state["stop_flag"]: 
-                drawing_state["message"] = "Drawing stopped"
-                break
-            pts_transformed = paths_to_draw[i]
-            if pts_transformed is None or len(pts_transformed) < 2:
-                continue
-            ci_original = original_indices[i] + 1
-            ci_loop = i + 1
-            
-            ddl.update_current_progress_image(
-                base_bgr, contours_to_draw, ci_loop, is_final=False,
-                output_filename=progress_img_path
-            )
-            
-            drawing_state["progress_image_url"] = f"{progress_img_url_base}?t={time.time()}"
-            
-            current_length_drawn += lengths_to_draw[i]
-            percent_done = (current_length_drawn / total_length_to_draw) * 100 if total_length_to_draw > 0 else 0
-            percent_done = float(round(percent_done, 1))
-            drawing_state["progress"] = percent_done
-            eta_display = ddl.get_eta_display(start_time, current_length_drawn, total_length_to_draw)
-            drawing_state["message"] = f"Drawing {ci_loop}/{total_contours} (Orig #{ci_original}) | {eta_display}"
-            
-            elapsed_now = time.time() - start_time
-            print(f" [{elapsed_now:.1f}s] Drawing Contour {ci_loop}/{total_contours} (Len: {lengths_to_draw[i]:.1f}mm) | Total: {percent_done:.1f}% | {eta_display}")
-            sx, sy = pts_transformed[0][0]
-            ddl.safe_move(bot, sx, sy, pen_up_z, wait=False)
-            ddl.safe_move(bot, sx, sy, pen_down_z, wait=True) 
-            x_last, y_last = sx, sy 
-            for p in pts_transformed[1:]:
-                x_last, y_last = p[0] 
-                ddl.safe_move(bot, x_last, y_last, pen_down_z, wait=False)
-                # Small delay to allow Flask to respond to progress requests
-                time.sleep(0.01) 
-            ddl.safe_move(bot, x_last, y_last, pen_down_z, wait=True)
-            ddl.safe_move(bot, x_last, y_last, pen_up_z, wait=False) 
-        
-        if drawing_state["stop_flag"]:
-            print("Drawing stopped by user.")
-            drawing_state["message"] = "Drawing stopped"
-            bot.stop_queue()
-            bot.clear_queue()
-            time.sleep(0.5)
-            pose = bot.pose()
-            ddl.safe_move(bot, pose[0], pose[1], pose[2] + 20, wait=True)
-        else:
-            end_time = time.time()
-            total_seconds = end_time - start_time
-            hours = int(total_seconds // 3600)
-            minutes = int((total_seconds % 3600) // 60)
-            seconds = int(total_seconds % 60)
-            
-            time_str = ""
-            if hours > 0: time_str += f"{hours}h "
-            if minutes > 0: time_str += f"{minutes}m "
-            time_str += f"{seconds}s"
-            
-            print("\n" + "="*50)
-            print(f"Drawing Finished Successfully!")
-            print(f"Total Drawing Time: {time_str} ({total_seconds:.2f} seconds)")
-            print("="*50 + "\n")
-            drawing_state["message"] = "Drawing complete!"
-            drawing_state["progress"] = 100.0
-            ddl.update_current_progress_image(
-                base_bgr, contours_to_draw, total_contours + 1, is_final=True,
-                output_filename=progress_img_path
-            )
-            drawing_state["progress_image_url"] = f"{progress_img_url_base}?t={time.time()}"
-        ddl.safe_move(bot, home_x, home_y, pen_up_z, wait=True) 
-    except Exception as e:
-        print(f"ERROR in drawing thread: {e}")
-        drawing_state["status"] = "error"
-        drawing_state["message"] = f"Error: {e}"
-    finally:
-        if drawing_state["status"] != "error":
-            drawing_state["status"] = "idle"
-        drawing_state["stop_flag"] = False
-
 @app.route('/start_drawing', methods=['POST'])
 def start_drawing():
-    global drawing_thread
-    if not bot:
-        return jsonify({"status": "error", "message": "Dobot not connected"}), 400
-    if drawing_thread and drawing_thread.is_alive():
-        return jsonify({"status": "error", "message": "Already drawing"}), 400
-    if not processed_data.get("processed_paths"):
-        return jsonify({"status": "error", "message": "No paths generated. Please select parameters first."}), 400
     data = request.json
     try:
         start_contour = int(data.get('start_contour', 1))
         speed_percent = float(data.get('speed', 50))
         pen_offset = float(data.get('pen_offset', 0))
         safety_height = float(data.get('safety_height', 10))
-        if not (1 <= start_contour <= processed_data["total_contours"]):
-            raise ValueError(f"Start contour must be between 1 and {processed_data['total_contours']}")
-        dobot_speed_val = (speed_percent / 100.0) * DOBOT_SPEED
-        dobot_accel_val = (speed_percent / 100.0) * DOBOT_ACCELERATION
-        dobot_speed_val = max(100, min(dobot_speed_val, DOBOT_SPEED))
-        dobot_accel_val = max(100, min(dobot_accel_val, DOBOT_ACCELERATION))
-        bot.speed(dobot_speed_val, dobot_accel_val)
-        
-        # ใช้ค่าจาก ddl.PEN_DOWN_Z (ล่าสุด)
-        pen_down_z = ddl.PEN_DOWN_Z + pen_offset 
-        if safety_height is None: safety_height = 20.0
-        pen_up_z = safety_height 
-        
-        current_paper_corners = ddl.load_calibration()
-        home_x, home_y = current_paper_corners[0] 
-        print(f"Starting drawing... Speed: {speed_percent}% ({dobot_speed_val:.0f}), Start: #{start_contour}")
-        
-        print(f"--- Z-HEIGHT DEBUG ---")
-        print(f"  Base PEN_DOWN_Z (from Logic): {ddl.PEN_DOWN_Z}")
-        print(f"  Offset (from Web): {pen_offset}")
-        print(f"  Final Z: {pen_down_z}")
-        print(f"----------------------")
-
-        drawing_thread = threading.Thread(
-            target=drawing_thread_task, 
-            args=(start_contour, pen_down_z, pen_up_z, home_x, home_y)
-        )
-        drawing_thread.start()
-        return jsonify({"status": "success", "message": "Drawing started..."})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 400
+    payload, code = motion.start_drawing(
+        start_contour, speed_percent, pen_offset, safety_height,
+        profile_kind=telemetry.requested_profiler(request)
+    )
+    return jsonify(payload), code
 
 @app.route('/progress', methods=['GET'])
 def get_progress():
-    with drawing_state_lock:
-        return jsonify(drawing_state.copy())  # Return copy to prevent modification
+    return jsonify(motion.progress())
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    metrics = telemetry.snapshot()
+    if isinstance(motion, motion_owner.MotionOwner): return jsonify(metrics)
+    # โหมด Production: span ของ Worker นี้ + span ของ Motion Owner (งานวาด) แยกกัน
+    metrics["worker_pid"] = os.getpid()
+    metrics["motion_owner"] = motion.metrics()
+    return jsonify(metrics)
+
+@app.route('/metrics/reset', methods=['POST'])
+def reset_metrics():
+    # span ของ Worker เก็บแยกกันทุก Worker: ล้างได้เฉพาะ Worker ที่รับ Request นี้ + Motion Owner
+    telemetry.reset()
+    if isinstance(motion, motion_owner.MotionOwner):
+        return jsonify({"status": "success", "message": "Metrics reset"})
+    motion.reset_metrics()
+    return jsonify({"status": "success", "message": "Metrics reset (this worker + motion owner)",
+                    "worker_pid": os.getpid()})
 
 @app.route('/pause', methods=['POST'])
 def pause_drawing():
-    if drawing_thread and drawing_thread.is_alive() and drawing_state["status"] == "drawing":
-        drawing_state["status"] = "paused"
-        drawing_state["message"] = "Paused"
-        # bot.pause(True)
-        print("Drawing paused")
-    return jsonify({"status": "success", "message": "Paused"})
+    payload, code = motion.pause()
+    return jsonify(payload), code
 
 @app.route('/resume', methods=['POST'])
 def resume_drawing():
-    if drawing_thread and drawing_thread.is_alive() and drawing_state["status"] == "paused":
-        drawing_state["status"] = "drawing"
-        drawing_state["message"] = "Resuming..."
-        # bot.pause(False)
-        print("Drawing resumed")
-    return jsonify({"status": "success", "message": "Resumed"})
+    payload, code = motion.resume()
+    return jsonify(payload), code
 
 @app.route('/stop', methods=['POST'])
 def stop_drawing():
-    drawing_state["stop_flag"] = True 
-    if drawing_state["status"] == "paused":
-        drawing_state["status"] = "drawing" 
-    print("Stop signal sent.")
-    return jsonify({"status": "success", "message": "Stop signal sent"})
+    payload, code = motion.stop()
+    return jsonify(payload), code
 
 if __name__ == '__main__':
-    # เรียกใช้ฟังก์ชัน Kill Port ก่อนรัน App
-    kill_port(PORT) 
+    # โหมดพัฒนา (Process เดียว) - Production ใช้ python serve.py
+    # ปิดได้เฉพาะเซิร์ฟเวอร์ตัวเก่าของเราเอง (จาก pid file) ไม่ยุ่งกับโปรแกรมอื่น
+    import serve
+    if not serve.release_port(PORT): sys.exit(1)
+    serve.write_pid_file()
     
     print("======================================================")
     print(" Dobot Drawing Web Server")
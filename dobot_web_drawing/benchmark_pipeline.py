@@ -0,0 +1,258 @@
+# benchmark_pipeline.py
+# วัดประสิทธิภาพ Pipeline แปลงภาพ -> แผนการวาด (ไม่ต้องต่อ Dobot)
+#
+# การใช้งาน:
+#   python benchmark_pipeline.py                          # รัน corpus สังเคราะห์ทุกขนาด ทุก preset
+#   python benchmark_pipeline.py --images path/to/imgs    # เพิ่มภาพ line-art ตัวอย่าง
+#   python benchmark_pipeline.py --compare bench_results/bench_old.json
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+import dobot_drawing_logic as ddl
+
+BENCH_SIZES = [256, 512, 1000]
+BENCH_REPEAT = 3
+BENCH_OUTPUT_DIR = 'bench_results'
+BENCH_SEED = 1234
+SAMPLE_GLOB = os.path.join(ddl.OUTPUT_DIR_BASE, f'{ddl.EXP_PREFIX}*', 'processed_bw_image.jpg')
+
+
+# ----------------- Corpus สังเคราะห์ (สร้างซ้ำได้ทุกครั้ง) -----------------
+
+def synth_face(size, rng):
+    """หน้าการ์ตูน: โครงหน้า ตา/จมูกถมดำ ปาก และผมสีเข้มก้อนใหญ่"""
+    img = np.full((size, size), 255, np.uint8)
+    s = size / 512.0
+    c = size // 2
+    cv2.ellipse(img, (c, int(c * 1.1)), (int(170 * s), int(210 * s)), 0, 0, 360, 0, max(1, int(3 * s)))
+    cv2.ellipse(img, (c, int(c * 0.55)), (int(190 * s), int(110 * s)), 0, 180, 360, 30, -1)
+    for dx in (-70, 70):
+        cv2.ellipse(img, (c + int(dx * s), c), (int(28 * s), int(16 * s)), 0, 0, 360, 0, max(1, int(2 * s)))
+        cv2.circle(img, (c + int(dx * s), c), int(9 * s) + 1, 0, -1)
+    cv2.circle(img, (c, int(c * 1.2)), int(8 * s) + 1, 20, -1)
+    cv2.ellipse(img, (c, int(c * 1.45)), (int(60 * s), int(25 * s)), 0, 10, 170, 0, max(1, int(3 * s)))
+    for _ in range(12):
+        x0 = int(rng.uniform(0.25, 0.75) * size)
+        cv2.line(img, (x0, int(0.15 * size)), (x0 + int(rng.uniform(-40, 40) * s), int(0.4 * size)), 0, 1)
+    return img
+
+def synth_strokes(size, rng):
+    """เส้นอิสระจำนวนมาก (วัดการเรียง/รวมเส้น)"""
+    img = np.full((size, size), 255, np.uint8)
+    for _ in range(60):
+        pts = (rng.uniform(0, size, (rng.integers(3, 8), 2))).astype(np.int32)
+        cv2.polylines(img, [pts], False, 0, int(rng.integers(1, 4)))
+    return img
+
+def synth_blobs(size, rng):
+    """พื้นที่มืดขนาดต่างๆ (วัดการถมดำ)"""
+    img = np.full((size, size), 255, np.uint8)
+    for _ in range(25):
+        center = tuple(int(v) for v in rng.uniform(0, size, 2))
+        axes = tuple(int(v) for v in rng.uniform(size * 0.01, size * 0.12, 2))
+        cv2.ellipse(img, center, axes, float(rng.uniform(0, 180)), 0, 360, int(rng.integers(0, 60)), -1)
+    return img
+
+SYNTHETIC_CORPUS = {
+    "synth_face": synth_face,
+    "synth_strokes": synth_strokes,
+    "synth_blobs": synth_blobs,
+}
+
+def load_sample_images(patterns):
+    """โหลดภาพ line-art ตัวอย่าง (ไฟล์หรือโฟลเดอร์) เป็นภาพ Gray"""
+    images = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files = [f for ext in ('*.png', '*.jpg', '*.jpeg') for f in glob.glob(os.path.join(pattern, ext))]
+        else:
+            files = glob.glob(pattern)
+        for path in sorted(files):
+            img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if img is None:
+                print(f" ⚠️ อ่านภาพไม่ได้: {path}")
+                continue
+            name = os.path.relpath(path).replace(os.path.sep, '/')
+            images[name] = img
+    return images
+
+def resize_to(img_gray, size):
+    """ย่อ/ขยายให้ด้านยาวสุดเท่ากับ size (แบบเดียวกับ /check_processing)"""
+    h, w = img_gray.shape[:2]
+    scale = size / max(h, w)
+    interp = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    return cv2.resize(img_gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=interp)
+
+
+# ----------------- ตัวจับเวลา/หน่วยความจำรายขั้นตอน -----------------
+
+class StageRecorder:
+    """ใช้เป็น stage_hook ของ process_and_draw_contours"""
+
+    def __init__(self, track_memory=False):
+        self.track_memory = track_memory
+        self.seconds = {}
+        self.peak_bytes = {}
+
+    @contextmanager
+    def __call__(self, name):
+        if self.track_memory:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - t0
+            if self.track_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                self.peak_bytes[name] = max(self.peak_bytes.get(name, 0), peak - base)
+
+
+def run_case(img_gray, preset, fill_mode, repeat):
+    name, blur, block, c, eps, min_area = preset
+    kwargs = dict(blur_ksize=blur, thresh_blocksize=block, thresh_c=c,
+                  epsilon_factor=eps, min_contour_area=min_area, fill_mode=fill_mode)
+
+    # รอบจับเวลา (ไม่เปิด tracemalloc เพราะทำให้ช้าลง)
+    runs = []
+    contours = None
+    for _ in range(repeat):
+        rec = StageRecorder()
+        t0 = time.perf_counter()
+        _, contours, total_len_px = ddl.process_and_draw_contours(img_gray.copy(), stage_hook=rec, **kwargs)
+        rec.seconds['total'] = time.perf_counter() - t0
+        runs.append(rec.seconds)
+
+    # รอบวัดหน่วยความจำ (ครั้งเดียว)
+    mem = StageRecorder(track_memory=True)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        ddl.process_and_draw_contours(img_gray.copy(), stage_hook=mem, **kwargs)
+        _, total_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    stage_names = list(runs[0].keys())
+    stages = {}
+    for stage in stage_names:
+        samples = [r.get(stage, 0.0) for r in runs]
+        stages[stage] = {
+            "median_ms": round(statistics.median(samples) * 1000, 3),
+            "min_ms": round(min(samples) * 1000, 3),
+            "peak_kb": round(mem.peak_bytes.get(stage, total_peak) / 1024, 1),
+        }
+    stages["total"]["peak_kb"] = round(total_peak / 1024, 1)
+
+    # ใช้มุมกระดาษ Default เสมอ ผลของแต่ละเครื่องจะได้เทียบกันได้
+    metrics = ddl.compute_plan_metrics(contours, img_gray.shape, paper_corners=ddl.PAPER_CORNERS_DEFAULT)
+    metrics["pipeline_total_length_px"] = round(float(total_len_px), 2)
+    return {"stages": stages, "metrics": metrics}
+
+
+def run_benchmark(images, sizes, fill_modes, repeat):
+    results = []
+    for img_name, img in images.items():
+        for size in sizes:
+            img_sized = resize_to(img, size)
+            for preset_idx, preset in enumerate(ddl.TEST_PARAMS):
+                for fill_mode in fill_modes:
+                    case = run_case(img_sized, preset, fill_mode, repeat)
+                    case.update({
+                        "image": img_name,
+                        "size": size,
+                        "shape": list(img_sized.shape),
+                        "preset_index": preset_idx,
+                        "preset": preset[0],
+                        "fill_mode": fill_mode,
+                    })
+                    results.append(case)
+                    m = case["metrics"]
+                    print(f" {img_name:<16} {size:>5}px  {preset[0]:<20} {fill_mode:<10} "
+                          f"{case['stages']['total']['median_ms']:>8.1f} ms  "
+                          f"{m['contour_count']:>5} เส้น  pen-up {m['pen_up_distance_mm']:>8.1f} mm  "
+                          f"ETA {m['predicted_draw_time_s']:>7.1f} s")
+    return results
+
+
+def case_key(case):
+    return (case["image"], case["size"], case["preset"], case["fill_mode"])
+
+def compare_results(old_path, results):
+    """เทียบกับผลรอบก่อน (เฉพาะเคสที่ตรงกัน) แล้วพิมพ์ % ที่เปลี่ยนไป"""
+    with open(old_path, 'r') as f:
+        old = {case_key(c): c for c in json.load(f)["results"]}
+    print(f"\n📊 เทียบกับ {old_path}")
+    for case in results:
+        prev = old.get(case_key(case))
+        if not prev: continue
+        t_old = prev["stages"]["total"]["median_ms"]
+        t_new = case["stages"]["total"]["median_ms"]
+        dt = (t_new - t_old) / t_old * 100 if t_old else 0.0
+        c_old = prev["metrics"]["contour_count"]
+        c_new = case["metrics"]["contour_count"]
+        flag = " ⚠️" if dt > 10 else ""
+        print(f" {case['image']:<16} {case['size']:>5}px  {case['preset']:<20} {case['fill_mode']:<10} "
+              f"time {t_old:>8.1f} -> {t_new:>8.1f} ms ({dt:+.1f}%)  contours {c_old} -> {c_new}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark image-to-plan pipeline")
+    parser.add_argument('--images', nargs='*', default=[SAMPLE_GLOB],
+                        help="ไฟล์/โฟลเดอร์/glob ของภาพ line-art ตัวอย่าง")
+    parser.add_argument('--sizes', nargs='*', type=int, default=BENCH_SIZES)
+    parser.add_argument('--fill-modes', nargs='*', default=list(ddl.FILL_MODES), choices=ddl.FILL_MODES)
+    parser.add_argument('--repeat', type=int, default=BENCH_REPEAT)
+    parser.add_argument('--no-synthetic', action='store_true', help="ไม่ใช้ corpus สังเคราะห์")
+    parser.add_argument('--out', default=None, help="ไฟล์ JSON ผลลัพธ์")
+    parser.add_argument('--compare', default=None, help="ไฟล์ JSON ผลรอบก่อนสำหรับเทียบ")
+    args = parser.parse_args()
+
+    images = {}
+    if not args.no_synthetic:
+        rng = np.random.default_rng(BENCH_SEED)
+        for name, fn in SYNTHETIC_CORPUS.items():
+            images[name] = fn(max(args.sizes), rng)
+    images.update(load_sample_images(args.images))
+    if not images:
+        print("❌ ไม่มีภาพให้ทดสอบ")
+        return
+
+    print(f"🏁 Benchmark: {len(images)} ภาพ x {len(args.sizes)} ขนาด x {len(ddl.TEST_PARAMS)} preset x {len(args.fill_modes)} fill mode")
+    results = run_benchmark(images, args.sizes, args.fill_modes, max(1, args.repeat))
+
+    report = {
+        "created": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "repeat": args.repeat,
+        "paper_corners": ddl.PAPER_CORNERS_DEFAULT.tolist(),
+        "results": results,
+    }
+    out_path = args.out
+    if out_path is None:
+        os.makedirs(BENCH_OUTPUT_DIR, exist_ok=True)
+        out_path = os.path.join(BENCH_OUTPUT_DIR, f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 บันทึกผลที่: {out_path}")
+
+    if args.compare:
+        compare_results(args.compare, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,11 +5,8 @@ matplotlib.use('Agg')
 
 import cv2
 import numpy as np
-try:
-    from pydobot import Dobot
-except ImportError:
-    Dobot = None
 
+import io
 import time
 import os
 import matplotlib.pyplot as plt
@@ -18,6 +15,10 @@ import glob
 import sys
 import shutil
 import math
+from contextlib import nullcontext
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dobot_common.device import COMMAND_OVERHEAD_S, TRANSPORT
 
 # ================== CONFIG (สูตรเน้นความเร็ว) ==================
 OUTPUT_DIR_BASE = 'static/processed' 
@@ -30,8 +31,6 @@ IMAGE_MAX_SIZE = 1000
 PEN_DOWN_Z = -65   # จุดจรดกระดาษ
 PEN_UP_Z = -60     # ยกขึ้นแค่นิดเดียว (5mm) เพื่อความเร็ว
 
-RETRY_ATTEMPTS = 3
-
 # ความเร็ว (ตั้งไว้สูงๆ)
 DOBOT_SPEED = 4000      
 DOBOT_ACCELERATION = 3000
@@ -52,6 +51,16 @@ FILL_DENSITY = 3
 # ขนาดพื้นที่ที่จะตัดสินว่าเป็น "ตา/จมูก"
 EYE_AREA_MAX_THRESHOLD = 400 
 
+# โหมดถมดำ: 'concentric' (วนก้นหอยแบบเดิม) หรือ 'hatch' (เส้นซิกแซก ยกปากกาน้อยกว่ามาก)
+FILL_MODES = ('concentric', 'hatch')
+FILL_MODE = 'concentric'
+
+# ตั้งค่า Hatch Fill
+HATCH_ANGLE = 45                  # มุมของเส้นถม (องศา)
+HATCH_SPACING = 3                 # ระยะห่างระหว่างเส้นถม (Pixel)
+HATCH_AREA_MAX_THRESHOLD = 50000  # โหมด hatch ถมพื้นที่มืดขนาดใหญ่ได้ด้วย
+HATCH_MIN_RUN = 2                 # ช่วงเส้นที่สั้นกว่านี้ (Pixel) ตัดทิ้ง
+
 # Preset Parameters: (Name, Blur, Block, C, Epsilon, MinArea)
 TEST_PARAMS = [
     ("Smart Hybrid (Fast)", 3, 9, 4, 0.0020, 50),
@@ -86,39 +95,6 @@ def load_calibration():
 
 PAPER_CORNERS = load_calibration()
 
-def find_dobot_port():
-    import serial.tools.list_ports
-    ports = serial.tools.list_ports.comports()
-    print("\n🔍 DEBUG: รายชื่อ Port ที่เจอ (Auto):")
-    for p in ports:
-        print(f"   - Device: {p.device}, Desc: {p.description}")
-        if not hasattr(p, 'description') or not hasattr(p, 'device'): continue
-        is_dobot = "USB" in p.description.upper() or \
-                   "SERIAL" in p.description.upper() or \
-                   "CH340" in p.description.upper() or \
-                   "CP210" in p.description.upper() or \
-                   "USB" in p.device.upper()
-        if is_dobot:
-            print(f" เลือกใช้ Port: {p.device}")
-            return p.device
-    print(" ไม่พบ Port ที่เข้าข่าย")
-    return None
-
-def safe_move(bot, x, y, z, r=0, wait=True):
-    for i in range(RETRY_ATTEMPTS):
-        try:
-            # For drawing operations, use wait=False to avoid blocking the thread too long
-            # This allows the Flask progress endpoint to respond
-            if not wait and i == 0:
-                bot.move_to(x, y, z, r, wait=False)
-                return True
-            else:
-                bot.move_to(x, y, z, r, wait=wait)
-                return True
-        except Exception:
-            time.sleep(0.1)
-    return False
-
 def get_next_experiment_dir():
     os.makedirs(OUTPUT_DIR_BASE, exist_ok=True)
     existing_dirs = glob.glob(os.path.join(OUTPUT_DIR_BASE, f'{EXP_PREFIX}[0-9]*'))
@@ -205,6 +181,90 @@ def generate_concentric_fill(binary_mask, step_size=FILL_DENSITY):
         loop_count += 1
     return fill_contours
 
+def _scanline_runs(rows_mask, min_run=HATCH_MIN_RUN):
+    """หาช่วง (start, end) ของทุกแถวพร้อมกันแบบ Vectorized -> (row_idx, x0, x1)"""
+    padded = np.pad(rows_mask.astype(np.int8), ((0, 0), (1, 1)))
+    edges = np.diff(padded, axis=1)
+    start_r, start_c = np.nonzero(edges == 1)
+    _, end_c = np.nonzero(edges == -1)
+    end_c = end_c - 1
+    keep = (end_c - start_c + 1) >= min_run
+    return start_r[keep], start_c[keep], end_c[keep]
+
+def _segment_inside(mask, x0, y0, x1, y1):
+    """เช็คว่าเส้นเชื่อมระหว่างสองจุดอยู่ในพื้นที่ถมทั้งหมดหรือไม่ (กันปากกาลากออกนอกขอบ)"""
+    n = int(max(abs(x1 - x0), abs(y1 - y0))) + 1
+    xs = np.rint(np.linspace(x0, x1, n)).astype(np.intp)
+    ys = np.rint(np.linspace(y0, y1, n)).astype(np.intp)
+    return bool(np.all(mask[ys, xs]))
+
+def generate_hatch_fill(binary_mask, angle=HATCH_ANGLE, spacing=HATCH_SPACING):
+    """
+    ถมดำแบบ Hatch (ซิกแซก): ตัดเส้นขนานตาม angle ให้อยู่ใน mask
+    แล้วต่อช่วงของแถวที่ติดกันเป็นเส้นเดียว (Boustrophedon) เพื่อลดการยกปากกา
+    """
+    spacing = max(1, int(round(spacing)))
+    ys, xs = np.nonzero(binary_mask)
+    if len(xs) == 0: return []
+
+    # ตัดเฉพาะกรอบที่มีพื้นที่ถม แล้วหมุนให้เส้น hatch กลายเป็นแนวนอน
+    pad = 2
+    x_min, y_min = max(0, xs.min() - pad), max(0, ys.min() - pad)
+    x_max = min(binary_mask.shape[1], xs.max() + pad + 1)
+    y_max = min(binary_mask.shape[0], ys.max() + pad + 1)
+    crop = binary_mask[y_min:y_max, x_min:x_max]
+    h, w = crop.shape
+
+    M = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, 1.0)
+    cos_a, sin_a = abs(M[0, 0]), abs(M[0, 1])
+    rot_w = int(np.ceil(h * sin_a + w * cos_a))
+    rot_h = int(np.ceil(h * cos_a + w * sin_a))
+    M[0, 2] += rot_w / 2.0 - w / 2.0
+    M[1, 2] += rot_h / 2.0 - h / 2.0
+    rotated = cv2.warpAffine(crop, M, (rot_w, rot_h), flags=cv2.INTER_NEAREST) > 0
+    # เผื่อขอบ 1 Pixel ตอนเช็คเส้นเชื่อม (ขนาดหัวปากกากลบได้อยู่แล้ว)
+    connect_mask = cv2.dilate(rotated.astype(np.uint8), np.ones((3, 3), np.uint8)) > 0
+
+    # Scanline: เอาทุกๆ spacing แถว แล้วหาช่วงที่ตัดกับ mask พร้อมกันทีเดียว
+    row_ids, run_x0, run_x1 = _scanline_runs(rotated[::spacing])
+    if len(row_ids) == 0: return []
+
+    strokes = []  # แต่ละเส้น: {"points": [...], "row": แถวล่าสุด, "end": x ปลายเส้น}
+    open_strokes = []
+    for row in np.unique(row_ids):
+        sel = row_ids == row
+        y = row * spacing
+        extended = []
+        for x0, x1 in zip(run_x0[sel], run_x1[sel]):
+            target = None
+            for st in open_strokes:
+                if st["row"] != row - 1: continue  # ต่อได้เฉพาะเส้นจากแถวก่อนหน้าที่ยังไม่ถูกต่อ
+                # ต่อจากปลายด้านเดียวกัน ให้เส้นวิ่งกลับทิศ (ซิกแซก)
+                near = x1 if st["end"] == st["right"] else x0
+                far = x0 if near == x1 else x1
+                if _segment_inside(connect_mask, st["end"], y - spacing, near, y):
+                    target = st
+                    break
+            if target is None:
+                target = {"points": [], "row": row}
+                strokes.append(target)
+                near, far = x0, x1
+            target["points"].extend([(near, y), (far, y)])
+            target["row"] = row
+            target["end"] = far
+            target["right"] = x1
+            extended.append(target)
+        open_strokes = extended
+
+    # แปลงพิกัดกลับไปยังภาพเดิม
+    M_inv = cv2.invertAffineTransform(M)
+    fill_contours = []
+    for st in strokes:
+        pts = np.array(st["points"], dtype=np.float32).reshape(-1, 1, 2)
+        pts = cv2.transform(pts, M_inv) + np.float32([x_min, y_min])
+        fill_contours.append(np.rint(pts).astype(np.int32))
+    return fill_contours
+
 def sort_and_merge_contours(contours, threshold=MERGE_DISTANCE_THRESHOLD):
     """
     จัดลำดับและเชื่อมเส้น (Optimization)
@@ -256,72 +316,140 @@ def sort_and_merge_contours(contours, threshold=MERGE_DISTANCE_THRESHOLD):
 
 # --- ⭐️ LOGIC หลัก (สูตร Fast + High Quality) ⭐️ ---
 # ปรับปรุงให้รับพารามิเตอร์ปรับแต่งได้
-def process_and_draw_contours(img_gray, blur_ksize, thresh_blocksize, thresh_c, epsilon_factor, min_contour_area, merge_threshold=MERGE_DISTANCE_THRESHOLD):
+def _no_stage(name):
+    return nullcontext()
+
+def process_and_draw_contours(img_gray, blur_ksize, thresh_blocksize, thresh_c, epsilon_factor, min_contour_area, merge_threshold=MERGE_DISTANCE_THRESHOLD,
+                              fill_mode=FILL_MODE, hatch_angle=HATCH_ANGLE, hatch_spacing=HATCH_SPACING, stage_hook=None):
+    # stage_hook(name) -> context manager ครอบแต่ละขั้นตอน (ใช้จับเวลา/หน่วยความจำ เช่น benchmark)
+    stage = stage_hook or _no_stage
     
     # 1. เร่ง Contrast (CLAHE)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-    img_enhanced = clahe.apply(img_gray)
+    with stage('clahe'):
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+        img_enhanced = clahe.apply(img_gray)
 
     # 2. Blur
-    if blur_ksize % 2 == 0: blur_ksize += 1
-    img_blurred = cv2.GaussianBlur(img_enhanced, (blur_ksize, blur_ksize), 0)
+    with stage('blur'):
+        if blur_ksize % 2 == 0: blur_ksize += 1
+        img_blurred = cv2.GaussianBlur(img_enhanced, (blur_ksize, blur_ksize), 0)
     
     # 3. Adaptive Threshold
-    if thresh_blocksize % 2 == 0: thresh_blocksize += 1
-    if thresh_blocksize < 3: thresh_blocksize = 3
-    thresh = cv2.adaptiveThreshold(
-        img_blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-        cv2.THRESH_BINARY_INV, thresh_blocksize, thresh_c
-    )
-    
-    # 4. แยกเลเยอร์ (เตรียมข้อมูล)
-    kernel_dilate = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3,3))
-    thresh_filled = cv2.dilate(thresh, kernel_dilate, iterations=1)
+    with stage('threshold'):
+        if thresh_blocksize % 2 == 0: thresh_blocksize += 1
+        if thresh_blocksize < 3: thresh_blocksize = 3
+        thresh = cv2.adaptiveThreshold(
+            img_blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+            cv2.THRESH_BINARY_INV, thresh_blocksize, thresh_c
+        )
+        
+        # 4. แยกเลเยอร์ (เตรียมข้อมูล)
+        kernel_dilate = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3,3))
+        thresh_filled = cv2.dilate(thresh, kernel_dilate, iterations=1)
     
     final_contours = []
     
     # --- Layer A: Body (Skeletonize -> เส้นเดียว) ---
-    body_skeleton = skeletonize(thresh_filled)
-    body_contours, _ = cv2.findContours(body_skeleton, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
-    
-    for cnt in body_contours:
-        area = cv2.contourArea(cnt)
-        length = cv2.arcLength(cnt, False)
-        # กรองเส้นขยะที่เล็กมากๆ ทิ้งไป (ใช้ min_contour_area ที่รับมา)
-        if length > 25 or area > min_contour_area:
-            # ใช้ epsilon_factor ที่รับมา
-            approx = cv2.approxPolyDP(cnt, epsilon_factor * length, False)
-            final_contours.append(approx)
+    with stage('skeletonize'):
+        body_skeleton = skeletonize(thresh_filled)
+    with stage('body_contours'):
+        body_contours, _ = cv2.findContours(body_skeleton, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        
+        for cnt in body_contours:
+            area = cv2.contourArea(cnt)
+            length = cv2.arcLength(cnt, False)
+            # กรองเส้นขยะที่เล็กมากๆ ทิ้งไป (ใช้ min_contour_area ที่รับมา)
+            if length > 25 or area > min_contour_area:
+                # ใช้ epsilon_factor ที่รับมา
+                approx = cv2.approxPolyDP(cnt, epsilon_factor * length, False)
+                final_contours.append(approx)
 
     # --- Layer B: Eyes/Details (Fill -> ถมดำ) ---
-    _, mask_details = cv2.threshold(img_blurred, 90, 255, cv2.THRESH_BINARY_INV)
-    mask_details = cv2.morphologyEx(mask_details, cv2.MORPH_OPEN, np.ones((2,2), np.uint8)) 
-    
-    detail_contours, _ = cv2.findContours(mask_details, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    mask_eyes_fill = np.zeros_like(thresh)
-    
-    for cnt in detail_contours:
-        area = cv2.contourArea(cnt)
-        # กรองเฉพาะตา/จมูก
-        if 15 < area < EYE_AREA_MAX_THRESHOLD:
-            cv2.drawContours(mask_eyes_fill, [cnt], -1, 255, -1)
+    with stage('detail_mask'):
+        _, mask_details = cv2.threshold(img_blurred, 90, 255, cv2.THRESH_BINARY_INV)
+        mask_details = cv2.morphologyEx(mask_details, cv2.MORPH_OPEN, np.ones((2,2), np.uint8)) 
+        
+        detail_contours, _ = cv2.findContours(mask_details, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        mask_eyes_fill = np.zeros_like(thresh)
+        
+        # โหมด hatch ถมพื้นที่มืดขนาดใหญ่ได้ด้วย (ไม่จำกัดแค่ตา/จมูก)
+        fill_area_max = HATCH_AREA_MAX_THRESHOLD if fill_mode == 'hatch' else EYE_AREA_MAX_THRESHOLD
+        for cnt in detail_contours:
+            area = cv2.contourArea(cnt)
+            # กรองเฉพาะตา/จมูก
+            if 15 < area < fill_area_max:
+                cv2.drawContours(mask_eyes_fill, [cnt], -1, 255, -1)
     
-    # ถมดำแบบเร็ว (FILL_DENSITY = 3)
-    eye_fill_lines = generate_concentric_fill(mask_eyes_fill, step_size=FILL_DENSITY)
-    final_contours.extend(eye_fill_lines)
+    with stage('fill'):
+        if fill_mode == 'hatch':
+            eye_fill_lines = generate_hatch_fill(mask_eyes_fill, angle=hatch_angle, spacing=hatch_spacing)
+        else:
+            # ถมดำแบบเร็ว (FILL_DENSITY = 3)
+            eye_fill_lines = generate_concentric_fill(mask_eyes_fill, step_size=FILL_DENSITY)
+        final_contours.extend(eye_fill_lines)
 
     # 5. Optimize (รวมเส้น + เรียงลำดับ + ทำให้เส้นตรง)
     # ส่ง merge_threshold ที่รับมาไปใช้
-    optimized_contours = sort_and_merge_contours(final_contours, threshold=merge_threshold)
-    
-    preview_img_bgr = cv2.cvtColor(img_gray, cv2.COLOR_GRAY2BGR)
-    cv2.drawContours(preview_img_bgr, optimized_contours, -1, (0, 0, 255), 1)
+    with stage('sort_merge'):
+        optimized_contours = sort_and_merge_contours(final_contours, threshold=merge_threshold)
     
-    total_len_pixel = sum([cv2.arcLength(c, False) for c in optimized_contours])
+    with stage('preview'):
+        preview_img_bgr = cv2.cvtColor(img_gray, cv2.COLOR_GRAY2BGR)
+        cv2.drawContours(preview_img_bgr, optimized_contours, -1, (0, 0, 255), 1)
+        
+        total_len_pixel = sum([cv2.arcLength(c, False) for c in optimized_contours])
 
     return preview_img_bgr, optimized_contours, total_len_pixel
 
-def visualize_parameters(original_img_color, original_img_gray, test_params, output_dir):
+# --- ตัววัดผลแผนการวาด (ใช้ใน benchmark / ประมาณเวลา) ---
+
+# ค่าประมาณสำหรับทำนายเวลาวาด
+EST_DRAW_SPEED_MM_S = 80.0     # ความเร็วปลายปากกาเฉลี่ยตอนวาดจริง (mm/s)
+EST_TRAVEL_SPEED_MM_S = 150.0  # ความเร็วตอนยกปากกาเดินทาง (mm/s)
+EST_CMD_OVERHEAD_S = COMMAND_OVERHEAD_S.get(TRANSPORT, COMMAND_OVERHEAD_S['pydobot'])  # ตาม DOBOT_TRANSPORT ที่ใช้อยู่
+EST_PEN_LIFT_S = 0.6           # เวลายก/จรดปากกาต่อหนึ่งเส้น
+
+def compute_plan_metrics(contours, img_shape, paper_corners=None):
+    """
+    สรุปตัวชี้วัดของแผนการวาด: จำนวนเส้น, ความยาว (px/mm), ระยะยกปากกา และเวลาวาดที่คาดการณ์
+    """
+    if paper_corners is None: paper_corners = PAPER_CORNERS
+    img_h, img_w = img_shape[:2]
+    img_corners = np.float32([[0, 0], [img_w-1, 0], [img_w-1, img_h-1], [0, img_h-1]])
+    M = cv2.getPerspectiveTransform(img_corners, np.float32(paper_corners))
+
+    total_px = 0.0; total_mm = 0.0
+    pen_up_px = 0.0; pen_up_mm = 0.0
+    n_points = 0
+    prev_end_px = None; prev_end_mm = None
+    for cnt in contours:
+        pts = np.asarray(cnt, dtype=np.float32).reshape(-1, 2)
+        if len(pts) == 0: continue
+        pts_mm = cv2.perspectiveTransform(pts.reshape(-1, 1, 2), M).reshape(-1, 2)
+        total_px += float(np.sum(np.linalg.norm(np.diff(pts, axis=0), axis=1)))
+        total_mm += float(np.sum(np.linalg.norm(np.diff(pts_mm, axis=0), axis=1)))
+        if prev_end_px is not None:
+            pen_up_px += float(np.linalg.norm(pts[0] - prev_end_px))
+            pen_up_mm += float(np.linalg.norm(pts_mm[0] - prev_end_mm))
+        prev_end_px, prev_end_mm = pts[-1], pts_mm[-1]
+        n_points += len(pts)
+
+    n_contours = len(contours)
+    predicted_s = (total_mm / EST_DRAW_SPEED_MM_S
+                   + pen_up_mm / EST_TRAVEL_SPEED_MM_S
+                   + n_points * EST_CMD_OVERHEAD_S
+                   + n_contours * EST_PEN_LIFT_S)
+    return {
+        "contour_count": n_contours,
+        "point_count": n_points,
+        "total_length_px": round(total_px, 2),
+        "total_length_mm": round(total_mm, 2),
+        "pen_up_distance_px": round(pen_up_px, 2),
+        "pen_up_distance_mm": round(pen_up_mm, 2),
+        "predicted_draw_time_s": round(predicted_s, 2),
+    }
+
+def visualize_parameters(original_img_color, original_img_gray, test_params, output_dir, stage_hook=None):
     fig, axs = plt.subplots(3, 2, figsize=(8.27, 11.69)) 
     axs = axs.flatten()
     axs[0].imshow(cv2.cvtColor(original_img_color, cv2.COLOR_BGR2RGB))
@@ -332,7 +460,7 @@ def visualize_parameters(original_img_color, original_img_gray, test_params, out
     for i, (name, blur, block, c, eps, min_area) in enumerate(all_test_params, start=1):
         if i >= len(axs): break
         processed_img_bgr, _, _ = process_and_draw_contours(
-            original_img_gray.copy(), blur, block, c, eps, min_area
+            original_img_gray.copy(), blur, block, c, eps, min_area, stage_hook=stage_hook
         )
         axs[i].imshow(cv2.cvtColor(processed_img_bgr, cv2.COLOR_BGR2RGB))
         axs[i].set_title(f"{i+1}. {name}", fontsize=8)
@@ -341,6 +469,12 @@ def visualize_parameters(original_img_color, original_img_gray, test_params, out
     for i in range(len(all_test_params) + 1, len(axs)): fig.delaxes(axs[i])
     plt.tight_layout(rect=[0, 0.03, 1, 0.97])
     plt.suptitle("Dobot Drawing Parameter Comparison", fontsize=16, fontweight='bold')
+    if output_dir is None:
+        # คืนเป็น bytes (JPEG) ให้ผู้เรียกจัดการบันทึกเอง
+        buffer = io.BytesIO()
+        plt.savefig(buffer, format='jpg', dpi=200)
+        plt.close(fig)
+        return buffer.getvalue()
     output_filename = os.path.join(output_dir, "parameter_comparison.jpg")
     plt.savefig(output_filename, dpi=200) 
     plt.close(fig) 
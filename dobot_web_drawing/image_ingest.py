@@ -0,0 +1,210 @@
+# image_ingest.py
+# รับภาพจาก Request แบบถอดรหัสครั้งเดียว แล้วส่งต่อเป็น Array ในหน่วยความจำ
+#
+# - decode_upload(): อ่าน bytes จาก stream ครั้งเดียว -> cv2.imdecode (ไม่เขียนไฟล์ก่อน)
+# - ArtifactStore: เขียนไฟล์ลงดิสก์แบบ Background (ปิดได้) + เก็บ bytes ล่าสุดไว้ส่งให้ Browser
+# - Cartoonizer: โหลด GAN ครั้งเดียวใน Process แล้วแปลงภาพจาก Array -> Array
+import mimetypes
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# ปิดการเขียนไฟล์ได้ด้วย DOBOT_PERSIST_ARTIFACTS=0 (ใช้ได้เฉพาะโหมด Process เดียว)
+PERSIST_ARTIFACTS = os.environ.get('DOBOT_PERSIST_ARTIFACTS', '1') != '0'
+ARTIFACT_CACHE_MAX = 32         # จำนวนไฟล์ล่าสุดที่เก็บ bytes ไว้ในหน่วยความจำ
+ARTIFACT_WAIT_TIMEOUT = 10.0    # รอไฟล์ที่กำลังเขียน/เข้ารหัสได้นานสุด (วินาที)
+JPEG_QUALITY = 95
+
+
+class IngestError(ValueError):
+    pass
+
+
+def decode_upload(file_storage):
+    """
+    อ่านไฟล์ที่อัปโหลดจาก stream ครั้งเดียว
+    คืน (ภาพ BGR, bytes ต้นฉบับ) -> bytes ใช้บันทึกไฟล์ได้ทันทีโดยไม่ต้องเข้ารหัสใหม่
+    """
+    raw = file_storage.stream.read()
+    if not raw:
+        raise IngestError("Empty upload")
+    img = cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise IngestError(f"Could not decode image: {file_storage.filename}")
+    return img, raw
+
+
+class ArtifactStore:
+    """
+    ที่เก็บไฟล์ผลลัพธ์ (ภาพต้นฉบับ, line-art, ภาพเปรียบเทียบ ฯลฯ)
+    งานเข้ารหัส/เขียนดิสก์ทำใน Thread เดียวแยกจาก Request
+    ส่วน Browser ขอไฟล์ผ่าน get() ซึ่งรอจนงานของไฟล์นั้นเสร็จก่อน
+    """
+
+    def __init__(self, persist=PERSIST_ARTIFACTS, cache_max=ARTIFACT_CACHE_MAX):
+        self.persist = persist
+        self.cache_max = cache_max
+        self._cache = OrderedDict()   # path -> bytes
+        self._pending = {}            # path -> threading.Event
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, name='artifact-writer', daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _key(path):
+        return os.path.normpath(path).replace(os.path.sep, '/')
+
+    def _remember(self, key, data):
+        with self._lock:
+            self._cache[key] = data
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_max:
+                self._cache.popitem(last=False)
+
+    def _mark_pending(self, key):
+        with self._lock:
+            event = self._pending.get(key)
+            if event is None or event.is_set():
+                event = self._pending[key] = threading.Event()
+            return event
+
+    def put_bytes(self, path, data, persist=None):
+        """ไฟล์ที่เข้ารหัสแล้ว (เช่น bytes ที่อัปโหลดมา) -> เก็บทันที เขียนดิสก์ทีหลัง"""
+        key = self._key(path)
+        self._remember(key, data)
+        if persist is None: persist = self.persist
+        if persist:
+            self._announce(path)
+            self._queue.put((key, path, None, data, self._mark_pending(key), True))
+
+    def put_image(self, path, img, params=None):
+        """ภาพ Array -> เข้ารหัส (ตามนามสกุลไฟล์) และเขียนดิสก์ใน Background"""
+        key = self._key(path)
+        if params is None and path.lower().endswith(('.jpg', '.jpeg')):
+            params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
+        encode = lambda: cv2.imencode(os.path.splitext(path)[1], img, params or [])[1].tobytes()
+        if self.persist:
+            self._announce(path)
+        self._queue.put((key, path, encode, None, self._mark_pending(key), self.persist))
+
+    @staticmethod
+    def _announce(path):
+        """สร้างไฟล์ .tmp ว่างไว้ก่อนเข้ารหัส: Worker อื่นที่ถูกขอ path นี้จะรู้ว่ากำลังจะมีไฟล์และรอได้"""
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            open(path + '.tmp', 'ab').close()
+        except OSError:
+            pass
+
+    def defer(self, fn, *args, **kwargs):
+        """งานเขียนไฟล์อื่นๆ ที่ไม่ต้องรอ (เช่น all_steps previews)"""
+        if self.persist:
+            self._queue.put((None, None, lambda: fn(*args, **kwargs), None, None, True))
+
+    def get(self, path, timeout=ARTIFACT_WAIT_TIMEOUT):
+        """คืน bytes ของไฟล์ (รอถ้ากำลังเข้ารหัส/เขียนอยู่) หรือ None ถ้าไม่มีใน Store"""
+        key = self._key(path)
+        with self._lock:
+            event = self._pending.get(key)
+        if event is not None:
+            event.wait(timeout)
+        with self._lock:
+            data = self._cache.get(key)
+        if data is None and self.persist:
+            # ไฟล์อาจถูกเขียนโดย Worker อื่น: รอเฉพาะตอนที่ไฟล์ .tmp ของมันยังอยู่ (ประกาศไว้/กำลังเขียน)
+            # path ที่ไม่มีใครเขียน (URL เก่า/พิมพ์ผิด) -> None ทันที ไม่กั้น Worker ไว้จนหมดเวลา
+            tmp_path = path + '.tmp'
+            deadline = time.time() + timeout
+            while os.path.exists(tmp_path) and not os.path.exists(path) and time.time() < deadline:
+                time.sleep(0.05)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                pass
+        return data
+
+    def flush(self, timeout=None):
+        """รอให้งานที่ค้างในคิวเขียนเสร็จ (ใช้ตอนปิดโปรแกรม/benchmark)"""
+        done = threading.Event()
+        self._queue.put((None, None, None, None, done, False))
+        return done.wait(timeout)
+
+    def _worker(self):
+        while True:
+            key, path, encode, data, event, persist = self._queue.get()
+            try:
+                if key is None:
+                    if encode is not None: encode()
+                    continue
+                if encode is not None:
+                    data = encode()
+                    self._remember(key, data)
+                if persist:
+                    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                    tmp_path = path + '.tmp'
+                    with open(tmp_path, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmp_path, path)
+            except Exception as e:
+                print(f" ⚠️ Artifact write failed ({path}): {e}")
+                if path is not None and persist:
+                    try: os.remove(path + '.tmp')      # ไม่ให้ Worker อื่นรอไฟล์ที่จะไม่มีวันมา
+                    except OSError: pass
+            finally:
+                if event is not None: event.set()
+
+    @staticmethod
+    def mimetype(path):
+        return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+class Cartoonizer:
+    """
+    GAN (P2LDGAN) แบบโหลดครั้งเดียวใน Process นี้
+    ถ้าไม่มี torch หรือไฟล์โมเดล -> available() เป็น False ให้ app ใช้ Subprocess แบบเดิม
+    """
+
+    def __init__(self, script_dir):
+        self.script_dir = script_dir
+        self._lock = threading.Lock()
+        self._engine = None
+        self._generator = None
+        self._device = None
+        self._load_error = None
+
+    def _load(self):
+        if self._generator is not None or self._load_error is not None: return
+        try:
+            if self.script_dir not in sys.path:
+                sys.path.append(self.script_dir)
+            import draw_cartoon_df as engine
+            self._device = engine.get_device()
+            self._generator = engine.load_generator(device=self._device)
+            self._engine = engine
+            print(f" 🎨 Cartoon GAN loaded in-process ({self._device})")
+        except Exception as e:
+            self._load_error = e
+            print(f" ⚠️ โหลด GAN ใน Process ไม่ได้ ({e}) ใช้ Subprocess แทน")
+
+    def available(self):
+        with self._lock:
+            self._load()
+            return self._generator is not None
+
+    def run(self, img_bgr):
+        """ภาพ BGR -> ภาพ line-art BGR (ขนาดตามโมเดล 256x256)"""
+        with self._lock:  # GPU/CPU ทีละงาน
+            self._load()
+            if self._generator is None:
+                raise RuntimeError(f"Cartoon GAN not available: {self._load_error}")
+            rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+            out_rgb = self._engine.cartoonize_array(self._generator, rgb, self._device)
+        return cv2.cvtColor(out_rgb, cv2.COLOR_RGB2BGR)
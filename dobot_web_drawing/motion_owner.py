@@ -0,0 +1,368 @@
+# motion_owner.py
+# เจ้าของแขนกล (Motion Owner): ถือ Serial ของ Dobot, Thread การวาด และสถานะงานปัจจุบัน
+#
+# - โหมดพัฒนา (python app.py): สร้าง MotionOwner ใน Process เดียวกับ Flask
+# - โหมด Production (python serve.py): รันเป็น Process แยก 1 ตัว แล้ว Worker ทุกตัว
+#   คุยผ่าน multiprocessing.managers (localhost) -> Serial มีเจ้าของเดียวเสมอ
+import os
+import sys
+import time
+import threading
+from threading import Lock
+from multiprocessing.managers import BaseManager
+
+import dobot_drawing_logic as ddl
+from dobot_drawing_logic import DOBOT_SPEED, DOBOT_ACCELERATION
+import telemetry
+
+# ไลบรารีกลางของ repo (หา Port / ต่อ Dobot / คิวคำสั่ง + retry / ใช้แขนร่วมกับแอปอื่นผ่าน arm server)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dobot_common.arm_server import PRIORITY_BACKGROUND, open_arm
+from dobot_common.device import DobotNotFound
+
+MOTION_OWNER_HOST = '127.0.0.1'
+MOTION_OWNER_PORT = int(os.environ.get('DOBOT_MOTION_OWNER_PORT', 5002))
+MOTION_OWNER_AUTHKEY = os.environ.get('DOBOT_MOTION_OWNER_AUTHKEY', 'dobot-drawing').encode()
+
+
+class MotionOwner:
+    """ทุกอย่างที่แตะ Dobot หรือสถานะที่ต้องแชร์ระหว่าง Worker อยู่ในคลาสนี้"""
+
+    def __init__(self):
+        self.bot = None
+        self.drawing_thread = None
+        self.state_lock = Lock()  # Thread lock for drawing state
+        self.drawing_state = {
+            "status": "idle",
+            "message": "Disconnected",
+            "progress": 0,
+            "progress_image_url": "",
+            "profile_url": "",
+            "stop_flag": False
+        }
+        self.job_lock = Lock()
+        self.job = {
+            "current_run_dir": None,
+            "all_steps_dir": None,
+            "bw_image_path": None,
+            "img_gray_resized": None,
+            "filtered_contours": None,
+            "processed_paths": None,
+            "contour_lengths": None,
+            "total_contours": 0,
+            "original_image_name": None,
+            "gan_started_at": None,
+            "gan_result": None,
+            "gan_error": None,
+            "last_result": None
+        }
+
+    # ----------------- Job store (แชร์ระหว่าง Worker) -----------------
+
+    def get_job(self, *keys):
+        with self.job_lock:
+            if not keys: return dict(self.job)
+            return {k: self.job.get(k) for k in keys}
+
+    def update_job(self, **fields):
+        with self.job_lock:
+            self.job.update(fields)
+
+    def take_job(self, key):
+        """อ่านแล้วล้างค่า (atomic) -> มีแค่ Worker เดียวที่ได้ผลลัพธ์ไปประมวลผลต่อ"""
+        with self.job_lock:
+            value = self.job.get(key)
+            self.job[key] = None
+            return value
+
+    def set_status(self, status=None, message=None):
+        with self.state_lock:
+            if status is not None: self.drawing_state["status"] = status
+            if message is not None: self.drawing_state["message"] = message
+
+    def progress(self):
+        with self.state_lock:
+            return self.drawing_state.copy()  # Return copy to prevent modification
+
+    def metrics(self):
+        return telemetry.snapshot()
+
+    def reset_metrics(self):
+        telemetry.reset()
+
+    # ----------------- Dobot -----------------
+
+    def connect(self):
+        """คืนค่า (payload, http_status) ให้ route ส่งต่อได้ทันที"""
+        if self.bot: return {"status": "success", "message": "Already connected", "port": self.bot.port, "model": "Dobot Magician"}, 200
+        try:
+            # งานวาดยาวหลายนาที -> priority ต่ำ (คนควบคุมจากหน้าเว็บ dobt_move_web แย่งแขนได้)
+            self.bot = open_arm("drawing", PRIORITY_BACKGROUND, verbose=True)
+            self.bot.speed(DOBOT_SPEED, DOBOT_ACCELERATION)
+            self.set_status("idle", "Connected")
+            print(f" Dobot connected at {self.bot.port}")
+            return {"status": "success", "message": "Connected", "port": self.bot.port, "model": "Dobot Magician"}, 200
+        except DobotNotFound:
+            self.set_status(message="Dobot not found")
+            return {"status": "error", "message": "Dobot not found. Check connection."}, 404
+        except Exception as e:
+            self.set_status(message=f"Connection failed: {e}")
+            return {"status": "error", "message": str(e)}, 500
+
+    def disconnect(self):
+        if self.bot:
+            try: self.bot.close()
+            except Exception as e: print(f" Error closing dobot: {e}")
+            self.bot = None
+        self.set_status("idle", "Disconnected")
+        return {"status": "success", "message": "Disconnected"}, 200
+
+    def is_connected(self):
+        return self.bot is not None
+
+    def get_position(self):
+        if not self.bot: return {"status": "error", "message": "Dobot not connected"}, 400
+        try:
+            pose = self.bot.pose()
+            return {"status": "success", "x": round(pose[0], 2), "y": round(pose[1], 2)}, 200
+        except Exception as e: return {"status": "error", "message": str(e)}, 500
+
+    # ----------------- การวาด -----------------
+
+    def start_drawing(self, start_contour, speed_percent, pen_offset, safety_height, profile_kind=None):
+        if not self.bot:
+            return {"status": "error", "message": "Dobot not connected"}, 400
+        if self.drawing_thread and self.drawing_thread.is_alive():
+            return {"status": "error", "message": "Already drawing"}, 400
+        job = self.get_job("processed_paths", "total_contours")
+        if not job["processed_paths"]:
+            return {"status": "error", "message": "No paths generated. Please select parameters first."}, 400
+        try:
+            if not (1 <= start_contour <= job["total_contours"]):
+                raise ValueError(f"Start contour must be between 1 and {job['total_contours']}")
+            dobot_speed_val = (speed_percent / 100.0) * DOBOT_SPEED
+            dobot_accel_val = (speed_percent / 100.0) * DOBOT_ACCELERATION
+            dobot_speed_val = max(100, min(dobot_speed_val, DOBOT_SPEED))
+            dobot_accel_val = max(100, min(dobot_accel_val, DOBOT_ACCELERATION))
+            self.bot.speed(dobot_speed_val, dobot_accel_val)
+
+            # ใช้ค่าจาก ddl.PEN_DOWN_Z (ล่าสุด)
+            pen_down_z = ddl.PEN_DOWN_Z + pen_offset
+            if safety_height is None: safety_height = 20.0
+            pen_up_z = safety_height
+
+            current_paper_corners = ddl.load_calibration()
+            home_x, home_y = current_paper_corners[0]
+            print(f"Starting drawing... Speed: {speed_percent}% ({dobot_speed_val:.0f}), Start: #{start_contour}")
+
+            print(f"--- Z-HEIGHT DEBUG ---")
+            print(f"  Base PEN_DOWN_Z (from Logic): {ddl.PEN_DOWN_Z}")
+            print(f"  Offset (from Web): {pen_offset}")
+            print(f"  Final Z: {pen_down_z}")
+            print(f"----------------------")
+
+            self.drawing_state["profile_url"] = ""
+            self.drawing_thread = threading.Thread(
+                target=self._run_drawing_thread,
+                args=(profile_kind, start_contour, pen_down_z, pen_up_z, home_x, home_y)
+            )
+            self.drawing_thread.start()
+            return {"status": "success", "message": "Drawing started..."}, 200
+        except Exception as e:
+            return {"status": "error", "message": str(e)}, 400
+
+    def pause(self):
+        if self.drawing_thread and self.drawing_thread.is_alive() and self.drawing_state["status"] == "drawing":
+            self.set_status("paused", "Paused")
+            print("Drawing paused")
+        return {"status": "success", "message": "Paused"}, 200
+
+    def resume(self):
+        if self.drawing_thread and self.drawing_thread.is_alive() and self.drawing_state["status"] == "paused":
+            self.set_status("drawing", "Resuming...")
+            print("Drawing resumed")
+        return {"status": "success", "message": "Resumed"}, 200
+
+    def stop(self):
+        self.drawing_state["stop_flag"] = True
+        if self.drawing_state["status"] == "paused":
+            self.drawing_state["status"] = "drawing"
+        print("Stop signal sent.")
+        return {"status": "success", "message": "Stop signal sent"}, 200
+
+    def _run_drawing_thread(self, profile_kind, *args):
+        """รัน _drawing_task (ถ้าขอ profile ให้รันใต้ profiler แล้วแนบผลใน progress)"""
+        if profile_kind is None:
+            self._drawing_task(*args)
+            return
+        _, report_path = telemetry.run_profiled(profile_kind, 'drawing', self._drawing_task, *args)
+        print(f" 🔬 Profile ({profile_kind}) drawing: {report_path}")
+        self.drawing_state["profile_url"] = report_path.replace(os.path.sep, '/')
+
+    def _drawing_task(self, start_contour_index, pen_down_z, pen_up_z, home_x, home_y):
+        bot = self.bot
+        drawing_state = self.drawing_state
+        try:
+            with self.state_lock:
+                drawing_state["status"] = "drawing"
+                drawing_state["message"] = "Initializing..."
+                drawing_state["progress"] = 0
+                drawing_state["stop_flag"] = False
+            job = self.get_job()
+            base_bgr = ddl.cv2.cvtColor(job["img_gray_resized"], ddl.cv2.COLOR_GRAY2BGR)
+            current_run_dir = job["current_run_dir"]
+            run_dir_basename = os.path.basename(current_run_dir)
+
+            contours_to_draw = list(job["filtered_contours"])
+            paths_to_draw = list(job["processed_paths"])
+            lengths_to_draw = list(job["contour_lengths"])
+            total_contours = len(paths_to_draw)
+            total_length_to_draw = sum(lengths_to_draw)
+            start_index = start_contour_index - 1
+            if start_index != 0:
+                print(f" Re-ordering drawing. Starting at {start_contour_index}")
+                contours_to_draw = contours_to_draw[start_index:] + contours_to_draw[:start_index]
+                paths_to_draw = paths_to_draw[start_index:] + paths_to_draw[:start_index]
+                lengths_to_draw = lengths_to_draw[start_index:] + lengths_to_draw[:start_index]
+                original_indices = list(range(start_index, total_contours)) + list(range(0, start_index))
+            else:
+                original_indices = list(range(total_contours))
+            bot.move_to(home_x, home_y, pen_up_z, wait=True)
+            start_time = time.time()
+            current_length_drawn = 0
+
+            progress_img_path = os.path.join(current_run_dir, "current_progress_drawing.jpg")
+            progress_img_url_base = f"{ddl.OUTPUT_DIR_BASE}/{run_dir_basename}/current_progress_drawing.jpg".replace(os.path.sep, '/')
+
+            print(f" Start Drawing: {total_contours} contours, Total Length: {total_length_to_draw:.2f} mm")
+
+            for i in range(total_contours):
+                if drawing_state["stop_flag"]:
+                    drawing_state["message"] = "Drawing stopped"
+                    print(" Drawing interrupted by User.")
+                    break
+                while drawing_state["status"] == "paused":
+                    if drawing_state["stop_flag"]:
+                        break
+                    time.sleep(0.2)
+                if drawing_state["stop_flag"]:
+                    drawing_state["message"] = "Drawing stopped"
+                    break
+                pts_transformed = paths_to_draw[i]
+                if pts_transformed is None or len(pts_transformed) < 2:
+                    continue
+                ci_original = original_indices[i] + 1
+                ci_loop = i + 1
+
+                with telemetry.span('motion.progress_image'):
+                    ddl.update_current_progress_image(
+                        base_bgr, contours_to_draw, ci_loop, is_final=False,
+                        output_filename=progress_img_path
+                    )
+
+                drawing_state["progress_image_url"] = f"{progress_img_url_base}?t={time.time()}"
+
+                current_length_drawn += lengths_to_draw[i]
+                percent_done = (current_length_drawn / total_length_to_draw) * 100 if total_length_to_draw > 0 else 0
+                percent_done = float(round(percent_done, 1))
+                drawing_state["progress"] = percent_done
+                eta_display = ddl.get_eta_display(start_time, current_length_drawn, total_length_to_draw)
+                drawing_state["message"] = f"Drawing {ci_loop}/{total_contours} (Orig #{ci_original}) | {eta_display}"
+
+                elapsed_now = time.time() - start_time
+                print(f" [{elapsed_now:.1f}s] Drawing Contour {ci_loop}/{total_contours} (Len: {lengths_to_draw[i]:.1f}mm) | Total: {percent_done:.1f}% | {eta_display}")
+                sx, sy = pts_transformed[0][0]
+                with telemetry.span('motion.pen_travel'):
+                    bot.move_to(sx, sy, pen_up_z, wait=False)
+                    bot.move_to(sx, sy, pen_down_z, wait=True)
+                with telemetry.span('motion.stream_contour', points=len(pts_transformed)):
+                    # ส่งทั้งเส้นแบบ pipeline เท่าที่คิวของแขนว่าง แล้วรอจนวาดจบเส้น
+                    points = [(p[0][0], p[0][1], pen_down_z) for p in pts_transformed[1:]]
+                    if points:
+                        bot.queue_path(points)
+                        bot.wait_for()
+                x_last, y_last = points[-1][:2] if points else (sx, sy)
+                bot.move_to(x_last, y_last, pen_up_z, wait=False)
+
+            if drawing_state["stop_flag"]:
+                print("Drawing stopped by user.")
+                drawing_state["message"] = "Drawing stopped"
+                bot.halt()
+                time.sleep(0.5)
+                pose = bot.pose()
+                bot.move_to(pose[0], pose[1], pose[2] + 20, wait=True)
+            else:
+                end_time = time.time()
+                total_seconds = end_time - start_time
+                telemetry.record('motion.total', total_seconds, contours=total_contours)
+                hours = int(total_seconds // 3600)
+                minutes = int((total_seconds % 3600) // 60)
+                seconds = int(total_seconds % 60)
+
+                time_str = ""
+                if hours > 0: time_str += f"{hours}h "
+                if minutes > 0: time_str += f"{minutes}m "
+                time_str += f"{seconds}s"
+
+                print("\n" + "="*50)
+                print(f"Drawing Finished Successfully!")
+                print(f"Total Drawing Time: {time_str} ({total_seconds:.2f} seconds)")
+                print("="*50 + "\n")
+                drawing_state["message"] = "Drawing complete!"
+                drawing_state["progress"] = 100.0
+                ddl.update_current_progress_image(
+                    base_bgr, contours_to_draw, total_contours + 1, is_final=True,
+                    output_filename=progress_img_path
+                )
+                drawing_state["progress_image_url"] = f"{progress_img_url_base}?t={time.time()}"
+            bot.move_to(home_x, home_y, pen_up_z, wait=True)
+        except Exception as e:
+            print(f"ERROR in drawing thread: {e}")
+            drawing_state["status"] = "error"
+            drawing_state["message"] = f"Error: {e}"
+        finally:
+            if drawing_state["status"] != "error":
+                drawing_state["status"] = "idle"
+            drawing_state["stop_flag"] = False
+
+
+# ----------------- รันเป็น Process แยก (โหมด Production) -----------------
+
+_owner = None
+
+def _get_owner():
+    global _owner
+    if _owner is None:
+        _owner = MotionOwner()
+    return _owner
+
+
+class MotionOwnerManager(BaseManager):
+    pass
+
+
+def serve_forever(host=MOTION_OWNER_HOST, port=MOTION_OWNER_PORT):
+    """จุดเริ่มของ Process เจ้าของแขนกล (ถูกเรียกจาก serve.py)"""
+    MotionOwnerManager.register('MotionOwner', callable=_get_owner)
+    manager = MotionOwnerManager(address=(host, port), authkey=MOTION_OWNER_AUTHKEY)
+    server = manager.get_server()
+    print(f" 🦾 Motion owner (PID {os.getpid()}) listening on {host}:{port}")
+    server.serve_forever()
+
+
+def connect_remote(host=MOTION_OWNER_HOST, port=MOTION_OWNER_PORT, timeout=10.0):
+    """ต่อไปยัง Motion owner ที่รันอยู่ แล้วคืน Proxy ที่เรียก method ได้เหมือน MotionOwner"""
+    MotionOwnerManager.register('MotionOwner')
+    deadline = time.time() + timeout
+    while True:
+        try:
+            manager = MotionOwnerManager(address=(host, port), authkey=MOTION_OWNER_AUTHKEY)
+            manager.connect()
+            return manager.MotionOwner()
+        except (ConnectionRefusedError, OSError):
+            if time.time() > deadline: raise
+            time.sleep(0.2)
+
+
+if __name__ == '__main__':
+    serve_forever()
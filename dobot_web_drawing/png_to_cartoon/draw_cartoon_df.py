@@ -2,6 +2,7 @@ import matplotlib
 matplotlib.use('Agg')
 
 import cv2
+import numpy as np
 import torch
 from torchvision import transforms
 from PIL import Image
@@ -17,37 +18,59 @@ except ImportError:
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
     from models2.models import Generator
 
+#  แก้ไข path นี้ให้ตรงกับเครื่อง Server ของน้องโดย copy path มาเลย
+MODEL_PATH = r"/Users/pongsathon/Desktop/visionlab_dobot/Dobot_for_institution/dobot_web_drawing/png_to_cartoon/p2ldgan_generator_200.pth"
+OUTPUT_IMAGE_PATH = "/Users/pongsathon/Desktop/visionlab_dobot/Dobot_for_institution/dobot_web_drawing/png_to_cartoon/stitched_cartoon_512x512.jpg"
+
+# โมเดลต้องการ 256x256
+transform = transforms.Compose([
+    transforms.Resize((256, 256)),
+    transforms.ToTensor(),
+    transforms.Normalize([0.5]*3, [0.5]*3)
+])
+
+def get_device():
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+def load_generator(model_path=MODEL_PATH, device=None):
+    """สร้าง Generator และโหลด Checkpoint (เรียกครั้งเดียวแล้วใช้ซ้ำได้)"""
+    if device is None: device = get_device()
+    generator = Generator().to(device)
+    checkpoint = torch.load(model_path, map_location=device)
+    generator.load_state_dict(checkpoint)
+    generator.eval()
+    return generator
+
+def cartoonize_image(generator, input_img, device):
+    """PIL RGB -> PIL line-art (ไม่แตะดิสก์)"""
+    input_tensor = transform(input_img).unsqueeze(0).to(device)
+    with torch.no_grad():
+        output_tensor = generator(input_tensor)
+        # Denormalize
+        output_tensor = (output_tensor * 0.5 + 0.5).clamp(0, 1)
+    return transforms.ToPILImage()(output_tensor.squeeze().cpu())
+
+def cartoonize_array(generator, rgb_array, device):
+    """numpy RGB (H, W, 3) -> numpy RGB uint8 (ใช้จาก app.py แบบ in-process)"""
+    output_img = cartoonize_image(generator, Image.fromarray(rgb_array), device)
+    return np.array(output_img.convert("RGB"))
+
 def process_cartoon_gan(input_path, output_dir):
     """
     ฟังก์ชันหลัก: รับ input_path (เป็นไฟล์รูปเดียว หรือ โฟลเดอร์ก็ได้)
     และบันทึกผลลัพธ์ลงใน output_dir
     """
-    
-    # --- การตั้งค่าโมเดล (โหลดครั้งเดียว) ---
-    #  แก้ไข path นี้ให้ตรงกับเครื่อง Server ของน้องโดย copy path มาเลย
-    model_path = r"/Users/pongsathon/Desktop/visionlab_dobot/Dobot_for_institution/dobot_web_drawing/png_to_cartoon/p2ldgan_generator_200.pth"
-
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    device = get_device()
     print(f"[Cartoon] Using device: {device}")
 
     # 1. สร้าง Generator และโหลด Checkpoint
     try:
-        generator = Generator().to(device)
-        checkpoint = torch.load(model_path, map_location=device)
-        generator.load_state_dict(checkpoint)
-        generator.eval()
+        generator = load_generator(MODEL_PATH, device)
         print("[Cartoon] Loaded checkpoint successfully.")
     except Exception as e:
         print(f"[Cartoon] Error loading model: {e}")
         return
 
-    # 2. เตรียม Transformation
-    transform = transforms.Compose([
-        transforms.Resize((256, 256)),  # โมเดลต้องการ 256x256
-        transforms.ToTensor(),
-        transforms.Normalize([0.5]*3, [0.5]*3)
-    ])
-
     # 3. เตรียมโฟลเดอร์ Output
     os.makedirs(output_dir, exist_ok=True)
 
@@ -72,29 +95,15 @@ def process_cartoon_gan(input_path, output_dir):
         filename = os.path.basename(img_path)
         
         try:
-            # โหลดรูปภาพ
+            # โหลดรูปภาพ แล้ว Generate (Inference)
             input_img = Image.open(img_path).convert("RGB")
+            output_img = cartoonize_image(generator, input_img, device)
             
-            # แปลงเป็น Tensor
-            input_tensor = transform(input_img).unsqueeze(0).to(device)
-
-            # Generate (Inference)
-            with torch.no_grad():
-                output_tensor = generator(input_tensor)
-                # Denormalize
-                output_tensor = (output_tensor * 0.5 + 0.5).clamp(0, 1)
-
-            # แปลงกลับเป็นรูปภาพ
-            output_img = transforms.ToPILImage()(output_tensor.squeeze().cpu())
-            
-            # บันทึกไฟล์
-            # ตั้งชื่อไฟล์ใหม่ เช่น cartoon_inputname.jpg
-            output_filename = "/Users/pongsathon/Desktop/visionlab_dobot/Dobot_for_institution/dobot_web_drawing/png_to_cartoon/stitched_cartoon_512x512.jpg"
-            output_img.save(output_filename)
-            
-            
-            output_img.save(output_filename)
-            print(f"   Processed: {filename} -> {save_name}")
+            # บันทึกไฟล์ (app.py รอไฟล์นี้อยู่ -> เขียนไฟล์ชั่วคราวแล้วค่อยเปลี่ยนชื่อ ไม่ให้อ่านเจอไฟล์ครึ่งๆ)
+            tmp_filename = OUTPUT_IMAGE_PATH + ".tmp.jpg"
+            output_img.save(tmp_filename)
+            os.replace(tmp_filename, OUTPUT_IMAGE_PATH)
+            print(f"   Processed: {filename} -> {OUTPUT_IMAGE_PATH}")
             
         except Exception as e:
             print(f"❌ Error processing {filename}: {e}")
@@ -0,0 +1,173 @@
+# serve.py
+# รันเซิร์ฟเวอร์วาดรูปแบบ Production (หลาย Worker) แทน app.run() ของ Flask
+#
+# โครงสร้าง:
+#   Motion Owner (1 Process) -> ถือ Serial ของ Dobot + Thread การวาด + สถานะงาน
+#   Worker หลายตัว (gunicorn / waitress) -> รับ HTTP, ประมวลผลภาพ, สั่งแขนผ่าน Motion Owner
+#
+# การใช้งาน:
+#   python serve.py                          # 2 Worker x 4 Thread ที่ Port 5001
+#   python serve.py --workers 4 --threads 8
+#   DOBOT_DRAWING_PORT=8080 python serve.py
+import argparse
+import atexit
+import importlib.util
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+# ให้ Path สัมพัทธ์ (static/, templates/, dobot_calibration.json) ถูกเสมอ
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import motion_owner
+
+DEFAULT_PORT = int(os.environ.get('DOBOT_DRAWING_PORT', 5001))
+DEFAULT_WORKERS = 2
+DEFAULT_THREADS = 4
+PID_FILE = 'static/.dobot_server.pid'
+PORT_RELEASE_TIMEOUT = 5.0
+
+
+# ----------------- ตรวจ Port (ไม่ Kill โปรแกรมอื่น) -----------------
+
+def port_in_use(port, host='127.0.0.1'):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.settimeout(0.5)
+        return s.connect_ex((host, port)) == 0
+
+def _read_pid_file():
+    try:
+        with open(PID_FILE, 'r') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+def release_port(port):
+    """
+    ถ้า Port ถูกใช้อยู่: ปิดได้เฉพาะเซิร์ฟเวอร์ตัวเก่าของเราเอง (PID ใน PID_FILE)
+    ถ้าเป็นโปรแกรมอื่นให้แจ้งแล้วคืน False (ไม่ Kill ทิ้งแบบเดิม)
+    """
+    if not port_in_use(port):
+        print(f" Port {port} ว่างอยู่ เริ่มรันได้เลย")
+        return True
+
+    pid = _read_pid_file()
+    if pid and pid != os.getpid() and _pid_alive(pid) and os.name == 'posix':
+        print(f" เจอเซิร์ฟเวอร์ตัวเก่า (PID: {pid}) กำลังสั่งปิด...")
+        os.kill(pid, signal.SIGTERM)
+        deadline = time.time() + PORT_RELEASE_TIMEOUT
+        while time.time() < deadline:
+            if not port_in_use(port):
+                print(" ปิดเซิร์ฟเวอร์ตัวเก่าเรียบร้อยแล้ว")
+                return True
+            time.sleep(0.2)
+
+    print(f" ❌ Port {port} ถูกโปรแกรมอื่นใช้อยู่ (ไม่ใช่เซิร์ฟเวอร์นี้) - ปิดโปรแกรมนั้นเอง หรือตั้ง DOBOT_DRAWING_PORT")
+    return False
+
+def write_pid_file():
+    os.makedirs(os.path.dirname(PID_FILE), exist_ok=True)
+    with open(PID_FILE, 'w') as f:
+        f.write(str(os.getpid()))
+    my_pid = os.getpid()
+    def _cleanup():
+        if _read_pid_file() == my_pid:
+            try: os.remove(PID_FILE)
+            except OSError: pass
+    atexit.register(_cleanup)
+
+
+# ----------------- Motion Owner -----------------
+
+def start_motion_owner():
+    proc = multiprocessing.Process(target=motion_owner.serve_forever, name='dobot-motion-owner', daemon=True)
+    proc.start()
+    # รอจน Motion Owner รับการเชื่อมต่อได้ก่อนเปิด Worker
+    motion_owner.connect_remote()
+    print(f" 🤖 Motion Owner พร้อม (PID: {proc.pid}, {motion_owner.MOTION_OWNER_HOST}:{motion_owner.MOTION_OWNER_PORT})")
+    return proc
+
+
+# ----------------- HTTP Server -----------------
+
+def run_gunicorn(host, port, workers, threads):
+    from gunicorn.app.base import BaseApplication
+
+    class DrawingApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # ไม่ preload: แต่ละ Worker import app เอง แล้วต่อ Motion Owner ของตัวเอง
+            from app import app
+            return app
+
+    DrawingApplication({
+        'bind': f'{host}:{port}',
+        'workers': workers,
+        'worker_class': 'gthread',
+        'threads': threads,
+        'preload_app': False,
+        # /start_drawing ฯลฯ ตอบเร็ว แต่ /check_processing สร้างภาพเปรียบเทียบนานได้
+        'timeout': 300,
+    }).run()
+
+def run_waitress(host, port, threads):
+    # Windows ไม่มี fork -> ใช้ waitress (1 Process หลาย Thread)
+    from waitress import serve
+    from app import app
+    serve(app, host=host, port=port, threads=threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dobot Drawing Web Server (production)")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--threads', type=int, default=DEFAULT_THREADS)
+    parser.add_argument('--server', choices=('auto', 'gunicorn', 'waitress'), default='auto')
+    args = parser.parse_args()
+
+    if not release_port(args.port): sys.exit(1)
+
+    server = args.server
+    if server == 'auto':
+        has_gunicorn = importlib.util.find_spec('gunicorn') is not None
+        server = 'gunicorn' if has_gunicorn and os.name == 'posix' else 'waitress'
+
+    start_motion_owner()
+    os.environ['DOBOT_MOTION_OWNER'] = 'remote'
+    if server == 'gunicorn' and args.workers > 1:
+        # Browser อาจขอไฟล์จาก Worker ที่ไม่ได้สร้างไฟล์นั้น -> ต้องมีไฟล์บนดิสก์เสมอ
+        os.environ['DOBOT_PERSIST_ARTIFACTS'] = '1'
+    os.environ['DOBOT_DRAWING_PORT'] = str(args.port)
+    write_pid_file()
+
+    print("======================================================")
+    print(" Dobot Drawing Web Server (production)")
+    print(f" Server: {server}  Workers: {args.workers if server == 'gunicorn' else 1}  Threads: {args.threads}")
+    print(f" Local: http://127.0.0.1:{args.port}")
+    print("======================================================")
+    if server == 'gunicorn':
+        run_gunicorn(args.host, args.port, args.workers, args.threads)
+    else:
+        run_waitress(args.host, args.port, args.threads)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+# telemetry.py
+# จับเวลาแต่ละขั้นตอนของเซิร์ฟเวอร์วาดรูป (span -> histogram) และเปิด Profiler ราย request
+#
+# ใช้งาน:
+#   with telemetry.span('upload_save'): file.save(path)
+#   ddl.process_and_draw_contours(..., stage_hook=telemetry.stage_hook('preview'))
+#   GET /metrics  -> telemetry.snapshot()
+import cProfile
+import functools
+import io
+import os
+import pstats
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import Lock
+
+from flask import request, json
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+# ขอบบนของแต่ละ bucket (มิลลิวินาที) ครอบคลุมตั้งแต่ขั้นตอนเล็กๆ ถึงงานวาดทั้งภาพ
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000,
+                        10000, 30000, 60000, 300000, 1800000, float('inf')]
+RECENT_SPANS_MAX = 200
+PROFILE_DIR = 'static/processed/profiles'
+
+
+class Histogram:
+    """Histogram แบบ bucket คงที่ (ไม่ต้องเก็บทุกค่า)"""
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS_MS):
+        self.buckets = list(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = None
+        self.max_ms = None
+
+    def observe(self, value_ms):
+        for i, upper in enumerate(self.buckets):
+            if value_ms <= upper:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total_ms += value_ms
+        self.min_ms = value_ms if self.min_ms is None else min(self.min_ms, value_ms)
+        self.max_ms = value_ms if self.max_ms is None else max(self.max_ms, value_ms)
+
+    def quantile(self, q):
+        """ประมาณค่า quantile จาก bucket (คืนขอบบนของ bucket ที่ถึง q)"""
+        if self.count == 0: return None
+        target = q * self.count
+        seen = 0
+        for upper, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return self.max_ms if upper == float('inf') else min(upper, self.max_ms)
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "min_ms": round(self.min_ms, 3) if self.min_ms is not None else None,
+            "max_ms": round(self.max_ms, 3) if self.max_ms is not None else None,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "buckets": [{"le_ms": "+Inf" if b == float('inf') else b, "count": n}
+                        for b, n in zip(self.buckets, self.counts)],
+        }
+
+
+_lock = Lock()
+_histograms = {}
+_recent = deque(maxlen=RECENT_SPANS_MAX)
+_started_at = time.time()
+
+
+def record(name, seconds, **labels):
+    """บันทึกเวลาที่วัดมาแล้ว (เช่นงานที่เริ่มและจบคนละ request)"""
+    ms = seconds * 1000.0
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = Histogram()
+        hist.observe(ms)
+        _recent.append({"name": name, "ms": round(ms, 3), "at": round(time.time(), 3), **labels})
+
+
+@contextmanager
+def span(name, **labels):
+    """จับเวลาช่วงโค้ด แล้วบันทึกลง histogram ชื่อ name (บันทึกแม้เกิด Exception)"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - t0, **labels)
+
+
+def stage_hook(prefix):
+    """stage_hook สำหรับ ddl.process_and_draw_contours -> span ชื่อ pipeline.<prefix>.<stage>"""
+    def hook(stage):
+        return span(f"pipeline.{prefix}.{stage}")
+    return hook
+
+
+def snapshot():
+    with _lock:
+        return {
+            "uptime_s": round(time.time() - _started_at, 1),
+            "histograms": {name: h.to_dict() for name, h in sorted(_histograms.items())},
+            "recent_spans": list(_recent),
+        }
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _recent.clear()
+
+
+# ----------------- Profiler ราย request -----------------
+
+def requested_profiler(req):
+    """
+    อ่านตัวเลือก profile จาก request: ?profile=1 / ?profile=cprofile / ?profile=pyinstrument
+    หรือ {"profile": true} ใน JSON body -> คืนชื่อ profiler หรือ None
+    """
+    value = req.args.get('profile')
+    if value is None and req.is_json:
+        value = (req.get_json(silent=True) or {}).get('profile')
+    if value in (None, False, '', '0', 'false'): return None
+    if value == 'pyinstrument':
+        if pyinstrument is None:
+            print(" ⚠️ ไม่ได้ติดตั้ง pyinstrument ใช้ cProfile แทน")
+            return 'cprofile'
+        return 'pyinstrument'
+    return 'cprofile'
+
+
+def run_profiled(kind, name, fn, *args, **kwargs):
+    """
+    รัน fn ภายใต้ profiler แล้วบันทึกผลลง PROFILE_DIR
+    คืน (ผลลัพธ์ของ fn, path ของรายงาน)
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    base = os.path.join(PROFILE_DIR, f"{name}_{stamp}_{int(time.time() * 1000) % 1000:03d}")
+
+    if kind == 'pyinstrument':
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            profiler.stop()
+            report_path = base + '.html'
+            with open(report_path, 'w') as f:
+                f.write(profiler.output_html())
+        return result, report_path
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(base + '.prof')
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(40)
+        report_path = base + '.txt'
+        with open(report_path, 'w') as f:
+            f.write(text.getvalue())
+    return result, report_path
+
+
+def profiled(view):
+    """
+    Decorator สำหรับ Flask route: ถ้า request ขอ profile ให้รันใต้ profiler
+    และแนบ profile_url ใน JSON response
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        kind = requested_profiler(request)
+        if kind is None:
+            return view(*args, **kwargs)
+        response, report_path = run_profiled(kind, view.__name__, view, *args, **kwargs)
+        print(f" 🔬 Profile ({kind}) {view.__name__}: {report_path}")
+        resp, status = (response if isinstance(response, tuple) else (response, None))
+        if getattr(resp, 'is_json', False):
+            payload = resp.get_json()
+            if isinstance(payload, dict):
+                payload["profile_url"] = report_path.replace(os.path.sep, '/')
+                resp.set_data(json.dumps(payload))
+        return (resp, status) if status is not None else resp
+    return wrapper
@@ -1,20 +1,50 @@
+import json
+import math
+import os
+import sys
 import threading
 import time
-import serial.tools.list_ports
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 
 # ==========================================
-# 🔧 ตั้งค่า PORT ตรงนี้ (แก้เป็น COM ที่คุณเจอ)
+# 🔧 ตั้งค่า PORT (ไม่ต้องตั้งก็ได้ ระบบจะค้นหา Port ของ Dobot เอง)
 # ==========================================
-MANUAL_PORT = 'COM5'  # <--- เปลี่ยนเป็น COM3, COM4, หรือ COM5 ตามเครื่องคุณ
+# ระบุเองผ่าน Environment เช่น DOBOT_PORT=COM5 หรือ DOBOT_PORT=/dev/ttyUSB0
+# (การค้นหา Port อยู่ที่ dobot_common/device.py ใช้ร่วมกับทุกโปรเจกต์)
 # ==========================================
 
+# Supervisor: ตรวจสุขภาพการเชื่อมต่อ + ต่อใหม่ใน Background
+HEALTH_CHECK_INTERVAL = 1.0      # วินาที ระหว่างการตรวจ
+HEALTH_STALE_TIMEOUT = 5.0       # ไม่มีคำตอบจาก Serial นานเกินนี้ -> ส่ง heartbeat เอง
+HEALTH_MAX_FAILURES = 3          # ผิดพลาดติดกันกี่ครั้งถึงถือว่าสายหลุด
+RECONNECT_BACKOFF_MIN = 0.5      # วินาที รอก่อนลองต่อใหม่ครั้งแรก (เพิ่มเป็น 2 เท่าทุกครั้งที่ไม่สำเร็จ)
+RECONNECT_BACKOFF_MAX = 10.0
+
+# อ่านตำแหน่งแขนใน Background (pydobot ใช้เวลา ~0.2s ต่อคำสั่ง)
+POSE_SAMPLE_INTERVAL = 0.5       # วินาที ระหว่างการอ่าน pose ตอนแขนว่าง
+POSE_SAMPLE_INTERVAL_BUSY = 2.0  # ตอนมีคำสั่งเคลื่อนที่ -> อ่านห่างขึ้น เหลือ Serial ให้งานเคลื่อนที่
+JOG_POLL_INTERVAL = 0.1          # วินาที ระหว่างเช็คว่า Jog ก่อนหน้าเคลื่อนที่เสร็จหรือยัง
+JOG_STEP = 20                    # mm ต่อการกด 1 ครั้ง
+
+# Jog ต่อเนื่อง (กดค้าง): Browser ส่งความเร็วมาเรื่อยๆ ถ้าเงียบเกิน DEADMAN ให้หยุดทันที
+JOG_MAX_SPEED = 60.0             # mm/s สูงสุดต่อแกน
+JOG_DEADMAN_TIMEOUT = 0.35       # วินาที ถ้าไม่ได้รับ intent ใหม่ภายในเวลานี้ถือว่าปล่อยปุ่ม
+JOG_HORIZON = 0.3                # วินาที ความยาวของเป้าหมายแต่ละช่วง (ระยะเกินสูงสุดตอนหยุด)
+JOG_QUEUE_AHEAD = 2              # จำนวนช่วงที่ค้างในคิวของแขนได้พร้อมกัน
+JOG_VELOCITY_TICK = 0.05         # วินาที รอบการเติมคิว
+JOG_CP_ACCEL = 200.0             # mm/s² ความเร่งของ CP ระหว่าง Jog ต่อเนื่อง
+JOG_CP_SPEED_STEP = 2.0          # mm/s ความเร็วเปลี่ยนเกินนี้ค่อยตั้ง CP params ใหม่
+JOG_STREAM_INTERVAL = 0.2        # วินาที รอบการส่งสถานะผ่าน SSE
+# ขอบเขตพื้นที่ทำงาน (กันแขนวิ่งไปจุดที่เอื้อมไม่ถึงแล้ว Alarm)
+JOG_MIN_RADIUS, JOG_MAX_RADIUS = 140.0, 315.0
+JOG_Z_MIN, JOG_Z_MAX = -60.0, 150.0
+
 # --- 1. Hardware Library ---
-try:
-    from pydobot import Dobot
-except ImportError:
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dobot_common.arm_server import PRIORITY_MANUAL, connect_arm
+from dobot_common.device import NO_RETRY, Dobot, DobotDevice, find_dobot_ports
+if Dobot is None:
     print("❌ Critical Error: 'pydobot' library is missing. Please run: pip install pydobot")
-    Dobot = None
 
 app = Flask(__name__)
 
@@ -27,71 +57,328 @@ class DobotController:
         if cls._instance is None:
             cls._instance = super(DobotController, cls).__new__(cls)
             cls._instance.device = None
-            cls._instance.connect()
+            # (pose, เวลาที่อ่าน) -> แทนทั้ง tuple ทีเดียว ผู้อ่านไม่ต้องใช้ Lock
+            cls._instance._pose_snapshot = ((0,0,0,0,0,0,0,0), 0.0)
+            cls._instance._refresh_pose = threading.Event()
+            # Jog: สะสมระยะที่กดไว้ แล้วส่งเป็น 1 คำสั่งเมื่อแขนเคลื่อนที่ครั้งก่อนเสร็จ
+            cls._instance._jog_lock = threading.Lock()
+            cls._instance._jog_offset = [0.0, 0.0, 0.0, 0.0]
+            cls._instance._jog_event = threading.Event()
+            cls._instance._jog_target = None  # เป้าหมายล่าสุดที่สั่งไป (ต่อ Jog ถัดไปจากจุดนี้)
+            # Jog ต่อเนื่อง: (vx, vy, vz) mm/s + เวลาที่ได้รับล่าสุด (แทนทั้ง tuple ทีเดียว)
+            cls._instance._velocity = ((0.0, 0.0, 0.0), 0.0)
+            cls._instance._velocity_event = threading.Event()
+            cls._instance._velocity_active = False
+            # สถานะ/สถิติการเชื่อมต่อ (Supervisor เป็นผู้เปลี่ยน state)
+            cls._instance._link = {
+                "state": "connecting", "port": None, "connected_at": None, "lost_at": None,
+                "uptime_total_s": 0.0, "reconnects": 0, "reconnect_attempts": 0,
+                "last_reconnect_s": None, "reconnect_total_s": 0.0,
+                "failures": 0, "consecutive_failures": 0, "last_ok": 0.0, "last_error": None,
+            }
+            # ต่อครั้งแรกใน Supervisor -> เปิดเว็บได้ทันทีแม้ยังไม่ได้เสียบ Dobot
+            threading.Thread(target=cls._instance._supervisor, daemon=True).start()
+            threading.Thread(target=cls._instance._pose_sampler, daemon=True).start()
+            threading.Thread(target=cls._instance._jog_worker, daemon=True).start()
+            threading.Thread(target=cls._instance._velocity_worker, daemon=True).start()
         return cls._instance
 
-    def connect(self):
-        """เชื่อมต่อ Dobot"""
-        if not Dobot: return
+    def connect(self, quiet=False):
+        """เชื่อมต่อ Dobot (arm server ก่อน -> Port ที่ระบุเอง -> Port ที่สแกนเจอ) คืน True ถ้าสำเร็จ"""
+        try:
+            # มี arm server -> ใช้แขนร่วมกับแอปอื่น (คนกดจากหน้าเว็บ priority สูงสุด แย่งแขนจากแอปอื่นได้)
+            device = connect_arm("move_web", PRIORITY_MANUAL)
+        except ConnectionError:
+            device = None
+        if device is not None:
+            with self._lock:
+                self.device = device
+                self._mark_connected(device.port)
+            print(f"✅ CONNECTED SUCCESS: Dobot via {device.port}")
+            self.request_pose_refresh()
+            return True
+        if not Dobot: return False
 
-        # 1. ลองใช้ Port ที่ระบุมาเองก่อน (Manual)
-        port = MANUAL_PORT
-        
-        # 2. ถ้าไม่ได้ระบุ ให้ลองหาเอง (Auto - ซึ่งอาจจะพลาดได้)
-        if not port:
-            port = self._find_port_windows()
+        candidates = find_dobot_ports()
+        if not candidates:
+            if not quiet: print("⚠️ DEVICE NOT FOUND: Please check USB connection.")
+            return False
 
-        print(f"🔌 Attempting to connect to: {port} ...")
-
-        if port:
+        for port in candidates:
+            if not quiet: print(f"🔌 Attempting to connect to: {port} ...")
+            device = None
             try:
-                self.device = Dobot(port=port)
-                self.device.speed(100, 100)
-                print(f"✅ CONNECTED SUCCESS: Dobot found at {port}")
+                # Supervisor จัดการต่อใหม่เองอยู่แล้ว -> ไม่ retry ซ้อนในชั้น device
+                device = DobotDevice(port, retry=NO_RETRY)
+                device.speed(100, 100)
             except Exception as e:
-                print(f"❌ CONNECTION FAILED at {port}: {e}")
-                print("   -> ลองตรวจสอบสาย USB หรือปิดโปรแกรม Dobot Studio ดูครับ")
-                self.device = None
-        else:
-            print("⚠️ DEVICE NOT FOUND: Please check USB connection.")
-            self.device = None
-
-    def _find_port_windows(self):
-        ports = serial.tools.list_ports.comports()
-        for port in ports:
-            # พยายามหา Silicon Labs ก่อน
-            if "Silicon Labs" in port.description or "CP210x" in port.description:
-                return port.device
-        # ถ้าไม่เจอให้เอา COM ตัวแรกที่เจอ
-        for port in ports:
-            if "COM" in port.device:
-                return port.device
-        return None
+                # ปิด Port + reader ก่อนลองใหม่ ไม่งั้น Supervisor รั่ว 1 reader ต่อการลองหนึ่งครั้ง
+                if device is not None:
+                    try: device.close()
+                    except Exception: pass
+                if not quiet:
+                    print(f"❌ CONNECTION FAILED at {port}: {e}")
+                    print("   -> ลองตรวจสอบสาย USB หรือปิดโปรแกรม Dobot Studio ดูครับ")
+                continue
+            with self._lock:
+                self.device = device
+                self._mark_connected(port)
+            print(f"✅ CONNECTED SUCCESS: Dobot found at {port}")
+            self.request_pose_refresh()
+            return True
+        return False
 
     def _check_connection(self):
-        if self.device is None:
-            # ถ้าหลุด ให้ลองต่อใหม่โดยใช้ logic เดิม
-            self.connect()
+        """ไม่ต่อใหม่ใน Request (Supervisor ทำใน Background) -> ถ้าหลุดตอบ error ทันที"""
         return self.device is not None
 
-    def move_relative(self, dx=0, dy=0, dz=0, dr=0):
+    # ---------- Health monitor ----------
+
+    def _mark_connected(self, port):
+        link = self._link
+        now = time.time()
+        if link["lost_at"] is not None:
+            took = now - link["lost_at"]
+            link["reconnects"] += 1
+            link["last_reconnect_s"] = round(took, 3)
+            link["reconnect_total_s"] += took
+        link.update(state="connected", port=port, connected_at=now, lost_at=None,
+                    consecutive_failures=0, last_ok=now)
+
+    def _report_ok(self):
+        self._link["last_ok"] = time.time()
+        self._link["consecutive_failures"] = 0
+
+    def _report_failure(self, error, device=None):
+        """เรียกเมื่อคำสั่ง Serial ล้มเหลว (ไม่นับถ้า device นั้นถูกปิดไปแล้ว)"""
+        if device is not None and device is not self.device: return
+        self._link["failures"] += 1
+        self._link["consecutive_failures"] += 1
+        self._link["last_error"] = str(error)
+
+    def _drop_link(self, reason):
+        print(f"⚠️ Dobot link lost: {reason} -> reconnecting in background")
         with self._lock:
-            if not self._check_connection(): return False, "Device not connected", (0,0,0,0)
+            device, self.device = self.device, None
+            link = self._link
+            now = time.time()
+            if link["connected_at"] is not None:
+                link["uptime_total_s"] += now - link["connected_at"]
+            link.update(state="reconnecting", connected_at=None, lost_at=now, last_error=str(reason))
+            self._jog_target = None
+        self._clear_jog()
+        self.stop_velocity()
+        if device is not None:
+            try: device.close()
+            except Exception: pass
+
+    def _link_healthy(self, device):
+        link = self._link
+        if link["consecutive_failures"] >= HEALTH_MAX_FAILURES:
+            return False
+        ser = getattr(device, 'ser', None)
+        if ser is not None and not ser.is_open:
+            return False
+        if time.time() - link["last_ok"] > HEALTH_STALE_TIMEOUT:
+            # ไม่มีใครคุยกับแขนมาสักพัก -> heartbeat ด้วยการอ่าน pose 1 ครั้ง
             try:
-                x, y, z, r, _, _, _, _ = self.device.pose()
-                tx, ty, tz, tr = x+dx, y+dy, z+dz, r+dr
-                self.device.move_to(tx, ty, tz, tr, wait=True)
-                return True, "Move Success", (tx, ty, tz, tr)
+                self._pose_snapshot = (tuple(device.pose()), time.time())
+                self._report_ok()
             except Exception as e:
-                return False, f"Error: {str(e)}", (0,0,0,0)
+                self._report_failure(e, device)
+                return False
+        return True
+
+    def _supervisor(self):
+        """Thread ตรวจการเชื่อมต่อ: สายหลุด/ค้าง -> ปิดแล้วสแกน Port ต่อใหม่แบบ Backoff"""
+        backoff = RECONNECT_BACKOFF_MIN
+        first = True
+        while True:
+            device = self.device
+            if device is None:
+                self._link["reconnect_attempts"] += 1
+                if self.connect(quiet=not first):
+                    backoff = RECONNECT_BACKOFF_MIN
+                else:
+                    if self._link["state"] == "connected": self._link["state"] = "reconnecting"
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX)
+                first = False
+                continue
+            if not self._link_healthy(device):
+                self._drop_link(self._link["last_error"] or "serial port closed")
+                continue
+            time.sleep(HEALTH_CHECK_INTERVAL)
+
+    def link_metrics(self):
+        link = dict(self._link)
+        now = time.time()
+        current_uptime = now - link["connected_at"] if link["connected_at"] else 0.0
+        return {
+            "state": link["state"],
+            "port": link["port"],
+            "uptime_s": round(current_uptime, 1),
+            "uptime_total_s": round(link["uptime_total_s"] + current_uptime, 1),
+            "down_for_s": round(now - link["lost_at"], 1) if link["lost_at"] else None,
+            "reconnects": link["reconnects"],
+            "reconnect_attempts": link["reconnect_attempts"],
+            "last_reconnect_s": link["last_reconnect_s"],
+            "avg_reconnect_s": round(link["reconnect_total_s"] / link["reconnects"], 3) if link["reconnects"] else None,
+            "failures": link["failures"],
+            "consecutive_failures": link["consecutive_failures"],
+            "last_ok_age_s": round(now - link["last_ok"], 3) if link["last_ok"] else None,
+            "last_error": link["last_error"],
+        }
+
+    def jog(self, dx=0, dy=0, dz=0, dr=0):
+        """รับคำสั่ง Jog แล้วคืนทันที (ระยะถูกสะสมรวมกันระหว่างแขนกำลังเคลื่อนที่)"""
+        with self._lock:
+            if not self._check_connection(): return False, "Device not connected", None
+        with self._jog_lock:
+            for i, d in enumerate((dx, dy, dz, dr)):
+                self._jog_offset[i] += d
+            pending = tuple(self._jog_offset)
+        self._jog_event.set()
+        return True, "Jog queued", pending
+
+    def _clear_jog(self):
+        with self._jog_lock:
+            self._jog_offset = [0.0, 0.0, 0.0, 0.0]
+        self._jog_target = None
+
+    def _queue_move(self, x, y, z, r):
+        """ส่ง PTP เข้าคิวของ Dobot แบบไม่รอ คืนหมายเลขคิว (ใช้เช็คว่าเคลื่อนที่เสร็จหรือยัง)"""
+        return self.device.queue_move(x, y, z, r)
+
+    def _wait_queue_index(self, index):
+        device = self.device
+        while index is not None and device is not None:
+            if device.current_index() >= index: return
+            time.sleep(JOG_POLL_INTERVAL)
+
+    def _jog_worker(self):
+        """Thread ส่ง Jog: 1 คำสั่งต่อครั้ง ระหว่างรอให้เสร็จ Jog ใหม่จะถูกรวมเป็นคำสั่งเดียว"""
+        while True:
+            self._jog_event.wait()
+            with self._jog_lock:
+                offset = self._jog_offset
+                self._jog_offset = [0.0, 0.0, 0.0, 0.0]
+                self._jog_event.clear()
+            if not any(offset): continue
+            with self._lock:
+                if self.device is None: continue
+                try:
+                    base = self._jog_target
+                    if base is None:
+                        base = tuple(self.device.pose()[:4])
+                    target = tuple(b + d for b, d in zip(base, offset))
+                    index = self._queue_move(*target)
+                    self._jog_target = target
+                except Exception as e:
+                    print(f"❌ Jog failed: {e}")
+                    self._report_failure(e)
+                    self._jog_target = None
+                    continue
+            try:
+                self._wait_queue_index(index)
+            except Exception as e:
+                print(f"⚠️ Jog wait failed: {e}")
+                self._report_failure(e)
+            self.request_pose_refresh()
+
+    # ---------- Jog ต่อเนื่อง (Velocity mode) ----------
+
+    def set_velocity(self, vx=0.0, vy=0.0, vz=0.0):
+        """รับ intent ความเร็วจาก Browser (ต้องส่งซ้ำเรื่อยๆ ไม่งั้น Dead-man จะสั่งหยุด)"""
+        if self.device is None: return False, "Device not connected"
+        v = tuple(max(-JOG_MAX_SPEED, min(JOG_MAX_SPEED, float(c))) for c in (vx, vy, vz))
+        self._velocity = (v, time.time())
+        if any(v): self._velocity_event.set()
+        return True, "Velocity updated"
+
+    def stop_velocity(self):
+        self._velocity = ((0.0, 0.0, 0.0), time.time())
+
+    def velocity_state(self):
+        v, stamp = self._velocity
+        return {"active": self._velocity_active, "vx": v[0], "vy": v[1], "vz": v[2],
+                "intent_age_s": round(time.time() - stamp, 3) if stamp else None}
+
+    @staticmethod
+    def _clamp_workspace(x, y, z):
+        radius = math.hypot(x, y)
+        if radius > 0:
+            scale = min(max(radius, JOG_MIN_RADIUS), JOG_MAX_RADIUS) / radius
+            x, y = x * scale, y * scale
+        return x, y, min(max(z, JOG_Z_MIN), JOG_Z_MAX)
+
+    def _velocity_worker(self):
+        """
+        แปลงความเร็วเป็นเป้าหมายสั้นๆ (JOG_HORIZON) ต่อกันในคิวของแขน ใช้ CP (Continuous Path)
+        ให้แต่ละช่วงต่อเนื่องกันโดยไม่หยุด และค้างในคิวไม่เกิน JOG_QUEUE_AHEAD ช่วง
+        ความเร็วที่รอยต่อของ CP ตั้งตามขนาดความเร็วที่สั่ง (CP params เข้าคิวต่อท้าย -> มีผลกับช่วงถัดไป
+        ความเร็วจริงจึงใกล้เคียง ไม่ตรงทุกช่วง)
+        """
+        while True:
+            self._velocity_event.wait()
+            self._velocity_event.clear()
+            pending = []   # หมายเลขคิวที่ยังไม่เสร็จ
+            target = None
+            cp_speed = None   # ความเร็ว CP ที่ตั้งไว้ล่าสุด
+            while True:
+                v, stamp = self._velocity
+                if not any(v) or time.time() - stamp > JOG_DEADMAN_TIMEOUT: break
+                with self._lock:
+                    device = self.device
+                    if device is None: break
+                    try:
+                        if target is None:
+                            self._velocity_active = True
+                            base = self._jog_target or tuple(device.pose()[:4])
+                            target = tuple(base[:3])
+                        if pending:
+                            current = device.current_index()
+                            pending = [i for i in pending if i > current]
+                        if len(pending) < JOG_QUEUE_AHEAD:
+                            speed = math.hypot(*v)
+                            if cp_speed is None or abs(speed - cp_speed) > JOG_CP_SPEED_STEP:
+                                device.cp_params(JOG_CP_ACCEL, speed, JOG_CP_ACCEL)
+                                cp_speed = speed
+                            target = self._clamp_workspace(*(t + c * JOG_HORIZON for t, c in zip(target, v)))
+                            pending.append(device.queue_cp(*target))
+                    except Exception as e:
+                        print(f"❌ Velocity jog failed: {e}")
+                        self._report_failure(e, device)
+                        break
+                time.sleep(JOG_VELOCITY_TICK)
+            if target is not None:
+                self._halt_queue()
+            self._velocity_active = False
+
+    def _halt_queue(self):
+        """หยุดคิวคำสั่งของแขน ทิ้งช่วงที่เหลือ แล้วเปิดรับคำสั่งใหม่"""
+        with self._lock:
+            device = self.device
+            if device is None: return
+            try:
+                device.halt()
+            except Exception as e:
+                print(f"⚠️ Halt failed: {e}")
+                self._report_failure(e, device)
+            self._jog_target = None  # ตำแหน่งจริงไม่ใช่เป้าหมายสุดท้ายแล้ว -> อ่าน pose ใหม่
+        self.request_pose_refresh()
 
     def move_absolute(self, x, y, z, r):
+        self._clear_jog()
         with self._lock:
             if not self._check_connection(): return False, "Device not connected", (0,0,0,0)
             try:
                 self.device.move_to(x, y, z, r, wait=True)
+                self._jog_target = (x, y, z, r)
+                self._report_ok()
                 return True, "Move Success", (x, y, z, r)
             except Exception as e:
+                self._report_failure(e)
                 return False, f"Error: {str(e)}", (0,0,0,0)
 
     def set_suction(self, enable):
@@ -101,15 +388,45 @@ class DobotController:
                 self.device.suck(enable)
                 return True, f"Suction {'ON' if enable else 'OFF'}", None
             except Exception as e:
+                self._report_failure(e)
                 return False, f"Error: {str(e)}", None
 
-    def get_pose(self):
-        with self._lock:
-            if not self._check_connection(): return (0,0,0,0,0,0,0,0)
+    def _pose_sampler(self):
+        """Thread อ่าน pose เป็นรอบๆ แล้วเก็บเป็น snapshot (ไม่ถือ _lock จึงไม่ขวางคำสั่งเคลื่อนที่)"""
+        while True:
+            # มีคำสั่งค้างอยู่ (_lock ถูกถือ) -> ลดความถี่ลง
+            busy = self._lock.locked()
+            refreshed = self._refresh_pose.wait(POSE_SAMPLE_INTERVAL_BUSY if busy else POSE_SAMPLE_INTERVAL)
+            self._refresh_pose.clear()
+            device = self.device
+            if device is None: continue
             try:
-                return self.device.pose()
-            except:
-                return (0,0,0,0,0,0,0,0)
+                # pydobot มี Lock ของตัวเองต่อ 1 packet -> อ่านแทรกระหว่างคำสั่งได้ปลอดภัย
+                # อ่านตามรอบยอมรับค่าในแคชที่ใหม่พอ (ผ่าน arm server = ไม่แตะ Serial เลย) ถูกปลุก -> อ่านใหม่
+                max_age = 0.0 if refreshed else POSE_SAMPLE_INTERVAL
+                self._pose_snapshot = (tuple(device.pose(max_age=max_age)), time.time())
+                self._report_ok()
+            except Exception as e:
+                print(f"⚠️ Pose read failed: {e}")
+                self._report_failure(e, device)
+
+    def request_pose_refresh(self):
+        """ปลุก Sampler ให้อ่านทันที (เช่น หลังเคลื่อนที่เสร็จ)"""
+        self._refresh_pose.set()
+
+    def get_pose(self):
+        """pose ล่าสุดจาก snapshot (ไม่แตะ Serial)"""
+        return self._pose_snapshot[0]
+
+    def pose_snapshot(self):
+        pose, stamp = self._pose_snapshot
+        return {
+            "x": pose[0], "y": pose[1], "z": pose[2], "r": pose[3],
+            "timestamp": stamp,
+            "age_s": round(time.time() - stamp, 3) if stamp else None,
+            "connected": self.device is not None,
+            "link": self._link["state"],
+        }
 
 # --- 3. Flask Server ---
 bot = DobotController()
@@ -122,16 +439,17 @@ def index():
 def command():
     data = request.json
     action = data.get('action')
-    step = 20 
+    step = JOG_STEP
     
     success, msg = False, "Unknown Command"
     
-    if action == 'up': success, msg, _ = bot.move_relative(dz=step)
-    elif action == 'down': success, msg, _ = bot.move_relative(dz=-step)
-    elif action == 'left': success, msg, _ = bot.move_relative(dy=-step)
-    elif action == 'right': success, msg, _ = bot.move_relative(dy=step)
-    elif action == 'front': success, msg, _ = bot.move_relative(dx=step)
-    elif action == 'back': success, msg, _ = bot.move_relative(dx=-step)
+    # ปุ่มทิศทาง = Jog แบบไม่รอ (กดรัวๆ จะถูกรวมเป็นคำสั่งเดียว)
+    if action == 'up': success, msg, _ = bot.jog(dz=step)
+    elif action == 'down': success, msg, _ = bot.jog(dz=-step)
+    elif action == 'left': success, msg, _ = bot.jog(dy=-step)
+    elif action == 'right': success, msg, _ = bot.jog(dy=step)
+    elif action == 'front': success, msg, _ = bot.jog(dx=step)
+    elif action == 'back': success, msg, _ = bot.jog(dx=-step)
     elif action == 'reset': success, msg, _ = bot.move_absolute(250, 0, 0, 0)
     elif action == 'suck_on': success, msg, _ = bot.set_suction(True)
     elif action == 'suck_off': success, msg, _ = bot.set_suction(False)
@@ -142,17 +460,47 @@ def command():
             float(v.get('z', 0)), float(v.get('r', 0))
         )
 
-    pose = bot.get_pose()
+    bot.request_pose_refresh()
     return jsonify({ 
         "status": "success" if success else "error", 
         "message": msg, 
-        "x": pose[0], "y": pose[1], "z": pose[2], "r": pose[3] 
+        **bot.pose_snapshot()
     })
 
 @app.route('/pose', methods=['GET'])
 def get_pose_route():
-    pose = bot.get_pose()
-    return jsonify({ "x": pose[0], "y": pose[1], "z": pose[2], "r": pose[3] })
+    return jsonify(bot.pose_snapshot())
+
+@app.route('/health', methods=['GET'])
+def health():
+    """สถานะการเชื่อมต่อ + สถิติ (uptime, เวลาต่อใหม่, จำนวนครั้งที่ผิดพลาด)"""
+    metrics = bot.link_metrics()
+    return jsonify(metrics), (200 if metrics["state"] == "connected" else 503)
+
+@app.route('/jog/velocity', methods=['POST'])
+def jog_velocity():
+    """{"vx":..,"vy":..,"vz":..} mm/s -> ส่งซ้ำทุก ~100ms ระหว่างกดค้าง, ส่ง 0 หรือหยุดส่ง = หยุด"""
+    data = request.json or {}
+    try:
+        success, msg = bot.set_velocity(data.get('vx', 0), data.get('vy', 0), data.get('vz', 0))
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": f"Invalid velocity: {e}"}), 400
+    return jsonify({"status": "success" if success else "error", "message": msg, **bot.velocity_state()})
+
+@app.route('/jog/stop', methods=['POST'])
+def jog_stop():
+    bot.stop_velocity()
+    return jsonify({"status": "success", "message": "Jog stopped", **bot.velocity_state()})
+
+@app.route('/jog/stream')
+def jog_stream():
+    """SSE: ส่ง pose snapshot + สถานะ Jog ให้หน้าเว็บแทนการ poll"""
+    def events():
+        while True:
+            payload = {**bot.pose_snapshot(), "jog": bot.velocity_state()}
+            yield f"data: {json.dumps(payload)}\n\n"
+            time.sleep(JOG_STREAM_INTERVAL)
+    return Response(events(), mimetype='text/event-stream', headers={"Cache-Control": "no-cache"})
 
 if __name__ == '__main__':
     # เพิ่ม use_reloader=False เพื่อป้องกันไม่ให้แย่ง Port กันเอง
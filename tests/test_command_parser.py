@@ -0,0 +1,49 @@
+# test_command_parser.py
+# CommandParser กับ CMD_MAP ชุดเล็ก (voice_control import sounddevice จึงไม่ import ตรงๆ):  python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Dobot_voice_control'))
+
+from command_parser import CommandParser, Intent
+
+CMD_MAP = {
+    "ซ้าย": "left", "left": "left", "lift": "left",
+    "ขวา": "right", "right": "right",
+    "ขึ้น": "up", "up": "up", "app": "up",
+    "ลง": "down", "down": "down",
+    "หน้า": "front", "front": "front", "for": "front", "four": "front",
+    "ดูด": "suck", "suck": "suck",
+}
+
+
+def _parse(text):
+    return CommandParser(CMD_MAP).parse(text)
+
+
+def test_typos_and_repeat_attach_to_their_own_command():
+    assert _parse("leftt 50 then upp two times") == [Intent("left", 50), Intent("up", repeat=2)]
+
+
+def test_short_words_only_match_by_dropping_one_letter():
+    assert _parse("upp") == [Intent("up")]
+    assert _parse("us") == []
+    assert _parse("ups 10") == [Intent("up", 10)]
+
+
+def test_unknown_word_stops_trailing_repeat_from_attaching():
+    assert _parse("left 50 xyz two times") == [Intent("left", 50)]
+    assert _parse("left 50 xyz two times up") == [Intent("left", 50), Intent("up", repeat=2)]
+
+
+def test_four_after_move_is_a_number():
+    assert _parse("left four") == [Intent("left", 4)]
+    assert _parse("move left for 50") == [Intent("left", 50)]
+
+
+def test_thai_without_spaces():
+    assert _parse("ซ้ายห้าสิบมิลแล้วขึ้นสองครั้ง") == [Intent("left", 50), Intent("up", repeat=2)]
+
+
+def test_zero_magnitude_is_kept():
+    assert _parse("left 0") == [Intent("left", 0)]
@@ -0,0 +1,99 @@
+# test_transport.py
+# DobotTransport กับ Serial จำลอง (ไม่ต้องต่อแขนจริง):  python -m pytest tests
+import os
+import struct
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dobot_common import transport as transport_module
+from dobot_common.transport import CTRL_READ, GET_QUEUED_CMD_CURRENT_INDEX, DobotTransport, FastDobot
+
+
+class FakeSerial:
+    """ตอบทุกแพ็กเก็ตทันทีด้วย index ที่เพิ่มขึ้นทีละ 1 ยกเว้นแพ็กเก็ตลำดับที่อยู่ใน drop"""
+
+    def __init__(self, drop=()):
+        self.drop = set(drop)
+        self.is_open = True
+        self.name = "fake"
+        self.sent = 0
+        self.index = 0
+        self._out = bytearray()
+        self._cond = threading.Condition()
+
+    @property
+    def in_waiting(self):
+        return len(self._out)
+
+    def write(self, data):
+        data = bytes(data)
+        cmd_id, ctrl = data[3], data[4]
+        self.index += 1
+        body = bytes([cmd_id, ctrl]) + struct.pack('<Q', self.index)
+        frame = b'\xaa\xaa' + bytes([len(body)]) + body + bytes([-sum(body) & 0xFF])
+        self.sent += 1
+        if self.sent - 1 in self.drop: return len(data)
+        with self._cond:
+            self._out += frame
+            self._cond.notify()
+        return len(data)
+
+    def reset_input_buffer(self):
+        pass
+
+    def reset_output_buffer(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+    def read(self, n=1):
+        with self._cond:
+            if not self._out: self._cond.wait(0.02)
+            chunk = bytes(self._out[:n])
+            del self._out[:n]
+            return chunk
+
+
+def _index(transport):
+    return struct.unpack_from('<Q', transport.request(GET_QUEUED_CMD_CURRENT_INDEX, CTRL_READ).params, 0)[0]
+
+
+def test_requests_match_in_order():
+    transport = DobotTransport(FakeSerial(), timeout=0.2)
+    try:
+        assert [_index(transport) for _ in range(5)] == [1, 2, 3, 4, 5]
+        assert transport.timeouts == 0 and transport.unmatched == 0
+    finally:
+        transport.close()
+
+
+def test_dropped_reply_does_not_shift_later_requests():
+    transport = DobotTransport(FakeSerial(drop={1}), timeout=0.2)
+    try:
+        assert _index(transport) == 1
+        try:
+            _index(transport)
+            raise AssertionError("คำขอที่คำตอบหายต้อง timeout")
+        except TimeoutError:
+            pass
+        # คำขอหลังจากนั้นต้องได้คำตอบของตัวเอง ไม่ใช่ของคำขอก่อนหน้า
+        assert [_index(transport) for _ in range(4)] == [3, 4, 5, 6]
+        assert transport.timeouts == 1 and transport.unmatched == 0
+    finally:
+        transport.close()
+
+
+def test_failed_init_closes_port_and_reader(monkeypatch):
+    ser = FakeSerial(drop=range(1000))         # Port เปิดได้แต่ไม่มีอะไรตอบ (ไม่ใช่ Dobot)
+    monkeypatch.setattr(transport_module.serial, "Serial", lambda *args, **kwargs: ser)
+    before = {t for t in threading.enumerate() if t.name == "dobot-reader"}
+    try:
+        FastDobot("fake")
+        raise AssertionError("ต่อ Port ที่ไม่ตอบต้อง raise")
+    except TimeoutError:
+        pass
+    assert not ser.is_open
+    assert not [t for t in threading.enumerate() if t.name == "dobot-reader" and t not in before]